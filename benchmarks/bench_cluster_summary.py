@@ -0,0 +1,66 @@
+"""Compara el resumen de clusters por máscaras (una pasada por cluster y estadística)
+con el resumen en una sola pasada de summarize_clusters.
+
+Uso: python benchmarks/bench_cluster_summary.py --rows 1000000 --features 50 --clusters 8
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from ml_analysis.clustering import summarize_clusters, expand_cluster_summary
+
+def masked_summary(data: pd.DataFrame, features: list, n_clusters: int, extended: bool = False) -> dict:
+    """Implementación anterior: máscara booleana y min/max/mean por cluster
+    (con extended, también std y cuantiles para comparar a igualdad de estadísticas)"""
+    summary = {}
+    for i in range(n_clusters):
+        cluster_data = data[data['Cluster'] == i]
+        summary[f'cluster_{i}'] = {
+            'size': len(cluster_data),
+            'min_values': cluster_data[features].min().to_dict(),
+            'max_values': cluster_data[features].max().to_dict(),
+            'mean_values': cluster_data[features].mean().to_dict()
+        }
+        if extended:
+            summary[f'cluster_{i}']['std_values'] = cluster_data[features].std().to_dict()
+            summary[f'cluster_{i}']['quantiles'] = cluster_data[features].quantile([0.25, 0.5, 0.75]).to_dict()
+    return summary
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--features', type=int, default=50)
+    parser.add_argument('--clusters', type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    features = [f'f{i}' for i in range(args.features)]
+    data = pd.DataFrame(rng.normal(size=(args.rows, args.features)), columns=features)
+    data['Cluster'] = rng.integers(0, args.clusters, size=args.rows)
+    centroids = np.zeros((args.clusters, args.features))
+
+    masked, masked_time = timed(lambda: masked_summary(data, features, args.clusters))
+    _, extended_time = timed(lambda: masked_summary(data, features, args.clusters, extended=True))
+    grouped, grouped_time = timed(lambda: expand_cluster_summary(summarize_clusters(
+        data[features].to_numpy(), data['Cluster'].to_numpy(), centroids, features)))
+
+    assert all(np.allclose(list(masked[name]['mean_values'].values()), list(grouped[name]['mean_values'].values()))
+               for name in masked)
+    print(f"{args.rows:,} filas × {args.features} características, {args.clusters} clusters")
+    print(f"{'método':<34}{'tiempo (s)':>12}")
+    print(f"{'máscaras (min/max/mean)':<34}{masked_time:>12.2f}")
+    print(f"{'máscaras (+std, cuantiles)':<34}{extended_time:>12.2f}")
+    print(f"{'una pasada (+std, cuantiles)':<34}{grouped_time:>12.2f}")
+    print(f"Aceleración a igualdad de estadísticas: {extended_time / grouped_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
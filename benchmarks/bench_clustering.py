@@ -0,0 +1,87 @@
+"""Compara el clustering completo (KMeans en memoria) con el modo incremental
+(MiniBatchKMeans + partial_fit leyendo SQLite por lotes).
+
+Uso: python benchmarks/bench_clustering.py --companies 150 --clusters 5 --db /tmp/bench_clustering.db [--memory]
+
+Con --memory se repite cada ajuste bajo tracemalloc para medir el pico de memoria
+(tracemalloc ralentiza mucho la ejecución, por eso los tiempos se miden sin él).
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from unittest.mock import Mock
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from utils.database import DatabaseManager
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from ml_analysis.clustering import FinancialClustering
+from ml_analysis.feature_engineering import operation_matrix
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def peak_memory(fn) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--companies', type=int, default=150)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--invoices', type=int, nargs=2, default=(100, 140), metavar=('MIN', 'MAX'))
+    parser.add_argument('--clusters', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=100_000)
+    parser.add_argument('--db', default='/tmp/bench_clustering.db')
+    parser.add_argument('--memory', action='store_true', help="Mide también el pico de memoria")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    ledger = SyntheticLedgerGenerator(42).generate(args.companies, args.years, 200, tuple(args.invoices))
+    db = DatabaseManager(args.db)
+    db.add_operations_bulk(ledger, durable=False)
+    del ledger
+    print(f"Operaciones en SQLite: {sum(len(b) for b in db.iter_operations(args.batch_size)):,}")
+
+    def full_fit():
+        operations = db.get_historical_data()
+        conceptos = sorted(operations['concepto'].unique())
+        scaler = StandardScaler()
+        scaled = scaler.fit_transform(operation_matrix(operations, conceptos))
+        model = KMeans(n_clusters=args.clusters, random_state=42).fit(scaled)
+        return model.inertia_
+
+    clustering = FinancialClustering(Mock())
+
+    def streaming_fit():
+        return clustering.fit_streaming(db, n_clusters=args.clusters, batch_size=args.batch_size)
+
+    full_inertia, full_time = timed(full_fit)
+    _, stream_time = timed(streaming_fit)
+    stream_inertia = clustering.streaming_inertia(db, args.batch_size)
+
+    print(f"{'modo':<22}{'tiempo (s)':>12}{'inercia':>18}")
+    print(f"{'KMeans completo':<22}{full_time:>12.2f}{full_inertia:>18,.0f}")
+    print(f"{'MiniBatch streaming':<22}{stream_time:>12.2f}{stream_inertia:>18,.0f}")
+    print(f"Inercia relativa: {stream_inertia / full_inertia:.3f}")
+    if args.memory:
+        print(f"Pico de memoria: completo {peak_memory(full_fit):,.1f} MB, "
+              f"streaming {peak_memory(streaming_fit):,.1f} MB")
+
+    # Actualización incremental tras una nueva ingesta
+    db.add_operations_bulk(SyntheticLedgerGenerator(7).generate(10, 1, 200, (100, 140)))
+    start = time.perf_counter()
+    new_rows = clustering.update_streaming(db, args.batch_size)
+    print(f"Actualización incremental: {new_rows:,} operaciones nuevas en {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
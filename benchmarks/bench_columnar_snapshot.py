@@ -0,0 +1,80 @@
+"""Compara escaneos de columnas sobre la instantánea columnar (np.memmap) frente a
+read_sql_query sobre SQLite: importe total por concepto, una muestra aleatoria y la
+carga de operaciones que usan la previsión y el clustering (load_operations).
+
+Uso: python benchmarks/bench_columnar_snapshot.py --db /tmp/bench_analytics.db
+
+La base de datos puede ser la generada por bench_period_analytics.py. Se miden la
+exportación inicial, la actualización tras ingerir operaciones nuevas y las lecturas.
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from utils.database import DatabaseManager
+from utils.columnar_snapshot import ColumnarSnapshot, load_operations
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def sqlite_totals(db_path: str) -> pd.Series:
+    with sqlite3.connect(db_path) as conn:
+        operations = pd.read_sql_query("SELECT concepto, importe FROM operations", conn)
+    return operations.groupby('concepto')['importe'].sum()
+
+def snapshot_totals(snapshot: ColumnarSnapshot) -> pd.Series:
+    arrays = snapshot.columns(['concepto', 'importe'])
+    totals = np.bincount(arrays['concepto'], weights=arrays['importe'],
+                         minlength=len(snapshot.dictionary('concepto')))
+    return pd.Series(totals, index=snapshot.dictionary('concepto')).sort_index()
+
+def sqlite_sample(db_path: str, n: int) -> pd.DataFrame:
+    with sqlite3.connect(db_path) as conn:
+        return pd.read_sql_query("SELECT fecha, concepto, tipo, importe FROM operations "
+                                 "ORDER BY RANDOM() LIMIT ?", conn, params=(n,))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='/tmp/bench_analytics.db')
+    parser.add_argument('--new-rows', type=int, default=10_000)
+    parser.add_argument('--sample', type=int, default=100_000)
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    snapshot = ColumnarSnapshot(db)
+    added, export_time = timed(snapshot.refresh)
+
+    with sqlite3.connect(args.db) as conn:
+        last = pd.read_sql_query("SELECT fecha, concepto, entidad, tipo, importe FROM operations "
+                                 "ORDER BY id DESC LIMIT ?", conn, params=(args.new_rows,))
+    db.add_operations_bulk(last)
+    _, update_time = timed(snapshot.refresh)
+
+    sql, sql_time = timed(lambda: sqlite_totals(args.db))
+    columnar, columnar_time = timed(lambda: snapshot_totals(snapshot))
+    _, sql_sample_time = timed(lambda: sqlite_sample(args.db, args.sample))
+    _, columnar_sample_time = timed(lambda: snapshot.sample(args.sample, ['fecha', 'concepto', 'tipo', 'importe']))
+    _, historical_time = timed(db.get_historical_data)
+    _, load_time = timed(lambda: load_operations(db))
+
+    print(f"Operaciones: {snapshot.n_rows:,} (exportadas ahora: {added:,})")
+    print(f"Totales coinciden: {np.allclose(sql.to_numpy(), columnar.to_numpy())}")
+    print(f"{'operación':<42}{'tiempo (s)':>12}")
+    print(f"{'exportación inicial':<42}{export_time:>12.2f}")
+    print(f"{f'actualización con {args.new_rows:,} filas nuevas':<42}{update_time:>12.3f}")
+    print(f"{'importe por concepto, SQLite + pandas':<42}{sql_time:>12.2f}")
+    print(f"{'importe por concepto, instantánea':<42}{columnar_time:>12.3f}")
+    print(f"{f'muestra de {args.sample:,}, SQLite':<42}{sql_sample_time:>12.2f}")
+    print(f"{f'muestra de {args.sample:,}, instantánea':<42}{columnar_sample_time:>12.3f}")
+    print(f"{'operaciones, get_historical_data':<42}{historical_time:>12.2f}")
+    print(f"{'operaciones, load_operations':<42}{load_time:>12.2f}")
+
+if __name__ == "__main__":
+    main()
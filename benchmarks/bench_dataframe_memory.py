@@ -0,0 +1,62 @@
+"""Mide la memoria de get_historical_data con tipos compactos frente a la lectura
+directa de SQLite (cadenas object, fecha como texto e importe float64).
+
+Uso: python benchmarks/bench_dataframe_memory.py --db /tmp/bench_analytics.db
+
+La base de datos puede ser la generada por bench_period_analytics.py; si no existe
+se crea un libro sintético de --rows operaciones.
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from utils.database import DatabaseManager
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+
+def megabytes(data: pd.DataFrame) -> float:
+    return data.memory_usage(deep=True).sum() / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='/tmp/bench_analytics.db')
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    with sqlite3.connect(args.db) as conn:
+        existing = conn.execute("SELECT COUNT(*) FROM operations").fetchone()[0]
+    if not existing:
+        companies = max(args.rows // (131 * 12 * 5), 1)
+        for start in range(0, companies, 100):
+            db.add_operations_bulk(SyntheticLedgerGenerator(start).generate(
+                min(100, companies - start), 5, 200, (100, 140), end_date=datetime(2024, 12, 31)), durable=False)
+
+    # La lectura directa completa no cabe junto al resto en máquinas pequeñas: se mide por bloques
+    start = time.perf_counter()
+    raw_mb = 0.0
+    with sqlite3.connect(args.db) as conn:
+        for chunk in pd.read_sql_query("SELECT * FROM operations ORDER BY fecha DESC", conn, chunksize=500_000):
+            chunk = chunk.astype({column: object for column in ['fecha', 'concepto', 'entidad', 'tipo', 'created_at']})
+            raw_mb += megabytes(chunk)
+    raw_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compact = db.get_historical_data()
+    compact_time = time.perf_counter() - start
+    cents = db.get_historical_data(cents=True)
+
+    print(f"Operaciones: {len(compact):,}")
+    print(f"{'lectura':<34}{'memoria (MB)':>14}{'tiempo (s)':>12}")
+    print(f"{'SQLite directo (object)':<34}{raw_mb:>14,.1f}{raw_time:>12.2f}")
+    print(f"{'get_historical_data (compacto)':<34}{megabytes(compact):>14,.1f}{compact_time:>12.2f}")
+    print(f"{'get_historical_data(cents=True)':<34}{megabytes(cents):>14,.1f}")
+    print(f"Reducción: {raw_mb / megabytes(compact):.1f}x")
+    print(compact.dtypes.to_string())
+
+if __name__ == "__main__":
+    main()
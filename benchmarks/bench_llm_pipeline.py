@@ -0,0 +1,73 @@
+"""Benchmark sin red de process_pdf, escenarios y clustering sobre el backend LLM simulado.
+
+Uso: python benchmarks/bench_llm_pipeline.py [--latency-ms 300] [--tps 60] [--rate-limit 0.05]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from config.config import Config
+from config.llm_backends import FakeLLMBackend
+
+def timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:>10.1f} ms")
+    return result, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--tps', type=float, default=60)
+    parser.add_argument('--rate-limit', type=float, default=0.05)
+    parser.add_argument('--pdf', default=os.path.join(Config.DEMO_DIR, 'informe_financiero_2023.pdf'))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Base de datos temporal para que la caché no falsee las mediciones
+    Config.DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+    from config.gpt_client import GPTClient
+    from scenarios.scenario_generator import ScenarioGenerator
+    from ml_analysis.clustering import FinancialClustering
+
+    backend = FakeLLMBackend(args.latency_ms, args.tps, args.rate_limit)
+    client = GPTClient(backend=backend)
+    client.rate_limit_delay = args.latency_ms / 1000
+    context = {'sector': 'Tecnología', 'region': 'Madrid'}
+
+    durations = {'process_pdf': [], 'scenarios': [], 'clustering': []}
+    generator = ScenarioGenerator(client)
+    clustering = FinancialClustering(client)
+    rng = np.random.default_rng(42)
+
+    for run in range(args.runs):
+        if os.path.exists(args.pdf):
+            _, elapsed = timed(f"process_pdf #{run}", client.process_pdf, args.pdf)
+            durations['process_pdf'].append(elapsed)
+
+        financial_data = {'ingresos': 1_000_000 + run * 10_000, 'gastos': 800_000}
+        _, elapsed = timed(f"scenarios #{run}", generator.generate_scenarios, financial_data, context)
+        durations['scenarios'].append(elapsed)
+
+        data = pd.DataFrame(rng.normal(size=(500, 3)) + run, columns=['ingresos', 'gastos', 'margen'])
+        prepared = clustering.prepare_data(data, data.columns.tolist())
+        _, elapsed = timed(f"clustering #{run}", clustering.fit_predict, prepared, 3, context)
+        durations['clustering'].append(elapsed)
+
+    print("\nResumen (llamadas al backend: "
+          f"{backend.calls}, 429 simulados: {backend.rate_limited})")
+    for stage, values in durations.items():
+        if values:
+            print(f"{stage:<14} p50 {np.median(values) * 1000:>8.1f} ms  "
+                  f"throughput {len(values) / sum(values):>6.2f} ops/s")
+    print(client.ledger.get_usage_summary().to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Mide throughput, número de fragmentos y precisión/exhaustividad de process_pdf
+sobre un corpus sintético con verdad de referencia, usando el backend LLM simulado.
+
+Uso: python benchmarks/bench_pdf_extraction.py [--documents 12] [--max-pages 100] [--latency-ms 0]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from config.config import Config
+from config.llm_backends import FakeLLMBackend
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from utils.pdf_corpus_generator import PDFCorpusGenerator, evaluate_extraction
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=12)
+    parser.add_argument('--max-pages', type=int, default=100)
+    parser.add_argument('--companies', type=int, default=5)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    Config.DB_PATH = os.path.join(workdir, 'bench.db')
+    from config.gpt_client import GPTClient
+
+    ledger = SyntheticLedgerGenerator(args.seed).generate(n_companies=args.companies, years=2)
+    start = time.perf_counter()
+    manifest = PDFCorpusGenerator(os.path.join(workdir, 'corpus'), args.seed).generate(
+        ledger, n_documents=args.documents, max_pages=args.max_pages
+    )
+    print(f"Corpus: {len(manifest['documents'])} PDFs, {manifest['total_entries']} operaciones "
+          f"en {time.perf_counter() - start:.2f} s\n")
+
+    client = GPTClient(backend=FakeLLMBackend(latency_ms=args.latency_ms, seed=args.seed))
+    rows = []
+    for document in manifest['documents']:
+        start = time.perf_counter()
+        result = client.process_pdf(document['path'])
+        elapsed = time.perf_counter() - start
+        metrics = evaluate_extraction(result['entries'], document['entries'])
+        rows.append({
+            'kind': document['kind'],
+            'pages': document['pages'],
+            'density': document['rows_per_page'],
+            'chunks': result['stats']['chunks'],
+            'seconds': elapsed,
+            'pages_per_s': document['pages'] / elapsed,
+            'precision': metrics['precision'],
+            'recall': metrics['recall']
+        })
+
+    report = pd.DataFrame(rows)
+    print(report.round(3).to_string(index=False))
+    print("\nPor tipo de documento:")
+    print(report.groupby('kind')[['pages_per_s', 'chunks', 'precision', 'recall']].mean().round(3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compara la analítica de periodos (mes a mes, año a año, acumulados 3/12 meses)
+calculada en SQLite con funciones de ventana frente al cálculo equivalente en pandas.
+
+Uso: python benchmarks/bench_period_analytics.py --rows 5000000 --db /tmp/bench_analytics.db
+
+Se miden la primera llamada (construye los agregados mensuales), una llamada repetida
+(servida de caché), la actualización tras ingerir operaciones nuevas y pandas leyendo
+toda la tabla de operaciones.
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from utils.database import DatabaseManager
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+
+# Filas por empresa y año con 100-140 facturas mensuales (≈120 facturas + 11 gastos fijos)
+ROWS_PER_COMPANY_YEAR = 131 * 12
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def pandas_analytics(db_path: str, by: str) -> pd.DataFrame:
+    """Mismo resultado que DatabaseManager.get_period_analytics, leyendo las operaciones en pandas"""
+    with sqlite3.connect(db_path) as conn:
+        operations = pd.read_sql_query(f"SELECT fecha, {by}, tipo, importe FROM operations", conn)
+    fecha = operations['fecha'].str
+    operations['mes_idx'] = fecha.slice(0, 4).astype(int) * 12 + fecha.slice(5, 7).astype(int) - 1
+    monthly = operations.groupby([by, 'tipo', 'mes_idx'])['importe'].sum()
+
+    # Matriz densa meses × (clave, tipo) para que los desfases respeten los meses vacíos
+    dense = monthly.unstack([by, 'tipo'])
+    dense = dense.reindex(range(dense.index.min(), dense.index.max() + 1))
+    filled = dense.fillna(0.0)
+    result = pd.DataFrame({
+        'importe': dense.stack([by, 'tipo'], future_stack=True),
+        'mes_anterior': dense.shift(1).stack([by, 'tipo'], future_stack=True),
+        'anio_anterior': dense.shift(12).stack([by, 'tipo'], future_stack=True),
+        'acumulado_3m': filled.rolling(3, min_periods=1).sum().stack([by, 'tipo'], future_stack=True),
+        'acumulado_12m': filled.rolling(12, min_periods=1).sum().stack([by, 'tipo'], future_stack=True)
+    }).dropna(subset=['importe'])
+    result['mom'] = result['importe'] - result['mes_anterior']
+    result['yoy'] = result['importe'] - result['anio_anterior']
+    return result.reset_index()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--by', default='entidad', choices=['concepto', 'entidad'])
+    parser.add_argument('--db', default='/tmp/bench_analytics.db')
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    companies = max(args.rows // (ROWS_PER_COMPANY_YEAR * args.years), 1)
+    db = DatabaseManager(args.db)
+    for start in range(0, companies, 100):
+        chunk = SyntheticLedgerGenerator(start).generate(min(100, companies - start), args.years, 200, (100, 140),
+                                                         end_date=datetime(2024, 12, 31))
+        db.add_operations_bulk(chunk, durable=False)
+    with sqlite3.connect(args.db) as conn:
+        n_rows = conn.execute("SELECT COUNT(*) FROM operations").fetchone()[0]
+    print(f"Operaciones en SQLite: {n_rows:,}")
+
+    sql, sql_cold = timed(lambda: db.get_period_analytics(args.by))
+    _, sql_cached = timed(lambda: db.get_period_analytics(args.by))
+    expected, pandas_time = timed(lambda: pandas_analytics(args.db, args.by))
+
+    db.add_operations_bulk(SyntheticLedgerGenerator(99).generate(5, 1, 200, (100, 140),
+                                                                 end_date=datetime(2025, 1, 31)))
+    _, sql_incremental = timed(lambda: db.get_period_analytics(args.by))
+
+    expected = expected.sort_values([args.by, 'tipo', 'mes_idx']).reset_index(drop=True)
+    ok = all(np.allclose(sql[column].to_numpy(), expected[column].to_numpy(), equal_nan=True)
+             for column in ['importe', 'mes_anterior', 'anio_anterior', 'acumulado_3m', 'acumulado_12m'])
+    print(f"Filas de resultado: {len(sql):,} (coinciden con pandas: {ok})")
+    print(f"{'método':<38}{'tiempo (s)':>12}")
+    print(f"{'SQL, primera llamada (agregados)':<38}{sql_cold:>12.2f}")
+    print(f"{'SQL, llamada repetida (caché)':<38}{sql_cached:>12.4f}")
+    print(f"{'SQL, tras ingerir operaciones nuevas':<38}{sql_incremental:>12.2f}")
+    print(f"{'pandas (lectura + cálculo)':<38}{pandas_time:>12.2f}")
+
+if __name__ == "__main__":
+    main()
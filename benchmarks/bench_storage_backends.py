@@ -0,0 +1,78 @@
+"""Compara los backends de almacenamiento analítico (SQLite y DuckDB) en las cargas
+agregadas de la aplicación: escaneos agrupados sobre operations, rollup mensual,
+analítica de periodos con funciones de ventana y pivot de características.
+
+Uso: python benchmarks/bench_storage_backends.py --db /tmp/bench_analytics.db
+
+La base de datos puede ser la generada por bench_period_analytics.py. DuckDB es
+opcional: si no está instalado solo se mide SQLite. Para cada backend se mide la
+sincronización inicial con SQLite y la primera ejecución de cada consulta.
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+from utils.database import DatabaseManager
+from utils.storage_backends import SQLiteBackend, DuckDBBackend, duckdb
+
+# Consultas SQL portables que se ejecutan directamente sobre operations
+SCAN_QUERIES = {
+    'importe por concepto y tipo': """
+        SELECT concepto, tipo, SUM(importe) AS importe, COUNT(*) AS n_operaciones
+        FROM operations GROUP BY concepto, tipo ORDER BY concepto, tipo
+    """,
+    'gasto medio y máximo por entidad': """
+        SELECT entidad, AVG(importe) AS media, MAX(importe) AS maximo
+        FROM operations WHERE tipo = 'Gasto' GROUP BY entidad ORDER BY entidad
+    """
+}
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run_suite(backend):
+    """Tiempos y resultados de cada carga en el backend"""
+    timings, results = {}, {}
+    _, timings['sincronización'] = timed(backend.sync)
+    for name, sql in SCAN_QUERIES.items():
+        results[name], timings[name] = timed(lambda: backend.query(sql))
+    results['rollup mensual'], timings['rollup mensual'] = timed(lambda: backend.monthly_rollup('entidad'))
+    results['analítica de periodos'], timings['analítica de periodos'] = timed(
+        lambda: backend.period_analytics('entidad'))
+    results['pivot de características'], timings['pivot de características'] = timed(backend.feature_pivot)
+    return timings, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default='/tmp/bench_analytics.db')
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    backends = [SQLiteBackend(db)]
+    if duckdb is not None:
+        backends.append(DuckDBBackend(db))
+    else:
+        print("duckdb no está instalado: solo se mide SQLite")
+
+    suites = {backend.name: run_suite(backend) for backend in backends}
+    n_rows = int(backends[0].query("SELECT COUNT(*) AS n FROM operations")['n'].iat[0])
+    print(f"Operaciones: {n_rows:,}")
+    names = list(next(iter(suites.values()))[0])
+    print(f"{'carga':<34}" + ''.join(f"{name:>12}" for name in suites))
+    for name in names:
+        print(f"{name:<34}" + ''.join(f"{timings[name]:>12.3f}" for timings, _ in suites.values()))
+
+    if len(suites) > 1:
+        (_, reference), (_, other) = suites['sqlite'], suites['duckdb']
+        for name in SCAN_QUERIES:
+            same = np.allclose(reference[name].iloc[:, -1].to_numpy(dtype=float),
+                               other[name].iloc[:, -1].to_numpy(dtype=float))
+            print(f"Resultados coinciden ({name}): {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Genera un libro sintético grande para pruebas de carga.
+
+Uso: python benchmarks/generate_ledger.py --companies 1000 --years 5 --invoices 20 40 \\
+         --seed 42 --db data/load_test.db --parquet data/load_test.parquet
+"""
+import os
+import sys
+import time
+import argparse
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--companies', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--invoices', type=int, nargs=2, default=(20, 40), metavar=('MIN', 'MAX'))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--db', help="Base de datos SQLite de destino")
+    parser.add_argument('--parquet', help="Fichero Parquet de destino")
+    args = parser.parse_args()
+
+    generator = SyntheticLedgerGenerator(args.seed)
+    start = time.perf_counter()
+    df = generator.generate(args.companies, args.years, args.clients, tuple(args.invoices))
+    print(f"Generadas {len(df):,} operaciones en {time.perf_counter() - start:.2f} s "
+          f"({df.memory_usage(deep=True).sum() / 1e6:,.1f} MB)")
+
+    if args.parquet:
+        start = time.perf_counter()
+        generator.to_parquet(df, args.parquet)
+        print(f"Parquet escrito en {time.perf_counter() - start:.2f} s: {args.parquet}")
+    if args.db:
+        start = time.perf_counter()
+        generator.to_sqlite(df, args.db)
+        print(f"SQLite cargado en {time.perf_counter() - start:.2f} s: {args.db}")
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,69 @@ class Config:
     MODEL_PRIMARY = "gpt-4"
     MODEL_FALLBACK = "gpt-3.5-turbo"
     MAX_TOKENS = 2000
+    # Tarifas en USD por 1K tokens (prompt, completion)
+    MODEL_PRICING = {
+        "gpt-4": (0.03, 0.06),
+        "gpt-3.5-turbo": (0.0005, 0.0015)
+    }
     
+    # Backend LLM: "openai", "fake" (servidor local simulado) o "cassette" (reproducción)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'openai')
+    LLM_MAX_RETRIES = 3
+    LLM_CASSETTE_PATH = os.getenv('LLM_CASSETTE_PATH', 'data/llm_cassette.json')
+    FAKE_LLM_SETTINGS = {
+        'latency_ms': 300,
+        'tokens_per_second': 60,
+        'rate_limit_probability': 0.05,
+        'seed': 42
+    }
+
+    # Presupuesto de tokens para el contexto del sector en cada prompt
+    CONTEXT_TOKEN_BUDGET = 600
+    PROMPT_FLOAT_DECIMALS = 2
+    # Recuperación local de pasajes relevantes (BM25) en lugar del contexto completo
+    RETRIEVAL_ENABLED = True
+    RETRIEVAL_TOP_K = 5
+
+    # Simulación de escenarios sobre el histórico
+    MONTE_CARLO_PATHS = 20000
+    # Caché de escenarios: importes agrupados en cubos relativos del 1%
+    SCENARIO_CACHE_ENABLED = True
+    SCENARIO_CACHE_TOLERANCE = 0.01
+    # Generación de escenarios en lote para una cartera de empresas
+    PORTFOLIO_MAX_WORKERS = 4
+
+    # Selección automática del número de clusters
+    CLUSTER_K_RANGE = (2, 8)
+    CLUSTER_SILHOUETTE_SAMPLE = 10000
+    CLUSTER_PARALLEL_MIN_ROWS = 5000
+    # Aumento relativo de la distancia media a los centroides que obliga a reajustar
+    CLUSTER_DRIFT_THRESHOLD = 0.25
+    # Caché de interpretaciones: centroides redondeados a 3 cifras significativas
+    CLUSTER_INTERPRETATION_CACHE_ENABLED = True
+    CLUSTER_FINGERPRINT_DIGITS = 3
+
+    # Detección de anomalías en la ingesta (puntuación z robusta sobre mediana/MAD)
+    ANOMALY_THRESHOLD = 3.5
+    ANOMALY_MIN_COUNT = 10
+    ANOMALY_DUPLICATE_WINDOW_DAYS = 7
+    ANOMALY_ISOLATION_FOREST = False
+    ANOMALY_FOREST_CONTAMINATION = 0.01
+    ANOMALY_FOREST_REFRESH_ROWS = 50_000
+
     DB_PATH = "data/finance.db"
+    # Caché en memoria de consultas, invalidada por la versión de datos de operations
+    QUERY_CACHE_ENABLED = True
+    QUERY_CACHE_MAX_ENTRIES = 64
+    # Memoria máxima (bytes, memory_usage profundo) de los resultados cacheados
+    QUERY_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    # Entradas máximas (LRU) de las cachés en memoria de previsiones, características y selección de k
+    ANALYSIS_CACHE_MAX_ENTRIES = 16
+    # Instantánea columnar de operations (ficheros por columna junto a la base de datos)
+    COLUMNAR_SNAPSHOT_ENABLED = True
+    SNAPSHOT_BATCH_ROWS = 250_000
+    # Motor de las consultas analíticas: 'sqlite' o 'duckdb' (opcional, réplica de SQLite)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
     CACHE_ENABLED = True
     CACHE_TTL = 86400  # 24 hours
     
@@ -21,9 +82,9 @@ class Config:
     DEMO_DIR = os.path.join(DATA_DIR, 'demo')
     
     @classmethod
-    def validate_config(cls):
+    def validate_config(cls, require_api_key: bool = True):
         """Valida la configuración y crea directorios necesarios"""
-        if not cls.get_api_key():
+        if require_api_key and not cls.get_api_key():
             raise ValueError("OPENAI_API_KEY no está configurada")
             
         # Crear directorios necesarios
@@ -6,24 +6,32 @@ import time
 import os
 from typing import Dict, Any, Optional, List
 from .config import Config
+from .llm_backends import LLMBackend, OpenAIBackend, RateLimitExceeded, create_backend
 from utils.database import DatabaseManager
+from utils.usage_ledger import UsageLedger
+from utils.token_budget import TokenBudgeter
+from utils.retrieval import ContextRetriever
 from googleapiclient.discovery import build
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
 class GPTClient:
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None):
         load_dotenv()
-        Config.validate_config()
+        self.backend = backend or create_backend()
+        Config.validate_config(require_api_key=isinstance(self.backend, OpenAIBackend))
         self.api_key = Config.get_api_key()
         self.search_api_key = os.getenv('GOOGLE_SEARCH_API_KEY')
         self.search_engine_id = os.getenv('GOOGLE_SEARCH_ENGINE_ID')
         openai.api_key = self.api_key
         self.model = Config.MODEL_PRIMARY
         self.db = DatabaseManager(Config.DB_PATH)
+        self.ledger = UsageLedger(Config.DB_PATH)
+        self.budgeter = TokenBudgeter()
         self.rate_limit_delay = 1
         self.context_file = "company_context.txt"
+        self.retriever = ContextRetriever(Config.DB_PATH, self.context_file)
 
     def _search_chrome(self, sector: str, region: str) -> str:
         """Realiza búsqueda en Chrome usando Custom Search API"""
@@ -79,7 +87,7 @@ class GPTClient:
                 """}
             ]
 
-            context = self._make_request(messages, temperature=0.7)
+            context = self._make_request(messages, temperature=0.7, feature='context')
 
             # Guardar contexto en archivo
             with open(self.context_file, 'w', encoding='utf-8') as f:
@@ -102,34 +110,82 @@ class GPTClient:
             logger.error(f"Error leyendo contexto: {e}")
             return ""
 
-    def _make_request(self, messages: list, temperature: float = 0.7) -> str:
+    def _complete(self, messages: list, temperature: float, model: Optional[str] = None):
+        """Llama al backend reintentando con espera exponencial ante errores 429"""
+        for attempt in range(Config.LLM_MAX_RETRIES + 1):
+            try:
+                return self.backend.complete(messages, model or self.model, temperature, Config.MAX_TOKENS)
+            except RateLimitExceeded:
+                if attempt == Config.LLM_MAX_RETRIES:
+                    raise
+                logger.warning(f"Límite de peticiones alcanzado, reintento {attempt + 1}")
+                time.sleep(self.rate_limit_delay * 2 ** attempt)
+
+    def _build_context(self, query: str) -> tuple:
+        """Selecciona los pasajes del contexto guardado más relevantes para la consulta y
+        devuelve el texto junto a los tokens ahorrados"""
+        saved_context = self._get_saved_context()
+        candidates = saved_context
+        if Config.RETRIEVAL_ENABLED:
+            try:
+                passages = self.retriever.retrieve(query)
+                if passages:
+                    candidates = "\n\n".join(passages)
+            except Exception as e:
+                logger.warning(f"Error recuperando pasajes, se usa el contexto completo: {e}")
+        selected = self.budgeter.select_context(candidates, query)
+        tokens_saved = max(self.budgeter.count_tokens(saved_context) - self.budgeter.count_tokens(selected), 0)
+        return selected, tokens_saved
+
+    def _make_request(self, messages: list, temperature: float = 0.7, feature: str = 'general',
+                      tokens_saved: int = 0, model: Optional[str] = None) -> str:
+        # Modelo de esta llamada: el cliente se comparte entre hilos, así que el fallback no
+        # puede cambiar self.model para las demás
+        model = model or self.model
+        start = time.perf_counter()
         cache_key = str(messages)
         cached_response = self.db.get_cached_response(cache_key)
         if cached_response:
+            self.ledger.record(
+                feature, model, 'db',
+                self.budgeter.count_messages(messages), self.budgeter.count_tokens(cached_response),
+                (time.perf_counter() - start) * 1000, tokens_saved=tokens_saved
+            )
             return cached_response
 
         try:
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=Config.MAX_TOKENS
+            response = self._complete(messages, temperature, model)
+            result = response.content
+            prompt_tokens = response.prompt_tokens or self.budgeter.count_messages(messages)
+            completion_tokens = response.completion_tokens or self.budgeter.count_tokens(result or "")
+            self.ledger.record(
+                feature, model, 'none', prompt_tokens, completion_tokens,
+                (time.perf_counter() - start) * 1000, tokens_saved=tokens_saved
             )
-            result = response.choices[0].message.content
             self.db.cache_gpt_response(cache_key, result)
             return result
         except Exception as e:
             logger.error(f"Error en GPT request: {e}")
-            if self.model == Config.MODEL_PRIMARY:
-                self.model = Config.MODEL_FALLBACK
+            self.ledger.record(
+                feature, model, 'none', self.budgeter.count_messages(messages), 0,
+                (time.perf_counter() - start) * 1000, success=False
+            )
+            if model == Config.MODEL_PRIMARY:
                 time.sleep(self.rate_limit_delay)
-                return self._make_request(messages, temperature)
+                return self._make_request(messages, temperature, feature, tokens_saved,
+                                          model=Config.MODEL_FALLBACK)
             raise
 
-    def generate_financial_opinion(self, data: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
+    def generate_financial_opinion(self, data: Dict[str, Any], context: Optional[Dict[str, Any]] = None,
+                                   feature: str = 'opinion') -> str:
         """Genera una opinión financiera basada en los datos proporcionados"""
         try:
-            saved_context = self._get_saved_context()
+            context = context or {}
+            payload = self.budgeter.compact_json(data)
+            saved_context, tokens_saved = self._build_context(payload)
+            if not isinstance(data, str):
+                tokens_saved += (self.budgeter.count_tokens(json.dumps(data, ensure_ascii=False, indent=2, default=str))
+                                 - self.budgeter.count_tokens(payload))
             
             messages = [
                 {"role": "system", "content": f"""Eres un experto en análisis financiero.
@@ -141,10 +197,11 @@ class GPTClient:
                     Región: {context.get('region', 'No especificada')}
                     
                     Analiza estos datos y proporciona recomendaciones concretas:
-                    {json.dumps(data, ensure_ascii=False, indent=2)}
+                    {payload}
                 """}
             ]
-            return self._make_request(messages)
+            self._log_budget(feature, messages, tokens_saved)
+            return self._make_request(messages, feature=feature, tokens_saved=tokens_saved)
         except Exception as e:
             logger.error(f"Error generando opinión financiera: {e}")
             raise
@@ -152,8 +209,8 @@ class GPTClient:
     def generate_scenarios(self, financial_data: Dict[str, Any], context: Dict[str, Any]) -> str:
         """Genera escenarios financieros basados en los datos y contexto proporcionados"""
         try:
-            # Obtener el contexto guardado
-            saved_context = self._get_saved_context()
+            # Obtener las secciones relevantes del contexto guardado
+            saved_context, tokens_saved = self._build_context(str(financial_data))
             
             messages = [
                 {"role": "system", "content": f"""Eres un experto analista financiero 
@@ -169,30 +226,39 @@ class GPTClient:
                     {financial_data}
                 """}
             ]
-            return self._make_request(messages, temperature=0.7)
+            self._log_budget('scenarios', messages, tokens_saved)
+            return self._make_request(messages, temperature=0.7, feature='scenarios', tokens_saved=tokens_saved)
             
         except Exception as e:
             logger.error(f"Error generando escenarios: {e}")
             raise
 
+    def _log_budget(self, feature: str, messages: list, tokens_saved: int):
+        final_tokens = self.budgeter.count_messages(messages)
+        report = self.budgeter.report(final_tokens + tokens_saved, final_tokens)
+        if report['tokens_saved']:
+            logger.info(f"Prompt '{feature}' recortado: {report['original_tokens']} -> "
+                        f"{report['final_tokens']} tokens (-{report['reduction_pct']:.1f}%)")
+
     def process_pdf(self, file_data) -> dict:
         try:
             import PyPDF2
+
+            def extract_text(stream) -> str:
+                pdf = PyPDF2.PdfReader(stream)
+                return "".join(page.extract_text() + "\n" for page in pdf.pages)
+
             if hasattr(file_data, 'read'):
-                pdf = PyPDF2.PdfReader(file_data)
+                text = extract_text(file_data)
             else:
+                # Las páginas se leen de forma perezosa: el fichero debe seguir abierto
                 with open(file_data, 'rb') as f:
-                    pdf = PyPDF2.PdfReader(f)
-            
-            text = ""
-            for page in pdf.pages:
-                text += page.extract_text() + "\n"
+                    text = extract_text(f)
             
             chunks = [text[i:i+2000] for i in range(0, len(text), 2000)]
             
             all_entries = []
             for chunk in chunks:
-                time.sleep(self.rate_limit_delay)
                 result = self._make_extraction_request(chunk)
                 all_entries.extend(result.get('entries', []))
 
@@ -201,7 +267,12 @@ class GPTClient:
             
             return {
                 'entries': best_entries,
-                'summary': summary
+                'summary': summary,
+                'stats': {
+                    'characters': len(text),
+                    'chunks': len(chunks),
+                    'raw_entries': len(all_entries)
+                }
             }
 
         except Exception as e:
@@ -237,7 +308,7 @@ class GPTClient:
             {"role": "user", "content": text}
         ]
         
-        result = self._make_request(messages, temperature=0.1)
+        result = self._make_request(messages, temperature=0.1, feature='pdf_extraction')
         try:
             return json.loads(result)
         except json.JSONDecodeError:
@@ -276,7 +347,7 @@ class GPTClient:
                 {"role": "user", "content": resumen_prompt}
             ]
             
-            return self._make_request(messages, temperature=0.3)
+            return self._make_request(messages, temperature=0.3, feature='pdf_summary')
         except Exception as e:
             logger.error(f"Error generando resumen: {e}")
             return "No se pudo generar el resumen"
\ No newline at end of file
@@ -0,0 +1,196 @@
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+import openai
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class LLMResponse:
+    content: str
+    model: str
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+class RateLimitExceeded(Exception):
+    """El backend ha rechazado la petición por límite de uso (HTTP 429)"""
+
+class CassetteMissError(KeyError):
+    """No hay respuesta grabada para la petición en modo reproducción"""
+
+class LLMBackend(ABC):
+    """Interfaz común de los backends de chat completions"""
+
+    name = "base"
+
+    @abstractmethod
+    def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> LLMResponse:
+        """Respuesta del modelo a los mensajes"""
+
+class OpenAIBackend(LLMBackend):
+    """Backend real sobre la API de OpenAI"""
+
+    name = "openai"
+
+    def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> LLMResponse:
+        try:
+            response = openai.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        except openai.RateLimitError as e:
+            raise RateLimitExceeded(str(e)) from e
+
+        usage = getattr(response, 'usage', None)
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        completion_tokens = getattr(usage, 'completion_tokens', None)
+        return LLMResponse(
+            content=response.choices[0].message.content,
+            model=model,
+            prompt_tokens=prompt_tokens if isinstance(prompt_tokens, int) else None,
+            completion_tokens=completion_tokens if isinstance(completion_tokens, int) else None
+        )
+
+class CassetteBackend(LLMBackend):
+    """Graba las respuestas de otro backend en un fichero JSON y las reproduce sin red"""
+
+    name = "cassette"
+
+    def __init__(self, path: str, mode: str = "replay", backend: Optional[LLMBackend] = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Modo de cassette no válido: {mode}")
+        if mode == "record" and backend is None:
+            raise ValueError("El modo record necesita un backend al que delegar")
+        self.path = path
+        self.mode = mode
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+
+    @staticmethod
+    def _key(messages: List[dict], model: str, temperature: float) -> str:
+        payload = json.dumps([messages, model, temperature], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> LLMResponse:
+        key = self._key(messages, model, temperature)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return LLMResponse(**entry)
+        if self.mode == "replay":
+            raise CassetteMissError(f"Petición no grabada en {self.path}")
+
+        response = self.backend.complete(messages, model, temperature, max_tokens)
+        with self._lock:
+            self._entries[key] = response.__dict__.copy()
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        return response
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def default_fake_responder(messages: List[dict]) -> str:
+    """Respuestas deterministas con la forma que espera cada funcionalidad"""
+    prompt = "\n".join(message.get('content', '') for message in messages)
+
+    if '"entries"' in prompt:
+        # Extracción: interpreta líneas "fecha | concepto | entidad | tipo | importe"
+        entries = []
+        for line in messages[-1].get('content', '').splitlines():
+            match = re.match(r"\s*(\d{4}-\d{2}-\d{2})\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(Ingreso|Gasto)\s*\|\s*(-?[\d.,]+)", line)
+            if match:
+                fecha, concepto, entidad, tipo, importe = match.groups()
+                entries.append({
+                    'fecha': fecha, 'concepto': concepto, 'entidad': entidad, 'tipo': tipo,
+                    'importe': float(importe.replace(',', '')), 'confianza': 0.9
+                })
+        return json.dumps({'entries': entries}, ensure_ascii=False)
+
+    if '"optimista"' in prompt and '"pesimista"' in prompt:
+        def amount(label: str) -> float:
+            match = re.search(rf"{label}:\s*(-?[\d,]+(?:\.\d+)?)", prompt)
+            return float(match.group(1).replace(',', '')) if match else 0.0
+
+        ingresos, gastos = amount('Ingresos'), amount('Gastos')
+        scenarios = {}
+        for name, growth, inflation in [('base', 0.03, 0.02), ('optimista', 0.10, 0.03), ('pesimista', -0.08, 0.05)]:
+            proj_ingresos = ingresos * (1 + growth)
+            proj_gastos = gastos * (1 + inflation)
+            beneficio = proj_ingresos - proj_gastos
+            scenarios[name] = {
+                'descripcion': f"Escenario {name} simulado",
+                'proyecciones': {
+                    'ingresos': round(proj_ingresos, 2),
+                    'gastos': round(proj_gastos, 2),
+                    'beneficio': round(beneficio, 2),
+                    'margen': round(beneficio / proj_ingresos * 100, 2) if proj_ingresos else 0
+                },
+                'supuestos': [f"Crecimiento de ingresos del {growth:.0%}", f"Inflación de costes del {inflation:.0%}"]
+            }
+        return json.dumps(scenarios, ensure_ascii=False)
+
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]
+    return f"Análisis simulado {digest}: la situación financiera es estable y se recomienda vigilar los gastos."
+
+class FakeLLMBackend(LLMBackend):
+    """Servidor local simulado: latencia, velocidad de generación y errores 429 configurables
+    y reproducibles con una semilla"""
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, tokens_per_second: Optional[float] = None,
+                 rate_limit_probability: float = 0.0, seed: int = 42,
+                 responder: Optional[Callable[[List[dict]], str]] = None):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_probability = rate_limit_probability
+        self.responder = responder or default_fake_responder
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+
+    def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> LLMResponse:
+        with self._lock:
+            self.calls += 1
+            limited = self._rng.random() < self.rate_limit_probability
+            if limited:
+                self.rate_limited += 1
+        if limited:
+            time.sleep(self.latency_ms / 1000)
+            raise RateLimitExceeded("429 simulado")
+
+        content = self.responder(messages)
+        prompt_tokens = sum(_estimate_tokens(message.get('content', '')) for message in messages)
+        completion_tokens = min(_estimate_tokens(content), max_tokens)
+        delay = self.latency_ms / 1000
+        if self.tokens_per_second:
+            delay += completion_tokens / self.tokens_per_second
+        time.sleep(delay)
+        return LLMResponse(content, model, prompt_tokens, completion_tokens)
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """Crea el backend configurado en Config.LLM_BACKEND"""
+    name = name or Config.LLM_BACKEND
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "fake":
+        return FakeLLMBackend(**Config.FAKE_LLM_SETTINGS)
+    if name == "cassette":
+        return CassetteBackend(Config.LLM_CASSETTE_PATH, mode="replay")
+    raise ValueError(f"Backend LLM desconocido: {name}")
@@ -7,10 +7,18 @@ from typing import Dict, Any
 import base64
 from config.gpt_client import GPTClient
 from scenarios.scenario_generator import ScenarioGenerator
+from scenarios.forecasting import CashFlowForecaster
+from scenarios.sensitivity import SensitivityAnalyzer
+from scenarios.scenario_cache import ScenarioCache
+from scenarios.orchestrator import ScenarioOrchestrator
 from visualization.scenario_visualizer import ScenarioVisualizer
 from ml_analysis.clustering import FinancialClustering
+from ml_analysis.anomaly_detection import AnomalyDetector
 from utils.demo_data_generator import DemoDataGenerator
 from utils.database import DatabaseManager
+from utils.storage_backends import create_storage_backend
+from utils.columnar_snapshot import load_operations
+from utils.usage_ledger import UsageLedger
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,6 +28,12 @@ REGIONES = ["Andalucía", "Aragón", "Asturias", "Baleares", "Canarias", "Cantab
            "Castilla y León", "Castilla-La Mancha", "Cataluña", "Valencia", "Extremadura", 
            "Galicia", "Madrid", "Murcia", "Navarra", "País Vasco", "La Rioja"]
 
+def process_ingested_operations(db: DatabaseManager):
+   """Tras cada ingesta, procesa las operaciones nuevas en segundo plano sin bloquear la interfaz:
+   detección de anomalías y puesta al día del backend analítico"""
+   AnomalyDetector.for_database(db).process_new_async()
+   create_storage_backend(db).sync_async()
+
 def get_base64_of_bin_file(bin_file):
    with open(bin_file, 'rb') as f:
        data = f.read()
@@ -45,12 +59,23 @@ def initialize_session_state():
        'financial_data': None,
        'scenarios': None,
        'company_context': None,
-       'historical_data': None
+       'historical_data': None,
+       'forecast': None,
+       # (versión de datos, operaciones) para no releer el libro en cada rerun
+       'operations': None
    }
    for key, default_value in default_states.items():
        if key not in st.session_state:
            st.session_state[key] = default_value
 
+def get_operations(db: DatabaseManager) -> pd.DataFrame:
+   """Operaciones para los análisis, reutilizadas entre reruns mientras no cambie la versión de datos"""
+   version = (db.db_path, db.get_data_version('instance'), db.get_data_version())
+   cached = st.session_state.operations
+   if cached is None or cached[0] != version:
+       cached = st.session_state.operations = (version, load_operations(db))
+   return cached[1]
+
 def company_context_form():
     if st.session_state.company_context is None:
         st.header("🏢 Configuración Inicial de la Empresa")
@@ -110,6 +135,7 @@ def show_historical_data(db: DatabaseManager):
        if submit:
            try:
                db.add_operation(fecha, concepto, entidad, tipo, importe)
+               process_ingested_operations(db)
                st.success("✅ Operación guardada correctamente")
            except Exception as e:
                st.error(f"❌ Error al guardar: {str(e)}")
@@ -132,24 +158,60 @@ def show_historical_data(db: DatabaseManager):
            
            csv = data.to_csv(index=False)
            st.download_button("Descargar CSV", csv, "historical_data.csv", "text/csv")
+           
+           show_period_analytics(db)
+           show_operation_flags(db)
        else:
            st.info("ℹ️ No se encontraron datos con los filtros actuales")
            
    except Exception as e:
        st.error(f"❌ Error al cargar datos: {str(e)}")
 
-def prepare_clustering_data(financial_data: Dict[str, float]) -> pd.DataFrame:
-   base_data = pd.DataFrame([financial_data])
-   variations = []
+def show_period_analytics(db: DatabaseManager):
+   """Variaciones mes a mes, año a año y acumulados del último mes con datos"""
+   st.subheader("📈 Evolución por Periodo")
+   by = st.radio("Agrupar por", ["concepto", "entidad"], horizontal=True)
+   try:
+       backend = create_storage_backend(db)
+       if backend.is_current():
+           analytics = backend.period_analytics(by)
+       else:
+           # La réplica se pone al día en segundo plano; mientras tanto responde SQLite
+           backend.sync_async()
+           analytics = db.get_period_analytics(by)
+   except Exception as e:
+       st.warning(f"⚠️ No se pudo calcular la evolución por periodo: {str(e)}")
+       return
+   if analytics.empty:
+       return
    
-   for variation in [-0.15, -0.10, -0.05, 0.05, 0.10, 0.15]:
-       variation_data = {
-           'ingresos': financial_data['ingresos'] * (1 + variation),
-           'gastos': financial_data['gastos'] * (1 + variation)
-       }
-       variations.append(variation_data)
+   last_month = analytics['mes'].max()
+   st.caption(f"Último mes: {last_month}")
+   st.dataframe(analytics[analytics['mes'] == last_month][
+       [by, 'tipo', 'importe', 'mom_pct', 'yoy_pct', 'acumulado_3m', 'acumulado_12m']
+   ].round(2), hide_index=True)
+
+def show_operation_flags(db: DatabaseManager):
+   """Muestra las anomalías detectadas (las marcas se calculan en segundo plano al ingerir)"""
+   try:
+       # Recupera en segundo plano lo ingerido por otras vías; se muestran las marcas ya calculadas
+       process_ingested_operations(db)
+       flags = db.get_operation_flags()
+   except Exception as e:
+       st.warning(f"⚠️ No se pudo ejecutar la detección de anomalías: {str(e)}")
+       return
+   
+   st.subheader("🚨 Operaciones Marcadas")
+   if flags.empty:
+       st.success("✅ No se han detectado anomalías")
+       return
    
-   return pd.concat([base_data, pd.DataFrame(variations)], ignore_index=True)
+   col1, col2 = st.columns(2)
+   with col1:
+       st.metric("Importes atípicos", int((flags['flag'] == 'importe_atipico').sum()))
+   with col2:
+       st.metric("Posibles duplicados", int((flags['flag'] == 'duplicado').sum()))
+   st.dataframe(flags)
 
 def display_pdf_data(pdf_data: dict, db: DatabaseManager):
    st.subheader("📝 Resumen Ejecutivo")
@@ -174,25 +236,139 @@ def display_pdf_data(pdf_data: dict, db: DatabaseManager):
                
                if st.form_submit_button("💾 Guardar Registro"):
                    db.add_operation(fecha, concepto, entidad, tipo, importe)
+                   process_ingested_operations(db)
                    st.success("✅ Registro guardado correctamente")
 
-def display_visualizations(scenarios: dict, visualizer: ScenarioVisualizer):
+def show_usage_panel(ledger: UsageLedger, scenario_cache: ScenarioCache = None):
+   with st.expander("⏱️ Consumo de GPT"):
+       try:
+           totals = ledger.get_totals()
+           col1, col2 = st.columns(2)
+           with col1:
+               st.metric("Llamadas", totals['calls'])
+               st.metric("Tokens", f"{totals['tokens']:,}")
+           with col2:
+               st.metric("Coste", f"${totals['cost']:,.4f}")
+               st.metric("Aciertos caché", f"{totals['cache_hit_ratio'] * 100:.1f}%")
+
+           savings = ledger.estimate_latency_savings()
+           if savings['tokens_saved']:
+               st.metric("Tokens ahorrados", f"{savings['tokens_saved']:,}",
+                         f"-{savings['latency_saved_ms'] / 1000:,.1f} s")
+
+           if scenario_cache is not None:
+               stats = scenario_cache.stats()
+               st.metric("Aciertos caché de escenarios", f"{stats['hit_ratio'] * 100:.1f}%",
+                         f"{stats['hits']} de {stats['hits'] + stats['misses']}")
+
+           summary = ledger.get_usage_summary()
+           if not summary.empty:
+               st.dataframe(
+                   summary[['feature', 'calls', 'p50_latency_ms', 'p95_latency_ms',
+                            'prompt_tokens', 'completion_tokens']].set_index('feature').round(1)
+               )
+       except Exception as e:
+           st.error(f"❌ Error al cargar el consumo: {str(e)}")
+
+def display_visualizations(scenarios: dict, visualizer: ScenarioVisualizer, forecast: dict = None):
    try:
        st.subheader("📈 Comparativa de Ingresos")
        fig_ingresos = visualizer.create_comparison_chart(scenarios, 'ingresos')
        st.plotly_chart(fig_ingresos, use_container_width=True)
        
        st.subheader("📊 Dashboard de Métricas")
-       metrics = ['ingresos', 'beneficio_neto', 'margen_bruto']
+       metrics = ['ingresos', 'beneficio', 'margen']
        fig_dashboard = visualizer.create_metrics_dashboard(scenarios, metrics)
        st.plotly_chart(fig_dashboard, use_container_width=True)
        
        st.subheader("📈 Proyección Temporal")
-       fig_timeline = visualizer.create_timeline_chart(scenarios, 'ingresos')
+       fig_timeline = visualizer.create_timeline_chart(scenarios, 'ingresos', forecast=forecast)
        st.plotly_chart(fig_timeline, use_container_width=True)
+       
+       if forecast is not None:
+           st.subheader("🔮 Previsión Mensual de Caja")
+           for series in ['Total Ingresos', 'Total Gastos']:
+               st.plotly_chart(visualizer.create_forecast_chart(forecast, series), use_container_width=True)
    except Exception as e:
        st.error(f"❌ Error en visualizaciones: {str(e)}")
 
+def show_sensitivity_analysis(historical: pd.DataFrame, financial_data: dict, visualizer: ScenarioVisualizer):
+   """Mapa de sensibilidad del margen frente a crecimiento de ingresos e inflación de costes"""
+   with st.expander("🎛️ Análisis de Sensibilidad"):
+       try:
+           col1, col2, col3 = st.columns(3)
+           growth_range = col1.slider("Crecimiento de ingresos (%)", -50, 100, (-20, 30))
+           inflation_range = col2.slider("Inflación de costes (%)", -20, 50, (-5, 15))
+           variable_share = col3.slider("Gastos variables (%)", 0, 100, 0)
+           metric = st.selectbox("Métrica", ['margen', 'beneficio', 'gastos'])
+
+           if historical is not None and not historical.empty:
+               analyzer = SensitivityAnalyzer.from_operations(historical, variable_cost_share=variable_share / 100)
+           else:
+               analyzer = SensitivityAnalyzer.from_financial_data(financial_data, variable_cost_share=variable_share / 100)
+           grid = analyzer.grid(
+               growth_range=(growth_range[0] / 100, growth_range[1] / 100),
+               inflation_range=(inflation_range[0] / 100, inflation_range[1] / 100)
+           )
+           st.plotly_chart(visualizer.create_sensitivity_heatmap(grid, metric), use_container_width=True)
+       except Exception as e:
+           st.error(f"❌ Error en el análisis de sensibilidad: {str(e)}")
+
+def show_scenarios(scenarios):
+   st.success("✅ Escenarios generados correctamente")
+   for scenario_name, scenario_data in scenarios.items():
+       with st.expander(f"Escenario {scenario_name.capitalize()}"):
+           st.write("📝 Descripción:")
+           st.write(scenario_data['descripcion'])
+           
+           st.write("🔢 Proyecciones:")
+           st.dataframe(pd.DataFrame([scenario_data.proyecciones.to_dict()]))
+           
+           st.write("📋 Supuestos:")
+           for supuesto in scenario_data['supuestos']:
+               st.write(f"• {supuesto}")
+
+def run_scenario_pipeline(orchestrator: ScenarioOrchestrator, generate, forecast=None):
+   """Muestra cada etapa del flujo de escenarios en su hueco en cuanto termina"""
+   titles = {
+       'comparison': "📈 Comparativa de Ingresos",
+       'dashboard': "📊 Dashboard de Métricas",
+       'timeline': "📈 Proyección Temporal",
+       'forecast_chart': "🔮 Previsión Mensual de Caja",
+       'analysis': "📝 Análisis Detallado"
+   }
+   slots = {name: st.empty() for name in ['scenarios', *titles]}
+   slots['scenarios'].info("🔄 Generando escenarios...")
+
+   for stage in orchestrator.run(generate, st.session_state.company_context, forecast):
+       if stage.error is not None:
+           if stage.name in slots:
+               slots[stage.name].error(f"❌ Error en {stage.name}: {str(stage.error)}")
+           continue
+
+       if stage.name == 'forecast':
+           st.session_state.forecast = stage.value
+           continue
+       if stage.name == 'scenarios':
+           st.session_state.scenarios = stage.value
+           with slots['scenarios'].container():
+               show_scenarios(stage.value)
+           for name in titles:
+               slots[name].info(f"🔄 {titles[name]}...")
+           continue
+
+       with slots[stage.name].container():
+           st.subheader(titles[stage.name])
+           if stage.name == 'analysis':
+               st.write(stage.value)
+           else:
+               for fig in (stage.value if isinstance(stage.value, list) else [stage.value]):
+                   st.plotly_chart(fig, use_container_width=True)
+
+   if 'forecast_chart' not in orchestrator.timings:
+       slots['forecast_chart'].empty()
+   logger.info(f"Tiempos por etapa (ms): {orchestrator.timings}")
+
 
 def main():
    try:
@@ -226,6 +402,7 @@ def main():
                        demo_gen = DemoDataGenerator()
                        paths = demo_gen.generate_all_demo_data()
                        df = pd.read_csv(paths['csv_path'])
+                       process_ingested_operations(db)
                        st.session_state.financial_data = {
                            'ingresos': df[df['tipo'] == 'Ingreso']['importe'].sum(),
                            'gastos': df[df['tipo'] == 'Gasto']['importe'].sum()
@@ -246,14 +423,8 @@ def main():
                         
                        # Insertar datos en la base de datos
                        db = DatabaseManager()
-                       for _, row in df.iterrows():
-                           db.add_operation(
-                               fecha=row['fecha'],
-                               concepto=row['concepto'],
-                               entidad=row['entidad'],
-                               tipo=row['tipo'],
-                               importe=float(row['importe'])
-                           )
+                       db.add_operations_bulk(df)
+                       process_ingested_operations(db)
                         
                        # Actualizar totales en session_state
                        st.session_state.financial_data = {
@@ -299,68 +470,63 @@ def main():
                        }
                        st.success("✅ Datos guardados correctamente")
 
+           show_usage_panel(gpt_client.ledger, scenario_generator.cache)
+
        if st.session_state.financial_data is not None:
            tabs = st.tabs(["📈 Escenarios", "🔍 Clustering", "📊 Visualización", "📋 Histórico"])
            
            with tabs[0]:
                st.header("Generación de Escenarios")
+               historical = get_operations(db)
+               use_history = not historical.empty and st.checkbox(
+                   "Calcular con simulación Monte Carlo sobre el histórico", value=True)
                if st.button("Generar Escenarios"):
-                   with st.spinner("🔄 Generando escenarios..."):
-                       try:
-                           logger.info(f"Financial data: {st.session_state.financial_data}")
-                           logger.info(f"Context: {st.session_state.company_context}")
-                           
-                           st.session_state.scenarios = scenario_generator.generate_scenarios(
-                               st.session_state.financial_data,
-                               st.session_state.company_context
-                           )
-                           
-                           if st.session_state.scenarios:
-                               st.success("✅ Escenarios generados correctamente")
-                               
-                               for scenario_name, scenario_data in st.session_state.scenarios.items():
-                                   with st.expander(f"Escenario {scenario_name.capitalize()}"):
-                                       st.write("📝 Descripción:")
-                                       st.write(scenario_data['descripcion'])
-                                       
-                                       st.write("🔢 Proyecciones:")
-                                       st.dataframe(pd.DataFrame([scenario_data['proyecciones']]))
-                                       
-                                       st.write("📋 Supuestos:")
-                                       for supuesto in scenario_data['supuestos']:
-                                           st.write(f"• {supuesto}")
-                               
-                               display_visualizations(st.session_state.scenarios, visualizer)
-                               
-                               st.subheader("📝 Análisis Detallado")
-                               analysis = scenario_generator.generate_detailed_analysis(
-                                   st.session_state.scenarios,
-                                   st.session_state.company_context
-                               )
-                               st.write(analysis)
-                       except Exception as e:
-                           st.error(f"❌ Error al generar escenarios: {str(e)}")
+                   logger.info(f"Financial data: {st.session_state.financial_data}")
+                   logger.info(f"Context: {st.session_state.company_context}")
+                   # Los hilos de trabajo no pueden leer st.session_state: se capturan los valores aquí
+                   context = st.session_state.company_context
+                   financial_data = st.session_state.financial_data
+                   if use_history:
+                       generate = lambda: scenario_generator.generate_scenarios_from_history(historical, context)
+                   else:
+                       generate = lambda: scenario_generator.generate_scenarios(financial_data, context)
+                   forecast = None if historical.empty else (lambda: CashFlowForecaster().forecast(historical))
+                   run_scenario_pipeline(ScenarioOrchestrator(scenario_generator, visualizer),
+                                         generate, forecast)
+               
+               show_sensitivity_analysis(historical, st.session_state.financial_data, visualizer)
            
            with tabs[1]:
                st.header("Análisis de Clustering")
+               n_clusters = st.selectbox("Número de clusters", ['auto', 2, 3, 4, 5, 6, 7, 8], index=0)
                if st.button("Realizar Clustering"):
                    with st.spinner("🔄 Analizando datos..."):
                        try:
-                           data_dict = st.session_state.financial_data
-                           #df = pd.DataFrame([data_dict])
-                           df = prepare_clustering_data(data_dict)
-                           if len(df.columns) < 2:
-                               st.warning("⚠️ Se necesitan al menos dos columnas numéricas")
+                           operations = get_operations(db)
+                           if operations.empty:
+                               st.warning("⚠️ Se necesita un histórico de operaciones (CSV, PDF o datos demo)")
                            else:
-                               prepared_data = clustering.prepare_data(df, df.columns.tolist())
-                               clusters_data, results = clustering.fit_predict(
-                                    prepared_data, 
-                                    n_clusters=3,
+                               clusters_data, results = clustering.fit_or_predict(
+                                    operations,
+                                    n_clusters=n_clusters,
                                     context=st.session_state.company_context  # Pasar el contexto
                                )
                                
                                st.success("✅ Análisis completado")
                                
+                               model_info = results['model']
+                               if model_info['refit']:
+                                   st.info(f"🧠 Modelo reajustado (versión {model_info['version']}): {model_info['reason']}")
+                               else:
+                                   st.info(f"⚡ Modelo versión {model_info['version']} reutilizado "
+                                           f"(deriva {model_info['drift']:.1%})")
+                               
+                               if 'k_selection' in results:
+                                   selection = results['k_selection']
+                                   st.write(f"🔢 Número de clusters elegido: {selection['best_k']} "
+                                            f"(codo en k={selection['elbow_k']})")
+                                   st.dataframe(selection['scores'].round(3))
+                               
                                st.subheader("📊 Resumen de Clusters")
                                for cluster_name, cluster_data in results['summary'].items():
                                    with st.expander(f"Cluster {cluster_name.split('_')[1]}"):
@@ -391,7 +557,7 @@ def main():
                st.header("Visualización de Resultados")
                
                if st.session_state.scenarios:
-                   display_visualizations(st.session_state.scenarios, visualizer)
+                   display_visualizations(st.session_state.scenarios, visualizer, st.session_state.forecast)
                else:
                    st.info("ℹ️ Genera escenarios primero para ver visualizaciones")
            
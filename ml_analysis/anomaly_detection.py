@@ -0,0 +1,274 @@
+import math
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, List, Tuple
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from config.config import Config
+from utils.database import DatabaseManager
+from utils.columnar_snapshot import ColumnarSnapshot
+from .feature_engineering import operation_matrix
+
+logger = logging.getLogger(__name__)
+
+# Constante de consistencia del MAD con la desviación típica de una normal
+MAD_SCALE = 0.6745
+# MAD mínimo en escala log: evita puntuaciones infinitas en pagos de importe fijo (≈1%)
+MAD_FLOOR = 0.01
+
+class P2Quantile:
+    """Estimador P² (Jain y Chlamtac) de un cuantil: cinco marcadores y O(1) por dato"""
+
+    __slots__ = ('p', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, p: float = 0.5):
+        self.p = p
+        self.heights: List[float] = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, x: float):
+        h, n = self.heights, self.positions
+        if len(h) < 5:
+            h.append(x)
+            h.sort()
+            return
+
+        if x < h[0]:
+            h[0], k = x, 0
+        elif x >= h[4]:
+            h[4], k = x, 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Interpolación parabólica; lineal si se sale del intervalo de los vecinos
+                q = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if not h[i - 1] < q < h[i + 1]:
+                    q = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = q
+                n[i] += d
+
+    def value(self) -> float:
+        if not self.heights:
+            return math.nan
+        if len(self.heights) < 5:
+            return self.heights[int(round(self.p * (len(self.heights) - 1)))]
+        return self.heights[2]
+
+class RobustStats:
+    """Mediana y MAD aproximados en streaming (el MAD es la mediana P² de las
+    desviaciones respecto a la mediana vigente en cada momento)"""
+
+    __slots__ = ('median', 'mad', 'count')
+
+    def __init__(self):
+        self.median = P2Quantile(0.5)
+        self.mad = P2Quantile(0.5)
+        self.count = 0
+
+    def score(self, x: float) -> float:
+        """Puntuación z robusta (modificada) de x frente a lo observado hasta ahora"""
+        if not self.count:
+            return 0.0
+        return MAD_SCALE * (x - self.median.value()) / max(self.mad.value(), MAD_FLOOR)
+
+    def update(self, x: float):
+        if self.count:
+            self.mad.update(abs(x - self.median.value()))
+        self.median.update(x)
+        self.count += 1
+
+class AnomalyDetector:
+    """Marca operaciones inusuales a medida que se ingieren.
+
+    Por cada (concepto, entidad) mantiene mediana y MAD del log-importe con sketches P²
+    (O(1) por operación) y detecta facturas duplicadas dentro de una ventana de días.
+    Opcionalmente un IsolationForest, reentrenado en segundo plano, puntúa cada lote.
+    Las marcas se guardan en la tabla operation_flags a través de DatabaseManager.
+    """
+
+    # Un detector por base de datos: su estado se conserva entre ejecuciones de la app
+    _detectors: Dict[str, 'AnomalyDetector'] = {}
+
+    def __init__(self, db: DatabaseManager, threshold: Optional[float] = None,
+                 min_count: Optional[int] = None, duplicate_window_days: Optional[int] = None,
+                 isolation_forest: Optional[bool] = None):
+        self.db = db
+        self.threshold = threshold or Config.ANOMALY_THRESHOLD
+        self.min_count = min_count or Config.ANOMALY_MIN_COUNT
+        self.duplicate_window = np.timedelta64(duplicate_window_days or Config.ANOMALY_DUPLICATE_WINDOW_DAYS, 'D')
+        self.isolation_forest = Config.ANOMALY_ISOLATION_FOREST if isolation_forest is None else isolation_forest
+        self._reset_state()
+        # (instance, operations_rewrites) del libro procesado: si cambia, se reprocesa desde cero
+        self._version: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._process_lock = threading.Lock()
+        self._process_thread: Optional[threading.Thread] = None
+        self._process_pending = False
+        self.forest = None
+        self.forest_conceptos: Optional[List[str]] = None
+        self._forest_thread: Optional[threading.Thread] = None
+        self._rows_since_refresh = 0
+
+    @classmethod
+    def for_database(cls, db: DatabaseManager, **kwargs) -> 'AnomalyDetector':
+        if db.db_path not in cls._detectors:
+            cls._detectors[db.db_path] = cls(db, **kwargs)
+        return cls._detectors[db.db_path]
+
+    def _reset_state(self):
+        self.stats: Dict[Tuple[str, str], RobustStats] = {}
+        self.last_operation_id = 0
+        self._recent: Dict[tuple, tuple] = {}
+        self._recent_order: deque = deque()
+        self._latest: Optional[np.datetime64] = None
+
+    def _check_version(self):
+        """Reinicia el estado si el libro se ha recreado o se han modificado/borrado operaciones"""
+        version = (self.db.get_data_version('instance'), self.db.get_data_version('operations_rewrites'))
+        if self._version is not None and version != self._version:
+            logger.info("Operaciones modificadas o borradas: se reprocesa el libro completo")
+            self._reset_state()
+            self._rows_since_refresh = 0
+            self.db.clear_operation_flags()
+        self._version = version
+
+    def _check_duplicate(self, operation_id: int, fecha: np.datetime64, key: tuple) -> Optional[int]:
+        """Id de una operación igual dentro de la ventana de días, si la hay"""
+        previous = self._recent.get(key)
+        self._recent[key] = (fecha, operation_id)
+        self._recent_order.append((fecha, key))
+        self._latest = fecha if self._latest is None else max(self._latest, fecha)
+        # Se olvidan las operaciones que ya han salido de la ventana
+        while self._latest - self._recent_order[0][0] > self.duplicate_window:
+            old_fecha, old_key = self._recent_order.popleft()
+            if old_key in self._recent and self._recent[old_key][0] == old_fecha:
+                del self._recent[old_key]
+        if previous is not None and abs(fecha - previous[0]) <= self.duplicate_window:
+            return previous[1]
+        return None
+
+    def observe(self, operation_id: int, fecha: Any, concepto: str, entidad: str, tipo: str,
+                importe: float) -> List[Tuple[int, str, float, str]]:
+        """Puntúa una operación frente al estado actual y después lo actualiza"""
+        flags = []
+        fecha = np.datetime64(pd.Timestamp(fecha).date(), 'D')
+        original = self._check_duplicate(operation_id, fecha, (concepto, entidad, tipo, round(importe, 2)))
+        if original is not None:
+            flags.append((operation_id, 'duplicado', 1.0, f"Posible duplicado de la operación {original}"))
+
+        stats = self.stats.setdefault((concepto, entidad), RobustStats())
+        value = math.log1p(abs(importe))
+        if stats.count >= self.min_count:
+            score = stats.score(value)
+            if abs(score) > self.threshold:
+                median = math.expm1(stats.median.value())
+                flags.append((operation_id, 'importe_atipico', round(score, 2),
+                              f"Importe {importe:,.2f} inusual para {concepto}/{entidad} (mediana {median:,.2f})"))
+        stats.update(value)
+        return flags
+
+    def _refresh_forest(self, sample_size: int):
+        """Reentrena el IsolationForest con una muestra de las operaciones guardadas"""
+        try:
+            if Config.COLUMNAR_SNAPSHOT_ENABLED:
+                # La muestra se lee de la instantánea columnar sin cargar el libro completo
+                snapshot = ColumnarSnapshot.for_database(self.db)
+                snapshot.refresh()
+                operations = snapshot.sample(sample_size, ['fecha', 'concepto', 'tipo', 'importe'])
+            else:
+                operations = self.db.get_historical_data()
+                if len(operations) > sample_size:
+                    operations = operations.sample(sample_size, random_state=42)
+            conceptos = sorted(operations['concepto'].astype(str).unique())
+            forest = IsolationForest(contamination=Config.ANOMALY_FOREST_CONTAMINATION, random_state=42)
+            forest.fit(operation_matrix(operations, conceptos))
+            with self._lock:
+                self.forest, self.forest_conceptos = forest, conceptos
+            logger.info(f"IsolationForest reentrenado con {len(operations):,} operaciones")
+        except Exception as e:
+            logger.error(f"Error reentrenando IsolationForest: {e}")
+
+    def refresh_forest_async(self, sample_size: int = 100_000) -> threading.Thread:
+        if self._forest_thread is None or not self._forest_thread.is_alive():
+            self._forest_thread = threading.Thread(target=self._refresh_forest, args=(sample_size,), daemon=True)
+            self._forest_thread.start()
+        return self._forest_thread
+
+    def _forest_flags(self, batch: pd.DataFrame) -> List[Tuple[int, str, float, str]]:
+        with self._lock:
+            forest, conceptos = self.forest, self.forest_conceptos
+        if forest is None:
+            return []
+        scores = forest.decision_function(operation_matrix(batch, conceptos))
+        outliers = np.flatnonzero(scores < 0)
+        return [(int(batch['id'].iat[i]), 'isolation_forest', round(float(scores[i]), 4),
+                 "Combinación inusual de importe, fecha y concepto") for i in outliers]
+
+    def process_new(self, batch_size: int = 100_000) -> int:
+        """Procesa las operaciones ingeridas desde la última llamada y guarda sus marcas"""
+        with self._process_lock:
+            return self._process_new(batch_size)
+
+    def process_new_async(self, batch_size: int = 100_000) -> threading.Thread:
+        """Procesa las operaciones nuevas en segundo plano; pensado para llamarse tras cada ingesta.
+
+        Si ya hay un procesamiento en curso se anota otra pasada, de modo que las operaciones
+        insertadas mientras tanto no se pierden.
+        """
+        with self._lock:
+            self._process_pending = True
+            if self._process_thread is None:
+                self._process_thread = threading.Thread(target=self._process_pending_batches,
+                                                        args=(batch_size,), daemon=True)
+                self._process_thread.start()
+            return self._process_thread
+
+    def _process_pending_batches(self, batch_size: int):
+        while True:
+            with self._lock:
+                if not self._process_pending:
+                    self._process_thread = None
+                    return
+                self._process_pending = False
+            try:
+                self.process_new(batch_size)
+            except Exception as e:
+                logger.error(f"Error en la detección de anomalías: {e}")
+
+    def _process_new(self, batch_size: int) -> int:
+        self._check_version()
+        n_flags = 0
+        for batch in self.db.iter_operations(batch_size, since_id=self.last_operation_id):
+            flags = []
+            for row in zip(batch['id'].tolist(), batch['fecha'].tolist(), batch['concepto'].tolist(),
+                           batch['entidad'].tolist(), batch['tipo'].tolist(), batch['importe'].tolist()):
+                flags.extend(self.observe(*row))
+            if self.isolation_forest:
+                flags.extend(self._forest_flags(batch))
+                self._rows_since_refresh += len(batch)
+            self.db.add_operation_flags(flags)
+            n_flags += len(flags)
+            self.last_operation_id = int(batch['id'].iat[-1])
+
+        if self.isolation_forest and (self.forest is None or self._rows_since_refresh >= Config.ANOMALY_FOREST_REFRESH_ROWS):
+            self._rows_since_refresh = 0
+            self.refresh_forest_async()
+        if n_flags:
+            logger.info(f"{n_flags} marcas de anomalía nuevas hasta la operación {self.last_operation_id}")
+        return n_flags
@@ -1,21 +1,115 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from typing import Tuple, Dict, Any, Optional
+from typing import Tuple, Dict, Any, Optional, Union
 import json
+import time
 import logging
 from config.gpt_client import GPTClient
+from utils.token_budget import TokenBudgeter
+from config.config import Config
+from utils.database import DatabaseManager
+from utils.columnar_snapshot import ColumnarSnapshot
+from .feature_engineering import OperationsFeatureBuilder, operation_matrix, operation_feature_names, operations_fingerprint
+from .model_selection import select_n_clusters
+from .model_registry import ModelRegistry, ClusterModel
+from .interpretation_cache import InterpretationCache, cluster_fingerprint, canonical_cluster_order
 
 logger = logging.getLogger(__name__)
 
+SUMMARY_QUANTILES = (0.25, 0.5, 0.75)
+# Por encima de este tamaño los cuantiles de un cluster se calculan sobre una muestra regular
+SUMMARY_QUANTILE_SAMPLE = 10_000
+# Filas por bloque al centrar los datos para la desviación; bloques pequeños caben en caché
+SUMMARY_STD_BLOCK = 1024
+
+def summarize_clusters(values: np.ndarray, labels: np.ndarray, centroids: np.ndarray,
+                       features: list) -> Dict[str, Any]:
+    """Estadísticas por cluster en una sola pasada sobre los datos ordenados por cluster.
+
+    Devuelve una forma compacta (listas por estadística, una fila por cluster) que se
+    puede serializar y cachear; los clusters vacíos quedan con tamaño 0 y valores NaN.
+    """
+    n_clusters = len(centroids)
+    sizes = np.bincount(labels, minlength=n_clusters)
+    # Tras ordenar por cluster cada uno es un bloque contiguo que se recorre una sola vez
+    ordered = values[np.argsort(labels, kind='stable')]
+    bounds = np.concatenate(([0], np.cumsum(sizes)))
+
+    stats = {name: np.full((n_clusters, values.shape[1]), np.nan)
+             for name in ['mean', 'std', 'min', 'max'] + [f'p{int(q * 100)}' for q in SUMMARY_QUANTILES]}
+    for cluster in np.flatnonzero(sizes):
+        block = ordered[bounds[cluster]:bounds[cluster + 1]]
+        n = len(block)
+        mean = block.sum(axis=0) / n
+        stats['mean'][cluster] = mean
+        stats['min'][cluster] = block.min(axis=0)
+        stats['max'][cluster] = block.max(axis=0)
+        if n > 1:
+            # Desviación muestral (ddof=1) como pandas; segunda pasada sobre los datos centrados
+            # para no perder precisión cuando la media es grande frente a la dispersión
+            squares = np.zeros(values.shape[1])
+            for start in range(0, n, SUMMARY_STD_BLOCK):
+                centered = block[start:start + SUMMARY_STD_BLOCK] - mean
+                squares += np.einsum('ij,ij->j', centered, centered)
+            stats['std'][cluster] = np.sqrt(squares / (n - 1))
+        sample = block[::-(-n // SUMMARY_QUANTILE_SAMPLE)]
+        quantiles = np.quantile(sample, SUMMARY_QUANTILES, axis=0)
+        for q, row in zip(SUMMARY_QUANTILES, quantiles):
+            stats[f'p{int(q * 100)}'][cluster] = row
+
+    compact = {'features': list(features), 'size': sizes.tolist(), 'n_rows': int(len(labels)),
+               'centroid': np.asarray(centroids, dtype=np.float64).tolist()}
+    compact.update({name: matrix.tolist() for name, matrix in stats.items()})
+    return compact
+
+def expand_cluster_summary(compact: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte la forma compacta en el resumen por cluster (cluster_i -> estadísticas)"""
+    features = compact['features']
+    quantiles = [f'p{int(q * 100)}' for q in SUMMARY_QUANTILES]
+
+    def by_feature(row: list) -> Dict[str, float]:
+        return {feature: float(value) for feature, value in zip(features, row)}
+
+    summary = {}
+    for i, size in enumerate(compact['size']):
+        summary[f'cluster_{i}'] = {
+            'size': size,
+            'percentage': size / compact['n_rows'] * 100,
+            'centroid': by_feature(compact['centroid'][i]),
+            'min_values': by_feature(compact['min'][i]),
+            'max_values': by_feature(compact['max'][i]),
+            'mean_values': by_feature(compact['mean'][i]),
+            'std_values': by_feature(compact['std'][i]),
+            'quantiles': {q: by_feature(compact[q][i]) for q in quantiles}
+        }
+    return summary
+
 class FinancialClustering:
-    def __init__(self, gpt_client: GPTClient):
+    def __init__(self, gpt_client: GPTClient, registry: Optional[ModelRegistry] = None,
+                 interpretation_cache: Optional[InterpretationCache] = None):
         self.gpt_client = gpt_client
+        self.registry = registry
+        self._interpretation_cache = interpretation_cache
+        self.model = None
         self.scaler = StandardScaler()
         self.kmeans = None
         self.features = None
+        self.budgeter = TokenBudgeter()
+        self.feature_builder = OperationsFeatureBuilder()
+        self.conceptos = None
+        self.last_operation_id = 0
+        self.k_selection = None
+        self.compact_summary = None
         
+    @property
+    def interpretation_cache(self) -> Optional[InterpretationCache]:
+        """Caché de interpretaciones; la tabla por defecto solo se crea al usarla por primera vez"""
+        if self._interpretation_cache is None and Config.CLUSTER_INTERPRETATION_CACHE_ENABLED:
+            self._interpretation_cache = InterpretationCache()
+        return self._interpretation_cache
+
     def prepare_data(self, data: pd.DataFrame, features: list) -> pd.DataFrame:
         """Prepara los datos para el clustering"""
         self.features = features
@@ -23,15 +117,89 @@ class FinancialClustering:
         numerical_data = numerical_data.fillna(numerical_data.mean())
         return numerical_data
         
-    def fit_predict(self, data: pd.DataFrame, n_clusters: int = 3, context: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
-        """Realiza el clustering y obtiene interpretación"""
+    def prepare_operations(self, operations: pd.DataFrame) -> pd.DataFrame:
+        """Construye las características por periodo a partir del libro de operaciones"""
+        features = self.feature_builder.build(operations)
+        return self.prepare_data(features, self.feature_builder.feature_names)
+
+    def fit_operations(self, operations: pd.DataFrame, n_clusters: Union[int, str] = 3,
+                       context: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Agrupa los periodos del histórico en regímenes financieros"""
+        data = self.prepare_operations(operations)
+        if n_clusters != 'auto' and len(data) < n_clusters:
+            raise ValueError(f"Se necesitan al menos {n_clusters} periodos para el clustering")
+        return self.fit_predict(data, n_clusters=n_clusters, context=context)
+
+    def _refit_reason(self, model: Optional[ClusterModel], data: pd.DataFrame, fingerprint: str,
+                      n_clusters: Union[int, str]) -> Tuple[Optional[str], float]:
+        """Motivo para reajustar el modelo registrado (None si sirve tal cual) y su deriva"""
+        if model is None:
+            return 'sin modelo registrado', 0.0
+        if n_clusters != 'auto' and n_clusters != model.n_clusters:
+            return f'número de clusters distinto ({model.n_clusters})', 0.0
+        if set(model.features) != set(data.columns):
+            return 'características distintas', 0.0
+        if fingerprint == model.fingerprint:
+            return None, 0.0
+        drift = model.drift(data)
+        if drift > Config.CLUSTER_DRIFT_THRESHOLD:
+            return f'deriva {drift:.1%}', drift
+        return None, drift
+
+    def fit_or_predict(self, operations: pd.DataFrame, n_clusters: Union[int, str] = 3,
+                       context: Optional[Dict[str, Any]] = None,
+                       name: str = 'operaciones') -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Asigna los periodos con el último modelo registrado y solo reajusta (creando
+        una versión nueva) si no hay modelo compatible o la deriva supera el umbral"""
+        self.registry = self.registry or ModelRegistry()
+        data = self.prepare_operations(operations)
+        fingerprint = operations_fingerprint(operations)
+        model = self.registry.load(name)
+        reason, drift = self._refit_reason(model, data, fingerprint, n_clusters)
+
+        if reason is None:
+            self.model = model
+            self.features = model.features
+            data_with_clusters = data[model.features].copy()
+            data_with_clusters['Cluster'] = model.predict(data_with_clusters)
+            cluster_summary = self._create_cluster_summary(data_with_clusters, model.centroids_original())
+            interpretation = model.interpretation or self._get_gpt_interpretation(cluster_summary, context)
+            logger.info(f"Clustering con el modelo {name} v{model.version} (deriva {drift:.1%})")
+            return data_with_clusters, {
+                'summary': cluster_summary,
+                'interpretation': interpretation,
+                'model': {'version': model.version, 'refit': False, 'drift': drift}
+            }
+
+        logger.info(f"Reajustando el modelo {name}: {reason}")
+        data_with_clusters, results = self.fit_operations(operations, n_clusters=n_clusters, context=context)
+        self.model = self.registry.save(ClusterModel.from_fitted(
+            name, self.features, self.scaler, self.kmeans, fingerprint, len(data), results['interpretation']
+        ))
+        results['model'] = {'version': self.model.version, 'refit': True, 'drift': drift, 'reason': reason}
+        return data_with_clusters, results
+
+    def predict(self, data: pd.DataFrame) -> np.ndarray:
+        """Cluster de cada fila con el modelo registrado, sin reajustar"""
+        if self.model is None:
+            raise ValueError("No hay un modelo de clustering cargado")
+        return self.model.predict(data)
+
+    def fit_predict(self, data: pd.DataFrame, n_clusters: Union[int, str] = 3, context: Optional[Dict[str, Any]] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Realiza el clustering y obtiene interpretación; n_clusters='auto' elige k"""
         try:
             # Escalar los datos
             scaled_data = self.scaler.fit_transform(data)
             
+            # Selección automática de k sobre los datos ya escalados
+            self.k_selection = None
+            if n_clusters == 'auto':
+                self.k_selection = select_n_clusters(scaled_data)
+                n_clusters = self.k_selection['best_k']
+            
             # Realizar clustering
             self.kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            clusters = self.kmeans.fit_predict(scaled_data)
+            clusters = self._relabel_canonically(self.kmeans.fit_predict(scaled_data))
             
             # Añadir clusters al DataFrame original
             data_with_clusters = data.copy()
@@ -47,46 +215,140 @@ class FinancialClustering:
             # Obtener interpretación considerando contexto empresarial
             interpretation = self._get_gpt_interpretation(cluster_summary, context)
             
-            return data_with_clusters, {
+            results = {
                 'summary': cluster_summary,
                 'interpretation': interpretation
             }
+            if self.k_selection is not None:
+                results['k_selection'] = self.k_selection
+            return data_with_clusters, results
         except Exception as e:
             logger.error(f"Error en clustering: {str(e)}")
             raise
     
+    def _relabel_canonically(self, labels: np.ndarray) -> np.ndarray:
+        """Renumera los clusters por centroide redondeado para que la misma estructura
+        reciba siempre las mismas etiquetas (y encaje con interpretaciones cacheadas)"""
+        order = canonical_cluster_order(self.scaler.inverse_transform(self.kmeans.cluster_centers_))
+        mapping = np.argsort(order)
+        self.kmeans.cluster_centers_ = self.kmeans.cluster_centers_[order]
+        self.kmeans.labels_ = mapping[self.kmeans.labels_]
+        return mapping[labels]
+
+    def _partial_fit_batch(self, scaled: np.ndarray, minibatch_size: int):
+        for start in range(0, len(scaled), minibatch_size):
+            chunk = scaled[start:start + minibatch_size]
+            # La inicialización necesita al menos n_clusters muestras
+            if len(chunk) < self.kmeans.n_clusters and not hasattr(self.kmeans, 'cluster_centers_'):
+                continue
+            self.kmeans.partial_fit(chunk)
+
+    def fit_streaming(self, db: DatabaseManager, n_clusters: int = 3, batch_size: int = 100_000,
+                      minibatch_size: int = 4096, epochs: int = 1) -> Dict[str, Any]:
+        """Agrupa operaciones individuales con MiniBatchKMeans leyendo SQLite por lotes.
+
+        Una primera pasada ajusta el escalado con partial_fit y las siguientes actualizan
+        los centroides; la memoria queda acotada por batch_size sea cual sea el tamaño del libro.
+        """
+        start_time = time.perf_counter()
+        self.conceptos = db.get_distinct_values('concepto')
+        self.features = operation_feature_names(self.conceptos)
+        self.scaler = StandardScaler()
+        # Con la instantánea columnar las pasadas leen ficheros proyectados en lugar de SQLite
+        snapshot = ColumnarSnapshot.for_database(db) if Config.COLUMNAR_SNAPSHOT_ENABLED else None
+        if snapshot is not None:
+            snapshot.refresh()
+
+        n_rows = 0
+        for batch in self._operation_batches(db, snapshot, batch_size):
+            self.scaler.partial_fit(operation_matrix(batch, self.conceptos))
+            n_rows += len(batch)
+            self.last_operation_id = int(batch['id'].iat[-1])
+        if n_rows < n_clusters:
+            raise ValueError(f"Se necesitan al menos {n_clusters} operaciones para el clustering")
+
+        # partial_fit inicializa los centroides una sola vez con el primer lote: n_init no aplica
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=minibatch_size)
+        # Las épocas recorren solo las filas que vio el escalado; las posteriores entran con update_streaming
+        for _ in range(epochs):
+            for batch in self._operation_batches(db, snapshot, batch_size, until_id=self.last_operation_id):
+                self._partial_fit_batch(self.scaler.transform(operation_matrix(batch, self.conceptos)),
+                                        minibatch_size)
+
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"MiniBatchKMeans ajustado sobre {n_rows:,} operaciones en {elapsed:.2f} s")
+        return {'rows': n_rows, 'epochs': epochs, 'elapsed_s': elapsed}
+
+    @staticmethod
+    def _operation_batches(db: DatabaseManager, snapshot: Optional[ColumnarSnapshot], batch_size: int,
+                           until_id: Optional[int] = None):
+        if snapshot is not None:
+            return snapshot.iter_batches(batch_size, ['id', 'fecha', 'concepto', 'tipo', 'importe'], until_id)
+        return db.iter_operations(batch_size, until_id=until_id)
+
+    def update_streaming(self, db: DatabaseManager, batch_size: int = 100_000,
+                         minibatch_size: int = 4096) -> int:
+        """Actualiza los centroides solo con las operaciones nuevas desde el último ajuste.
+
+        El escalado se mantiene fijo para que los centroides existentes sigan siendo comparables.
+        """
+        if self.kmeans is None or self.conceptos is None:
+            raise ValueError("El modelo incremental no está ajustado")
+        n_rows = 0
+        for batch in db.iter_operations(batch_size, since_id=self.last_operation_id):
+            self._partial_fit_batch(self.scaler.transform(operation_matrix(batch, self.conceptos)),
+                                    minibatch_size)
+            n_rows += len(batch)
+            self.last_operation_id = int(batch['id'].iat[-1])
+        logger.info(f"Modelo incremental actualizado con {n_rows:,} operaciones nuevas")
+        return n_rows
+
+    def predict_operations(self, operations: pd.DataFrame) -> np.ndarray:
+        """Cluster de cada operación según el modelo incremental"""
+        if self.kmeans is None or self.conceptos is None:
+            raise ValueError("El modelo incremental no está ajustado")
+        return self.kmeans.predict(self.scaler.transform(operation_matrix(operations, self.conceptos)))
+
+    def streaming_inertia(self, db: DatabaseManager, batch_size: int = 100_000) -> float:
+        """Inercia del modelo incremental calculada recorriendo la tabla por lotes"""
+        inertia = 0.0
+        for batch in db.iter_operations(batch_size):
+            distances = self.kmeans.transform(self.scaler.transform(operation_matrix(batch, self.conceptos)))
+            inertia += float((distances.min(axis=1) ** 2).sum())
+        return inertia
+
     def _create_cluster_summary(self, data: pd.DataFrame, centroids: np.ndarray) -> Dict[str, Any]:
         """Crea un resumen detallado de los clusters"""
-        summary = {}
-        for i in range(len(centroids)):
-            cluster_data = data[data['Cluster'] == i]
-            
-            summary[f'cluster_{i}'] = {
-                'size': len(cluster_data),
-                'percentage': len(cluster_data) / len(data) * 100,
-                'centroid': {
-                    feature: float(centroid_value)
-                    for feature, centroid_value in zip(self.features, centroids[i])
-                },
-                'min_values': {
-                    feature: float(value)
-                    for feature, value in cluster_data[self.features].min().items()
-                },
-                'max_values': {
-                    feature: float(value)
-                    for feature, value in cluster_data[self.features].max().items()
-                },
-                'mean_values': {
-                    feature: float(value)
-                    for feature, value in cluster_data[self.features].mean().items()
-                }
-            }
-            
-        return summary
+        self.compact_summary = summarize_clusters(
+            data[self.features].to_numpy(dtype=np.float64), data['Cluster'].to_numpy(), centroids, self.features
+        )
+        return expand_cluster_summary(self.compact_summary)
     
+    @staticmethod
+    def _compact_summary_for_prompt(cluster_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Elimina estadísticas redundantes para el prompt: la media coincide con el
+        centroide de KMeans y el porcentaje se deduce del tamaño"""
+        return {
+            name: {
+                'size': info['size'],
+                'centroid': info['centroid'],
+                'min': info['min_values'],
+                'max': info['max_values']
+            }
+            for name, info in cluster_summary.items()
+        }
+
     def _get_gpt_interpretation(self, cluster_summary: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
         """Obtiene interpretación de los clusters usando GPT para datos temporales"""
         context = context or {}
+        # Si la estructura de clusters no ha cambiado de forma material no se llama al LLM
+        fingerprint = None
+        if self.compact_summary is not None and self.interpretation_cache is not None:
+            fingerprint = cluster_fingerprint(self.compact_summary, context)
+            cached = self.interpretation_cache.get(fingerprint)
+            if cached is not None:
+                return cached
+        
         sector = context.get('sector', 'No especificado')
         region = context.get('region', 'No especificada')
         
@@ -95,7 +357,7 @@ class FinancialClustering:
         Cada punto de datos representa un período temporal diferente de la misma empresa.
         
         Resumen de Clusters:
-        {json.dumps(cluster_summary, indent=2)}
+        {self.budgeter.compact_json(self._compact_summary_for_prompt(cluster_summary))}
         
         Por favor proporciona:
         1. Características distintivas de cada cluster, interpretándolos como diferentes períodos financieros de la empresa
@@ -105,4 +367,7 @@ class FinancialClustering:
         5. Recomendaciones para optimizar la gestión de cobros y pagos basadas en los patrones identificados
         """
         
-        return self.gpt_client.generate_financial_opinion(prompt, context)
\ No newline at end of file
+        interpretation = self.gpt_client.generate_financial_opinion(prompt, context, feature='clustering')
+        if fingerprint is not None:
+            self.interpretation_cache.set(fingerprint, interpretation)
+        return interpretation
\ No newline at end of file
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+def operations_fingerprint(operations: pd.DataFrame) -> str:
+    """Huella estable del contenido de un DataFrame de operaciones"""
+    columns = [c for c in ['fecha', 'concepto', 'entidad', 'tipo', 'importe'] if c in operations.columns]
+    hashed = pd.util.hash_pandas_object(operations[columns], index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+def operation_matrix(operations: pd.DataFrame, conceptos: List[str]) -> np.ndarray:
+    """Vector numérico por operación: importe (log), tipo, estacionalidad del mes,
+    día del mes y concepto codificado one-hot sobre un vocabulario fijo"""
+    fechas = pd.to_datetime(operations['fecha'])
+    angle = 2 * np.pi * (fechas.dt.month.to_numpy() - 1) / 12
+    codes = pd.Index(conceptos).get_indexer(operations['concepto'].astype(str))
+    matrix = np.zeros((len(operations), 5 + len(conceptos)), dtype=np.float64)
+    matrix[:, 0] = np.log1p(np.abs(operations['importe'].to_numpy(dtype=np.float64)))
+    matrix[:, 1] = (operations['tipo'].astype(str).to_numpy() == 'Ingreso')
+    matrix[:, 2] = np.sin(angle)
+    matrix[:, 3] = np.cos(angle)
+    matrix[:, 4] = fechas.dt.day.to_numpy()
+    known = codes >= 0
+    matrix[np.flatnonzero(known), 5 + codes[known]] = 1.0
+    return matrix
+
+def operation_feature_names(conceptos: List[str]) -> List[str]:
+    return ['log_importe', 'es_ingreso', 'mes_sin', 'mes_cos', 'dia_mes'] + [f"concepto:{c}" for c in conceptos]
+
+class OperationsFeatureBuilder:
+    """Convierte el libro de operaciones en un vector de características por periodo.
+
+    Incluye los importes por tipo y concepto (pivot), totales, ratios y volatilidad
+    móvil. Los resultados se cachean por huella de las operaciones y parámetros.
+    """
+
+    # Características por huella de operaciones y parámetros (LRU acotada)
+    _cache: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, period: str = 'M', volatility_window: int = 3, top_conceptos: Optional[int] = None):
+        self.period = period
+        self.volatility_window = volatility_window
+        self.top_conceptos = top_conceptos
+        self.feature_names: List[str] = []
+
+    def _pivot(self, data: pd.DataFrame) -> pd.DataFrame:
+        conceptos = data.groupby(['tipo', 'concepto'], observed=True)['importe'].sum()
+        if self.top_conceptos:
+            keep = conceptos.sort_values(ascending=False).head(self.top_conceptos).index
+            data = data.set_index(['tipo', 'concepto']).loc[keep].reset_index()
+
+        pivot = data.pivot_table(index='periodo', columns=['tipo', 'concepto'], values='importe',
+                                 aggfunc='sum', fill_value=0.0, observed=True)
+        pivot.columns = [f"{tipo}:{concepto}" for tipo, concepto in pivot.columns]
+        return pivot
+
+    def build(self, operations: pd.DataFrame) -> pd.DataFrame:
+        """Matriz periodos × características, con los periodos sin actividad a cero"""
+        if operations.empty:
+            raise ValueError("No hay operaciones para construir características")
+
+        key = (operations_fingerprint(operations), self.period, self.volatility_window, self.top_conceptos)
+        with self._cache_lock:
+            features = self._cache.get(key)
+            if features is not None:
+                self._cache.move_to_end(key)
+        if features is not None:
+            self.feature_names = list(features.columns)
+            return features
+
+        data = pd.DataFrame({
+            'periodo': pd.to_datetime(operations['fecha']).dt.to_period(self.period),
+            'tipo': operations['tipo'].astype(str),
+            'concepto': operations['concepto'].astype(str),
+            'importe': operations['importe'].astype(float)
+        })
+        periods = pd.period_range(data['periodo'].min(), data['periodo'].max(), freq=self.period)
+
+        pivot = self._pivot(data).reindex(periods, fill_value=0.0)
+        by_tipo = (data.groupby(['periodo', 'tipo'], observed=True)['importe'].agg(['sum', 'count'])
+                   .unstack('tipo', fill_value=0).reindex(periods, fill_value=0))
+
+        def column(stat: str, tipo: str) -> pd.Series:
+            return by_tipo[(stat, tipo)] if (stat, tipo) in by_tipo.columns else pd.Series(0.0, index=periods)
+
+        ingresos, gastos = column('sum', 'Ingreso').astype(float), column('sum', 'Gasto').astype(float)
+        n_ingresos = column('count', 'Ingreso')
+        safe_ingresos = ingresos.where(ingresos != 0)
+
+        totals = pd.DataFrame({
+            'ingresos': ingresos,
+            'gastos': gastos,
+            'beneficio': ingresos - gastos,
+            'margen': ((ingresos - gastos) / safe_ingresos * 100).fillna(0.0),
+            'ratio_gastos_ingresos': (gastos / safe_ingresos).fillna(0.0),
+            'n_operaciones': column('count', 'Ingreso') + column('count', 'Gasto'),
+            'ticket_medio_ingreso': (ingresos / n_ingresos.where(n_ingresos != 0)).fillna(0.0),
+            'volatilidad_ingresos': ingresos.rolling(self.volatility_window, min_periods=2).std().fillna(0.0),
+            'volatilidad_gastos': gastos.rolling(self.volatility_window, min_periods=2).std().fillna(0.0)
+        }, index=periods)
+
+        features = pd.concat([totals, pivot], axis=1).astype(np.float64)
+        features.index = features.index.astype(str)
+        features.index.name = 'periodo'
+        with self._cache_lock:
+            self._cache[key] = features
+            while len(self._cache) > Config.ANALYSIS_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        self.feature_names = list(features.columns)
+        logger.info(f"Características construidas: {features.shape[0]} periodos × {features.shape[1]} variables")
+        return features
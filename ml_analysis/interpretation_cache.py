@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+import numpy as np
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+def _significant(value: float, digits: int) -> Optional[float]:
+    return None if np.isnan(value) else float(f"{value:.{digits}g}")
+
+def canonical_cluster_order(centroids: np.ndarray, digits: Optional[int] = None) -> List[int]:
+    """Orden de los clusters por centroide redondeado, independiente del etiquetado de KMeans"""
+    digits = digits or Config.CLUSTER_FINGERPRINT_DIGITS
+    return sorted(range(len(centroids)), key=lambda i: [_significant(v, digits) or 0.0 for v in centroids[i]])
+
+def cluster_fingerprint(compact_summary: Dict[str, Any], context: Optional[Dict[str, Any]] = None,
+                        digits: Optional[int] = None) -> str:
+    """Huella estable de la estructura de clusters: centroides redondeados a cifras
+    significativas, porcentaje de tamaño por cluster, características y sector/región.
+
+    Las características y los clusters se ordenan de forma canónica, así que ni el
+    ruido numérico en los últimos decimales ni el orden de las etiquetas cambian la huella.
+    """
+    context = context or {}
+    digits = digits or Config.CLUSTER_FINGERPRINT_DIGITS
+    features = compact_summary['features']
+    columns = sorted(range(len(features)), key=lambda j: features[j])
+    n_rows = compact_summary['n_rows'] or 1
+    clusters = sorted(
+        [[_significant(centroid[j], digits) for j in columns], round(size / n_rows * 100)]
+        for centroid, size in zip(compact_summary['centroid'], compact_summary['size'])
+    )
+    payload = {
+        'features': [features[j] for j in columns],
+        'clusters': clusters,
+        'sector': str(context.get('sector', '')).strip().lower(),
+        'region': str(context.get('region', '')).strip().lower()
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+class InterpretationCache:
+    """Interpretaciones de clustering del LLM cacheadas por la huella de los clusters"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[int] = None):
+        self.db_path = db_path or Config.DB_PATH
+        self.ttl = ttl or Config.CACHE_TTL
+        self._initialize_db()
+
+    def _initialize_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cluster_interpretations (
+                    fingerprint TEXT PRIMARY KEY,
+                    interpretation TEXT,
+                    hits INTEGER DEFAULT 0,
+                    created_at DATETIME,
+                    expires_at DATETIME
+                )
+            """)
+
+    def get(self, fingerprint: str) -> Optional[str]:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("""
+                SELECT interpretation FROM cluster_interpretations
+                WHERE fingerprint = ? AND expires_at > ?
+            """, (fingerprint, datetime.now())).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE cluster_interpretations SET hits = hits + 1 WHERE fingerprint = ?",
+                         (fingerprint,))
+        logger.info("Interpretación de clusters recuperada de caché")
+        return row[0]
+
+    def set(self, fingerprint: str, interpretation: str):
+        now = datetime.now()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO cluster_interpretations
+                (fingerprint, interpretation, hits, created_at, expires_at)
+                VALUES (?, ?, 0, ?, ?)
+            """, (fingerprint, interpretation, now, now + timedelta(seconds=self.ttl)))
@@ -0,0 +1,167 @@
+import io
+import json
+import sqlite3
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ClusterModel:
+    """Modelo de clustering ajustado reducido a arrays: escalado, centroides y características.
+
+    La predicción es NumPy puro (sin sklearn), por lo que asignar operaciones nuevas
+    a los clusters existentes no requiere reajustar ni reconstruir el modelo.
+    """
+    name: str
+    version: int
+    features: List[str]
+    mean: np.ndarray
+    scale: np.ndarray
+    centroids: np.ndarray
+    fingerprint: str
+    n_samples: int
+    inertia: float
+    interpretation: Optional[str] = None
+    created_at: Optional[str] = None
+
+    @classmethod
+    def from_fitted(cls, name: str, features: List[str], scaler: StandardScaler, kmeans: KMeans,
+                    fingerprint: str, n_samples: int, interpretation: Optional[str] = None) -> 'ClusterModel':
+        return cls(
+            name=name, version=0, features=list(features),
+            mean=np.asarray(scaler.mean_, dtype=np.float64),
+            scale=np.asarray(scaler.scale_, dtype=np.float64),
+            centroids=np.asarray(kmeans.cluster_centers_, dtype=np.float64),
+            fingerprint=fingerprint, n_samples=int(n_samples),
+            inertia=float(kmeans.inertia_) / max(int(n_samples), 1),
+            interpretation=interpretation
+        )
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.centroids)
+
+    def _matrix(self, data: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        if isinstance(data, pd.DataFrame):
+            data = data.reindex(columns=self.features, fill_value=0.0).to_numpy(dtype=np.float64)
+        return (np.asarray(data, dtype=np.float64) - self.mean) / self.scale
+
+    def _distances(self, scaled: np.ndarray) -> np.ndarray:
+        # ||x - c||² = ||x||² - 2·x·c + ||c||², sin materializar el tensor de diferencias
+        distances = (np.einsum('ij,ij->i', scaled, scaled)[:, None] - 2 * scaled @ self.centroids.T
+                     + np.einsum('ij,ij->i', self.centroids, self.centroids))
+        return np.maximum(distances, 0.0)
+
+    def predict(self, data: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """Cluster más cercano de cada fila"""
+        return self._distances(self._matrix(data)).argmin(axis=1)
+
+    def drift(self, data: Union[pd.DataFrame, np.ndarray]) -> float:
+        """Aumento relativo de la distancia media al centroide respecto al entrenamiento"""
+        inertia = float(self._distances(self._matrix(data)).min(axis=1).mean())
+        return inertia / self.inertia - 1 if self.inertia else 0.0
+
+    def centroids_original(self) -> np.ndarray:
+        return self.centroids * self.scale + self.mean
+
+    def _arrays(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, mean=self.mean, scale=self.scale, centroids=self.centroids)
+        return buffer.getvalue()
+
+class ModelRegistry:
+    """Registro versionado de modelos de clustering en SQLite.
+
+    Cada guardado crea una versión nueva; los arrays se serializan con np.savez (sin
+    pickle) y los modelos ya cargados se mantienen en memoria.
+    """
+
+    _loaded: Dict[tuple, ClusterModel] = {}
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or Config.DB_PATH
+        self._initialize_db()
+
+    def _initialize_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cluster_models (
+                    name TEXT,
+                    version INTEGER,
+                    features TEXT,
+                    arrays BLOB,
+                    fingerprint TEXT,
+                    n_samples INTEGER,
+                    inertia REAL,
+                    interpretation TEXT,
+                    created_at DATETIME,
+                    PRIMARY KEY (name, version)
+                )
+            """)
+
+    def save(self, model: ClusterModel) -> ClusterModel:
+        """Guarda el modelo como nueva versión y devuelve el modelo con su versión asignada"""
+        with sqlite3.connect(self.db_path) as conn:
+            version = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM cluster_models WHERE name = ?", (model.name,)
+            ).fetchone()[0]
+            model.version, model.created_at = version, datetime.now().isoformat()
+            conn.execute("""
+                INSERT INTO cluster_models
+                (name, version, features, arrays, fingerprint, n_samples, inertia, interpretation, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                model.name, version, json.dumps(model.features, ensure_ascii=False), model._arrays(),
+                model.fingerprint, model.n_samples, model.inertia, model.interpretation, model.created_at
+            ))
+        self._loaded[(self.db_path, model.name, version)] = model
+        logger.info(f"Modelo de clustering {model.name} guardado como versión {version}")
+        return model
+
+    def latest_version(self, name: str) -> Optional[int]:
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT MAX(version) FROM cluster_models WHERE name = ?", (name,)).fetchone()[0]
+
+    def load(self, name: str, version: Optional[int] = None) -> Optional[ClusterModel]:
+        """Versión indicada (o la última) de un modelo; None si no existe"""
+        version = version or self.latest_version(name)
+        if version is None:
+            return None
+        key = (self.db_path, name, version)
+        if key in self._loaded:
+            return self._loaded[key]
+
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("""
+                SELECT features, arrays, fingerprint, n_samples, inertia, interpretation, created_at
+                FROM cluster_models WHERE name = ? AND version = ?
+            """, (name, version)).fetchone()
+        if row is None:
+            return None
+
+        features, arrays, fingerprint, n_samples, inertia, interpretation, created_at = row
+        with np.load(io.BytesIO(arrays)) as stored:
+            model = ClusterModel(
+                name=name, version=version, features=json.loads(features),
+                mean=stored['mean'], scale=stored['scale'], centroids=stored['centroids'],
+                fingerprint=fingerprint, n_samples=n_samples, inertia=inertia,
+                interpretation=interpretation, created_at=created_at
+            )
+        self._loaded[key] = model
+        return model
+
+    def versions(self, name: str) -> pd.DataFrame:
+        """Historial de versiones de un modelo"""
+        with sqlite3.connect(self.db_path) as conn:
+            return pd.read_sql_query("""
+                SELECT version, fingerprint, n_samples, inertia, created_at
+                FROM cluster_models WHERE name = ? ORDER BY version
+            """, conn, params=(name,))
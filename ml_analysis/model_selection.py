@@ -0,0 +1,89 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Sequence
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score, davies_bouldin_score
+from threadpoolctl import threadpool_limits
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Selecciones por huella de los datos y parámetros (LRU acotada)
+_selection_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_selection_cache_lock = threading.Lock()
+
+def evaluate_k(scaled: np.ndarray, k: int, sample_size: int, random_state: int = 42) -> Dict[str, float]:
+    """Ajusta KMeans con k clusters y calcula inercia, silhouette (muestreada) y Davies-Bouldin"""
+    # Un hilo por proceso: el paralelismo lo da el pool, no OpenMP
+    with threadpool_limits(1):
+        model = KMeans(n_clusters=k, random_state=random_state).fit(scaled)
+        labels = model.labels_
+        if len(np.unique(labels)) < 2:
+            return {'k': k, 'inertia': float(model.inertia_), 'silhouette': -1.0, 'davies_bouldin': np.inf}
+        silhouette = silhouette_score(scaled, labels, sample_size=min(sample_size, len(scaled)),
+                                      random_state=random_state)
+        return {
+            'k': k,
+            'inertia': float(model.inertia_),
+            'silhouette': float(silhouette),
+            'davies_bouldin': float(davies_bouldin_score(scaled, labels))
+        }
+
+def elbow_k(ks: Sequence[int], inertias: Sequence[float]) -> int:
+    """k del codo: punto de la curva de inercia más alejado de la recta entre sus extremos"""
+    ks, inertias = np.asarray(ks, dtype=np.float64), np.asarray(inertias, dtype=np.float64)
+    if len(ks) < 3:
+        return int(ks[0])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    span = inertias[0] - inertias[-1]
+    y = (inertias - inertias[-1]) / span if span else np.zeros_like(inertias)
+    # Distancia a la recta que une (0, 1) y (1, 0)
+    distance = np.abs(x + y - 1) / np.sqrt(2)
+    return int(ks[np.argmax(distance)])
+
+def select_n_clusters(scaled: np.ndarray, k_range: Optional[Sequence[int]] = None,
+                      sample_size: Optional[int] = None, max_workers: Optional[int] = None,
+                      parallel_min_rows: Optional[int] = None) -> Dict[str, Any]:
+    """Evalúa cada k (en paralelo en un pool de procesos para datos grandes) y elige el mejor.
+
+    El mejor k minimiza la suma de rangos de silhouette (mayor es mejor), Davies-Bouldin
+    (menor es mejor) y distancia al codo. Los resultados se cachean por huella de los datos.
+    """
+    low, high = Config.CLUSTER_K_RANGE if k_range is None else (min(k_range), max(k_range))
+    ks = [k for k in range(low, high + 1) if 2 <= k < len(scaled)]
+    if not ks:
+        raise ValueError("No hay suficientes datos para seleccionar el número de clusters")
+    sample_size = sample_size or Config.CLUSTER_SILHOUETTE_SAMPLE
+    parallel_min_rows = Config.CLUSTER_PARALLEL_MIN_ROWS if parallel_min_rows is None else parallel_min_rows
+
+    scaled = np.ascontiguousarray(scaled, dtype=np.float64)
+    key = (hashlib.sha1(scaled.tobytes()).hexdigest(), scaled.shape, tuple(ks), sample_size)
+    with _selection_cache_lock:
+        if key in _selection_cache:
+            _selection_cache.move_to_end(key)
+            return _selection_cache[key]
+
+    if len(scaled) >= parallel_min_rows and len(ks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            scores = list(executor.map(evaluate_k, [scaled] * len(ks), ks, [sample_size] * len(ks)))
+    else:
+        scores = [evaluate_k(scaled, k, sample_size) for k in ks]
+
+    table = pd.DataFrame(scores).set_index('k')
+    elbow = elbow_k(table.index, table['inertia'])
+    table['rank'] = (table['silhouette'].rank(ascending=False)
+                     + table['davies_bouldin'].rank(ascending=True)
+                     + pd.Series(np.abs(table.index - elbow), index=table.index).rank())
+    best_k = int(table['rank'].idxmin())
+    result = {'best_k': best_k, 'elbow_k': elbow, 'scores': table}
+    with _selection_cache_lock:
+        _selection_cache[key] = result
+        while len(_selection_cache) > Config.ANALYSIS_CACHE_MAX_ENTRIES:
+            _selection_cache.popitem(last=False)
+    logger.info(f"Número de clusters seleccionado: {best_k} (codo en {elbow})")
+    return result
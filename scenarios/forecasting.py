@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from itertools import product
+from typing import Dict, Any
+import numpy as np
+import pandas as pd
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+SEASON_LENGTH = 12
+TOTAL_SERIES = {'Ingreso': 'Total Ingresos', 'Gasto': 'Total Gastos'}
+# Rejilla de parámetros (alpha, beta, gamma) evaluada a la vez para todas las series
+HW_GRID = np.array(list(product([0.1, 0.3, 0.5, 0.8], [0.0, 0.05, 0.2], [0.05, 0.2, 0.5])))
+Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.96}
+
+def monthly_series(operations: pd.DataFrame) -> pd.DataFrame:
+    """Importes mensuales por concepto más los totales de ingresos y gastos"""
+    fechas = pd.to_datetime(operations['fecha'])
+    data = operations.assign(mes=fechas.dt.to_period('M'), tipo=operations['tipo'].astype(str))
+    by_concepto = data.groupby(['mes', 'concepto'], observed=True)['importe'].sum().unstack(fill_value=0.0)
+    by_tipo = data.groupby(['mes', 'tipo'], observed=True)['importe'].sum().unstack(fill_value=0.0)
+    by_tipo = by_tipo.reindex(columns=list(TOTAL_SERIES), fill_value=0.0).rename(columns=TOTAL_SERIES)
+    monthly = pd.concat([by_tipo, by_concepto], axis=1).fillna(0.0)
+    months = pd.period_range(monthly.index.min(), monthly.index.max(), freq='M')
+    monthly = monthly.reindex(months, fill_value=0.0)
+    monthly.columns = monthly.columns.astype(str)
+    return monthly
+
+class CashFlowForecaster:
+    """Previsión mensual estacional vectorizada sobre todas las series a la vez"""
+
+    # Previsiones por huella de datos y parámetros (LRU acotada)
+    _cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, horizon: int = 12, model: str = 'auto', level: float = 0.8):
+        if model not in ('auto', 'holt_winters', 'seasonal_naive', 'naive'):
+            raise ValueError(f"Modelo de previsión desconocido: {model}")
+        if level not in Z_SCORES:
+            raise ValueError(f"Nivel de confianza no soportado: {level}")
+        self.horizon = horizon
+        self.model = model
+        self.level = level
+
+    @staticmethod
+    def _fingerprint(monthly: pd.DataFrame) -> str:
+        digest = hashlib.sha1(np.ascontiguousarray(monthly.to_numpy(dtype=np.float64)).tobytes())
+        digest.update(str(monthly.index[0]).encode())
+        digest.update('|'.join(monthly.columns).encode())
+        return digest.hexdigest()
+
+    def _select_model(self, n_months: int) -> str:
+        if self.model != 'auto':
+            return self.model
+        if n_months >= 2 * SEASON_LENGTH:
+            return 'holt_winters'
+        if n_months >= SEASON_LENGTH:
+            return 'seasonal_naive'
+        return 'naive'
+
+    def _holt_winters(self, y: np.ndarray) -> tuple:
+        """Holt-Winters aditivo: recursión temporal vectorizada sobre (parámetros × series)"""
+        m = SEASON_LENGTH
+        n_months, n_series = y.shape
+        alpha, beta, gamma = (HW_GRID[:, i:i + 1] for i in range(3))        # (G, 1)
+        level = np.broadcast_to(y[:m].mean(axis=0), (len(HW_GRID), n_series)).copy()
+        trend = np.broadcast_to((y[m:2 * m].mean(axis=0) - y[:m].mean(axis=0)) / m,
+                                (len(HW_GRID), n_series)).copy()
+        season = np.broadcast_to((y[:m] - y[:m].mean(axis=0))[:, None, :],
+                                 (m, len(HW_GRID), n_series)).copy()
+        sse = np.zeros((len(HW_GRID), n_series))
+
+        for t in range(n_months):
+            s = season[t % m]
+            error = y[t] - (level + trend + s)
+            sse += error ** 2
+            new_level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            season[t % m] = gamma * (y[t] - new_level) + (1 - gamma) * s
+            level = new_level
+
+        best = sse.argmin(axis=0)
+        cols = np.arange(n_series)
+        steps = np.arange(1, self.horizon + 1)
+        future_season = season[(n_months + steps - 1) % m][:, best, cols]   # (h, series)
+        forecast = level[best, cols] + steps[:, None] * trend[best, cols] + future_season
+        sigma = np.sqrt(sse[best, cols] / n_months)
+        params = HW_GRID[best]
+        return forecast, sigma, params
+
+    def _seasonal_naive(self, y: np.ndarray) -> tuple:
+        m = SEASON_LENGTH
+        steps = np.arange(self.horizon)
+        forecast = y[len(y) - m + steps % m]
+        residuals = y[m:] - y[:-m]
+        sigma = residuals.std(axis=0) if len(residuals) > 1 else np.abs(y).mean(axis=0) * 0.1
+        return forecast, sigma, None
+
+    def _naive(self, y: np.ndarray) -> tuple:
+        forecast = np.broadcast_to(y.mean(axis=0), (self.horizon, y.shape[1])).copy()
+        sigma = y.std(axis=0)
+        return forecast, sigma, None
+
+    def fit_forecast(self, monthly: pd.DataFrame) -> Dict[str, Any]:
+        """Ajusta y proyecta las series mensuales; los ajustes se cachean por huella de datos"""
+        model = self._select_model(len(monthly))
+        key = (self._fingerprint(monthly), model, self.horizon, self.level)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        y = monthly.to_numpy(dtype=np.float64)
+        fitters = {'holt_winters': self._holt_winters, 'seasonal_naive': self._seasonal_naive, 'naive': self._naive}
+        forecast, sigma, params = fitters[model](y)
+
+        # Intervalo de predicción que se ensancha con el horizonte
+        width = Z_SCORES[self.level] * sigma[None, :] * np.sqrt(np.arange(1, self.horizon + 1))[:, None]
+        index = pd.period_range(monthly.index[-1] + 1, periods=self.horizon, freq='M')
+        result = {
+            'model': model,
+            'history': monthly,
+            'forecast': pd.DataFrame(np.maximum(forecast, 0), index=index, columns=monthly.columns),
+            'lower': pd.DataFrame(np.maximum(forecast - width, 0), index=index, columns=monthly.columns),
+            'upper': pd.DataFrame(forecast + width, index=index, columns=monthly.columns),
+            'params': None if params is None else pd.DataFrame(params, index=monthly.columns,
+                                                               columns=['alpha', 'beta', 'gamma']),
+            'level': self.level
+        }
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > Config.ANALYSIS_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        logger.info(f"Previsión {model} calculada para {monthly.shape[1]} series")
+        return result
+
+    def forecast(self, operations: pd.DataFrame) -> Dict[str, Any]:
+        """Agrega las operaciones por mes y devuelve la previsión de todas las series"""
+        if operations.empty:
+            raise ValueError("No hay operaciones históricas para la previsión")
+        return self.fit_forecast(monthly_series(operations))
+
+    @staticmethod
+    def profile(forecast: Dict[str, Any], series: str) -> np.ndarray:
+        """Perfil mensual normalizado (suma 1) de una serie prevista"""
+        values = forecast['forecast'][series].to_numpy()
+        total = values.sum()
+        return values / total if total > 0 else np.full(len(values), 1 / len(values))
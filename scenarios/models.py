@@ -0,0 +1,177 @@
+import math
+import logging
+from collections.abc import Mapping
+from typing import Dict, Any, Iterator, List, Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_NAMES = ('base', 'optimista', 'pesimista')
+METRICS = ('ingresos', 'gastos', 'beneficio', 'margen')
+
+def parse_number(value: Any) -> float:
+    """Convierte números, porcentajes ("15%") e importes ("1,200.50€") a float; NaN si no es posible"""
+    if isinstance(value, bool) or value is None:
+        return math.nan
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip().replace('€', '').replace('%', '').replace(',', '').replace(' ', '')
+        try:
+            return float(text)
+        except ValueError:
+            logger.warning(f"Valor no numérico en las proyecciones: {value!r}")
+    return math.nan
+
+class Projection(Mapping):
+    """Proyecciones de un escenario: vista de solo lectura sobre una fila de la tabla de métricas"""
+
+    __slots__ = ('_values', '_index')
+
+    def __init__(self, values: np.ndarray, index: Dict[str, int]):
+        self._values = values
+        self._index = index
+
+    def __getitem__(self, metric: str) -> float:
+        value = self._values[self._index[metric]]
+        if np.isnan(value):
+            raise KeyError(metric)
+        return float(value)
+
+    def __iter__(self) -> Iterator[str]:
+        return (metric for metric, i in self._index.items() if not np.isnan(self._values[i]))
+
+    def __len__(self) -> int:
+        return int((~np.isnan(self._values)).sum())
+
+    @property
+    def ingresos(self) -> float:
+        return float(self._values[self._index['ingresos']])
+
+    @property
+    def gastos(self) -> float:
+        return float(self._values[self._index['gastos']])
+
+    @property
+    def beneficio(self) -> float:
+        return float(self._values[self._index['beneficio']])
+
+    @property
+    def margen(self) -> float:
+        return float(self._values[self._index['margen']])
+
+    def __repr__(self) -> str:
+        return f"Projection({self.to_dict()})"
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self)
+
+class Scenario(Mapping):
+    """Escenario validado; admite el acceso por clave del formato dict original"""
+
+    __slots__ = ('name', 'descripcion', 'proyecciones', 'supuestos')
+    _FIELDS = ('descripcion', 'proyecciones', 'supuestos')
+
+    def __init__(self, name: str, descripcion: str, proyecciones: Projection, supuestos: List[str]):
+        self.name = name
+        self.descripcion = descripcion
+        self.proyecciones = proyecciones
+        self.supuestos = supuestos
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._FIELDS)
+
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'descripcion': self.descripcion,
+            'proyecciones': self.proyecciones.to_dict(),
+            'supuestos': list(self.supuestos)
+        }
+
+class ScenarioSet(Mapping):
+    """Conjunto de escenarios respaldado por una matriz escenario × métrica.
+
+    Los valores se interpretan una única vez al construirlo; beneficio y margen se
+    derivan de ingresos y gastos cuando la respuesta no los incluye.
+    """
+
+    __slots__ = ('names', 'metrics', 'values', '_scenarios')
+
+    def __init__(self, names: Sequence[str], metrics: Sequence[str], values: np.ndarray,
+                 descripciones: Sequence[str], supuestos: Sequence[List[str]]):
+        self.names = tuple(names)
+        self.metrics = tuple(metrics)
+        self.values = values
+        index = {metric: i for i, metric in enumerate(self.metrics)}
+        self._scenarios = {
+            name: Scenario(name, descripciones[i], Projection(values[i], index), list(supuestos[i]))
+            for i, name in enumerate(self.names)
+        }
+
+    @classmethod
+    def from_dict(cls, scenarios: Dict[str, Any]) -> 'ScenarioSet':
+        names = [name for name in SCENARIO_NAMES if name in scenarios]
+        names += [name for name in scenarios if name not in SCENARIO_NAMES]
+        extra = sorted({metric for name in names for metric in (scenarios[name].get('proyecciones') or {})}
+                       - set(METRICS))
+        metrics = list(METRICS) + extra
+        index = {metric: i for i, metric in enumerate(metrics)}
+
+        values = np.full((len(names), len(metrics)), np.nan)
+        for row, name in enumerate(names):
+            for metric, value in (scenarios[name].get('proyecciones') or {}).items():
+                values[row, index[metric]] = parse_number(value)
+
+        ingresos, gastos = values[:, index['ingresos']], values[:, index['gastos']]
+        beneficio = values[:, index['beneficio']]
+        np.copyto(beneficio, ingresos - gastos, where=np.isnan(beneficio))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margen = np.where(ingresos != 0, beneficio / ingresos * 100, np.nan)
+        np.copyto(values[:, index['margen']], margen, where=np.isnan(values[:, index['margen']]))
+
+        return cls(
+            names, metrics, values,
+            [str(scenarios[name].get('descripcion', '')) for name in names],
+            [scenarios[name].get('supuestos') or [] for name in names]
+        )
+
+    @classmethod
+    def coerce(cls, scenarios: Any) -> 'ScenarioSet':
+        """Devuelve el ScenarioSet tal cual o lo construye a partir del formato dict"""
+        if isinstance(scenarios, cls):
+            return scenarios
+        return cls.from_dict(scenarios)
+
+    def __getitem__(self, name: str) -> Scenario:
+        return self._scenarios[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def value(self, name: str, metric: str, default: float = 0.0) -> float:
+        """Valor de una métrica en un escenario (default si no está disponible)"""
+        if name not in self._scenarios:
+            raise KeyError(name)
+        if metric not in self.metrics:
+            return default
+        value = self.values[self.names.index(name), self.metrics.index(metric)]
+        return default if np.isnan(value) else float(value)
+
+    def column(self, metric: str, names: Sequence[str] = SCENARIO_NAMES, default: float = 0.0) -> np.ndarray:
+        """Valores de una métrica para los escenarios indicados"""
+        return np.array([self.value(name, metric, default) for name in names])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Formato dict serializable en JSON"""
+        return {name: scenario.to_dict() for name, scenario in self._scenarios.items()}
@@ -0,0 +1,164 @@
+import logging
+from typing import Dict, Any, Optional, Sequence
+import numpy as np
+import pandas as pd
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Percentil de beneficio que representa cada escenario
+SCENARIO_QUANTILES = {'pesimista': 0.10, 'base': 0.50, 'optimista': 0.90}
+
+def monthly_matrix(operations: pd.DataFrame) -> pd.DataFrame:
+    """Importes mensuales por concepto (meses × conceptos) con los meses sin datos a cero"""
+    fechas = pd.to_datetime(operations['fecha'])
+    monthly = (operations.assign(mes=fechas.dt.to_period('M'))
+               .groupby(['mes', 'concepto'], observed=True)['importe'].sum()
+               .unstack(fill_value=0.0))
+    months = pd.period_range(monthly.index.min(), monthly.index.max(), freq='M')
+    return monthly.reindex(months, fill_value=0.0)
+
+class MonteCarloScenarioEngine:
+    """Simula escenarios a partir del histórico de operaciones.
+
+    Cada concepto se modela en escala log1p tras desestacionalizar, con tendencia lineal
+    y residuos correlacionados entre conceptos (Cholesky). La incertidumbre de la
+    tendencia también se muestrea en cada trayectoria.
+    """
+
+    def __init__(self, n_paths: Optional[int] = None, horizon: int = 12, seed: Optional[int] = 42,
+                 batch_size: int = 5000):
+        self.n_paths = n_paths or Config.MONTE_CARLO_PATHS
+        self.horizon = horizon
+        self.seed = seed
+        self.batch_size = batch_size
+        self.conceptos = None
+        self.is_ingreso = None
+        self.seasonal = None
+        self.last_month = None
+
+    def fit(self, operations: pd.DataFrame) -> 'MonteCarloScenarioEngine':
+        """Ajusta estacionalidad, tendencia y covarianza por concepto"""
+        if operations.empty:
+            raise ValueError("No hay operaciones históricas para ajustar el modelo")
+
+        monthly = monthly_matrix(operations)
+        tipos = operations.groupby('concepto', observed=True)['tipo'].agg(lambda t: t.mode().iat[0])
+        self.conceptos = list(monthly.columns)
+        self.is_ingreso = (tipos.reindex(self.conceptos).astype(str) == 'Ingreso').to_numpy()
+        self.last_month = monthly.index[-1]
+
+        values = monthly.to_numpy(dtype=np.float64)
+        month_of_year = monthly.index.month.to_numpy() - 1
+        n_months, n_conceptos = values.shape
+
+        # Índice estacional por mes del año (1.0 si no hay al menos un año completo)
+        self.seasonal = np.ones((12, n_conceptos))
+        if n_months >= 12:
+            sums = np.zeros((12, n_conceptos))
+            np.add.at(sums, month_of_year, values)
+            counts = np.bincount(month_of_year, minlength=12)[:, None]
+            means = sums / np.maximum(counts, 1)
+            overall = values.mean(axis=0)
+            self.seasonal = np.where(overall > 0, means / np.where(overall > 0, overall, 1), 1.0)
+            self.seasonal = np.where(self.seasonal > 0, self.seasonal, 1.0)
+
+        deseasonalized = values / self.seasonal[month_of_year]
+        y = np.log1p(deseasonalized)
+        x = np.arange(n_months) - (n_months - 1) / 2
+        sxx = max(float(x @ x), 1.0)
+        self._intercept = y.mean(axis=0)
+        self._slope = x @ (y - self._intercept) / sxx
+        residuals = y - self._intercept - np.outer(x, self._slope)
+        dof = max(n_months - 2, 1)
+        cov = residuals.T @ residuals / dof + np.eye(n_conceptos) * 1e-9
+        try:
+            self._chol = np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            self._chol = np.diag(np.sqrt(np.diag(cov)))
+        self._x_last = x[-1]
+        self._sxx = sxx
+        logger.info(f"Modelo Monte Carlo ajustado: {n_months} meses, {n_conceptos} conceptos")
+        return self
+
+    def simulate(self) -> Dict[str, np.ndarray]:
+        """Simula n_paths trayectorias y devuelve totales anuales y mensuales por trayectoria"""
+        if self.conceptos is None:
+            raise ValueError("El modelo no está ajustado")
+
+        rng = np.random.default_rng(self.seed)
+        n_conceptos = len(self.conceptos)
+        future_x = self._x_last + np.arange(1, self.horizon + 1)
+        future_index = pd.period_range(self.last_month + 1, periods=self.horizon, freq='M')
+        future_months = future_index.month.to_numpy() - 1
+        seasonal = self.seasonal[future_months]                      # horizonte × conceptos
+
+        monthly_ingresos = np.empty((self.n_paths, self.horizon))
+        monthly_gastos = np.empty((self.n_paths, self.horizon))
+        for start in range(0, self.n_paths, self.batch_size):
+            n = min(self.batch_size, self.n_paths - start)
+            slope = self._slope + rng.standard_normal((n, n_conceptos)) @ self._chol.T / np.sqrt(self._sxx)
+            shocks = rng.standard_normal((n, self.horizon, n_conceptos)) @ self._chol.T
+            log_amount = self._intercept + slope[:, None, :] * future_x[None, :, None] + shocks
+            amounts = np.maximum(np.expm1(log_amount), 0.0) * seasonal[None, :, :]
+            monthly_ingresos[start:start + n] = amounts[:, :, self.is_ingreso].sum(axis=2)
+            monthly_gastos[start:start + n] = amounts[:, :, ~self.is_ingreso].sum(axis=2)
+
+        ingresos = monthly_ingresos.sum(axis=1)
+        gastos = monthly_gastos.sum(axis=1)
+        beneficio = ingresos - gastos
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margen = np.where(ingresos > 0, beneficio / ingresos * 100, 0.0)
+        return {
+            'ingresos': ingresos,
+            'gastos': gastos,
+            'beneficio': beneficio,
+            'margen': margen,
+            'monthly_ingresos': monthly_ingresos,
+            'monthly_gastos': monthly_gastos
+        }
+
+    def scenarios(self, paths: Optional[Dict[str, np.ndarray]] = None,
+                  quantiles: Dict[str, float] = SCENARIO_QUANTILES, window: float = 0.01) -> Dict[str, Any]:
+        """Escenarios con el formato de ScenarioGenerator a partir de los percentiles de beneficio.
+
+        Para que ingresos, gastos y beneficio sean coherentes se promedian las trayectorias
+        cuyo beneficio está en una ventana alrededor de cada percentil.
+        """
+        paths = paths or self.simulate()
+        order = np.argsort(paths['beneficio'])
+        half = max(int(len(order) * window / 2), 1)
+        growth = np.expm1(self._slope * 12)
+        scenarios = {}
+        for name, q in quantiles.items():
+            center = int(q * (len(order) - 1))
+            selected = order[max(center - half, 0):center + half + 1]
+            ingresos = float(paths['ingresos'][selected].mean())
+            gastos = float(paths['gastos'][selected].mean())
+            beneficio = ingresos - gastos
+            scenarios[name] = {
+                'descripcion': (f"Percentil {q * 100:.0f} del beneficio en {self.n_paths:,} simulaciones "
+                                f"Monte Carlo a {self.horizon} meses sobre el histórico de operaciones."),
+                'proyecciones': {
+                    'ingresos': round(ingresos, 2),
+                    'gastos': round(gastos, 2),
+                    'beneficio': round(beneficio, 2),
+                    'margen': round(beneficio / ingresos * 100, 2) if ingresos else 0.0
+                },
+                'supuestos': [
+                    "Estacionalidad mensual estimada por concepto",
+                    "Correlación entre conceptos estimada a partir de los residuos históricos",
+                    f"Tendencia anual media de ingresos: {np.mean(growth[self.is_ingreso]) * 100:.1f}%"
+                    if self.is_ingreso.any() else "Sin ingresos históricos",
+                    f"Tendencia anual media de gastos: {np.mean(growth[~self.is_ingreso]) * 100:.1f}%"
+                    if (~self.is_ingreso).any() else "Sin gastos históricos"
+                ]
+            }
+        return scenarios
+
+    def monthly_bands(self, paths: Dict[str, np.ndarray], metric: str = 'ingresos',
+                      quantiles: Sequence[float] = (0.1, 0.5, 0.9)) -> pd.DataFrame:
+        """Percentiles mensuales de una métrica simulada"""
+        values = np.quantile(paths[f'monthly_{metric}'], quantiles, axis=0)
+        index = pd.period_range(self.last_month + 1, periods=self.horizon, freq='M')
+        return pd.DataFrame(values.T, index=index, columns=[f"p{int(q * 100)}" for q in quantiles])
@@ -0,0 +1,108 @@
+import time
+import logging
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, Callable, Iterator
+from visualization.scenario_visualizer import ScenarioVisualizer
+from .scenario_generator import ScenarioGenerator
+from .models import ScenarioSet
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_METRICS = ['ingresos', 'beneficio', 'margen']
+
+@dataclass
+class StageResult:
+    name: str
+    value: Any = None
+    error: Optional[Exception] = None
+    elapsed_ms: float = 0.0
+
+class ScenarioOrchestrator:
+    """Ejecuta el flujo de la pestaña de escenarios como un grafo de etapas concurrentes.
+
+    El análisis detallado y los gráficos arrancan en cuanto hay escenarios, la previsión
+    se calcula en paralelo con la generación, y cada etapa se entrega al terminar.
+    """
+
+    def __init__(self, generator: ScenarioGenerator, visualizer: ScenarioVisualizer, max_workers: int = 6):
+        self.generator = generator
+        self.visualizer = visualizer
+        self.max_workers = max_workers
+        self.timings: Dict[str, float] = {}
+
+    def _timed(self, fn: Callable, *args, **kwargs) -> tuple:
+        start = time.perf_counter()
+        value = fn(*args, **kwargs)
+        return value, (time.perf_counter() - start) * 1000
+
+    def _forecast_charts(self, forecast: Dict[str, Any]) -> list:
+        return [self.visualizer.create_forecast_chart(forecast, series)
+                for series in ScenarioVisualizer.FORECAST_SERIES.values()]
+
+    def _dependents(self, scenarios: ScenarioSet, context: Dict[str, Any]) -> Dict[str, tuple]:
+        return {
+            'analysis': (self.generator.generate_detailed_analysis, scenarios, context),
+            'comparison': (self.visualizer.create_comparison_chart, scenarios, 'ingresos'),
+            'dashboard': (self.visualizer.create_metrics_dashboard, scenarios, DASHBOARD_METRICS)
+        }
+
+    def run(self, generate: Callable[[], ScenarioSet], context: Optional[Dict[str, Any]] = None,
+            forecast: Optional[Callable[[], Dict[str, Any]]] = None) -> Iterator[StageResult]:
+        """Genera StageResult a medida que terminan las etapas.
+
+        Etapas: scenarios, forecast, analysis, comparison, dashboard, timeline y
+        forecast_chart. Si falla la generación de escenarios se detiene el flujo.
+        """
+        context = context or {}
+        start = time.perf_counter()
+        results: Dict[str, Any] = {}
+        self.timings = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending: Dict[Future, str] = {executor.submit(self._timed, generate): 'scenarios'}
+            if forecast is not None:
+                pending[executor.submit(self._timed, forecast)] = 'forecast'
+
+            def submit(name: str, fn: Callable, *args):
+                pending[executor.submit(self._timed, fn, *args)] = name
+
+            def submit_timeline():
+                # La línea temporal usa el perfil previsto, así que espera a la previsión si se ha pedido
+                forecast_settled = forecast is None or 'forecast' in results or 'forecast' in failed
+                if 'scenarios' in results and forecast_settled and 'timeline' not in submitted:
+                    submitted.add('timeline')
+                    submit('timeline', self.visualizer.create_timeline_chart, results['scenarios'],
+                           'ingresos', 4, results.get('forecast'))
+
+            failed, submitted = set(), set()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        value, elapsed_ms = future.result()
+                    except Exception as e:
+                        logger.error(f"Error en la etapa {name}: {e}")
+                        failed.add(name)
+                        yield StageResult(name, error=e)
+                        if name == 'scenarios':
+                            for other in pending:
+                                other.cancel()
+                            return
+                        submit_timeline()
+                        continue
+
+                    results[name] = value
+                    self.timings[name] = elapsed_ms
+                    yield StageResult(name, value, elapsed_ms=elapsed_ms)
+
+                    if name == 'scenarios':
+                        for stage, (fn, *args) in self._dependents(value, context).items():
+                            submit(stage, fn, *args)
+                    elif name == 'forecast':
+                        submit('forecast_chart', self._forecast_charts, value)
+                    submit_timeline()
+
+        self.timings['total'] = (time.perf_counter() - start) * 1000
+        logger.info(f"Flujo de escenarios completado en {self.timings['total']:.0f} ms")
@@ -0,0 +1,189 @@
+import json
+import time
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Optional, Callable, List
+import numpy as np
+import pandas as pd
+from config.config import Config
+from config.gpt_client import GPTClient
+from config.llm_backends import create_backend
+from .scenario_generator import ScenarioGenerator
+from .scenario_cache import ScenarioCache
+from .models import ScenarioSet
+
+logger = logging.getLogger(__name__)
+
+# Columnas de la tabla de cartera que no forman parte del contexto de la empresa
+FINANCIAL_COLUMNS = ['empresa', 'ingresos', 'gastos']
+
+class PortfolioRunner:
+    """Genera escenarios y análisis para una cartera de empresas con paralelismo acotado.
+
+    Cada resultado se guarda en SQLite en cuanto termina, de modo que una ejecución
+    interrumpida se puede reanudar con el mismo run_id sin repetir las empresas hechas.
+    """
+
+    def __init__(self, gpt_client: Optional[GPTClient] = None, max_workers: Optional[int] = None,
+                 db_path: Optional[str] = None, analysis: bool = True):
+        self.gpt_client = gpt_client or GPTClient()
+        self.max_workers = max_workers or Config.PORTFOLIO_MAX_WORKERS
+        self.db_path = db_path or Config.DB_PATH
+        # La caché de escenarios vive en la misma base de datos que los resultados
+        cache = ScenarioCache(self.db_path) if Config.SCENARIO_CACHE_ENABLED else None
+        self.generator = ScenarioGenerator(self.gpt_client, cache=cache)
+        self.analysis = analysis
+        self._initialize_db()
+
+    def _initialize_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS portfolio_results (
+                    run_id TEXT,
+                    empresa TEXT,
+                    status TEXT CHECK(status IN ('ok', 'error')),
+                    sector TEXT,
+                    region TEXT,
+                    scenarios TEXT,
+                    analysis TEXT,
+                    error TEXT,
+                    latency_ms REAL,
+                    finished_at DATETIME,
+                    PRIMARY KEY (run_id, empresa)
+                )
+            """)
+
+    @staticmethod
+    def _task(row: Dict[str, Any]) -> Dict[str, Any]:
+        financial_data = {'ingresos': float(row['ingresos']), 'gastos': float(row['gastos'])}
+        context = {k: v for k, v in row.items() if k not in FINANCIAL_COLUMNS and pd.notna(v)}
+        return {'financial_data': financial_data, 'context': context}
+
+    def _process(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        scenarios = self.generator.generate_scenarios(task['financial_data'], task['context'])
+        analysis = None
+        if self.analysis:
+            analysis = self.generator.generate_detailed_analysis(scenarios, task['context'])
+        return {'scenarios': scenarios, 'analysis': analysis, 'latency_ms': (time.perf_counter() - start) * 1000}
+
+    def completed_companies(self, run_id: str) -> set:
+        """Empresas ya procesadas correctamente en una ejecución"""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT empresa FROM portfolio_results WHERE run_id = ? AND status = 'ok'", (run_id,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def _save(self, conn: sqlite3.Connection, run_id: str, empresa: str, task: Dict[str, Any],
+              result: Optional[Dict[str, Any]], error: Optional[str] = None):
+        conn.execute("""
+            INSERT OR REPLACE INTO portfolio_results
+            (run_id, empresa, status, sector, region, scenarios, analysis, error, latency_ms, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            run_id, empresa, 'error' if error else 'ok',
+            task['context'].get('sector'), task['context'].get('region'),
+            json.dumps(ScenarioSet.coerce(result['scenarios']).to_dict(), ensure_ascii=False) if result else None,
+            result['analysis'] if result else None,
+            error,
+            result['latency_ms'] if result else None,
+            datetime.now().isoformat()
+        ))
+        conn.commit()
+
+    def run(self, companies: pd.DataFrame, run_id: Optional[str] = None,
+            progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """Procesa la cartera y devuelve las métricas de rendimiento de la ejecución.
+
+        companies necesita las columnas empresa, ingresos y gastos; el resto (sector,
+        region, ...) se pasa como contexto. Las empresas con los mismos datos y contexto
+        comparten una única llamada.
+        """
+        missing = set(FINANCIAL_COLUMNS) - set(companies.columns)
+        if missing:
+            raise ValueError(f"Faltan columnas en la cartera: {missing}")
+
+        run_id = run_id or datetime.now().strftime('%Y%m%d%H%M%S')
+        started_at = datetime.now()
+        start = time.perf_counter()
+        done = self.completed_companies(run_id)
+        pending = [row for row in companies.astype({'empresa': str}).to_dict('records') if row['empresa'] not in done]
+
+        # Agrupa empresas idénticas para reutilizar el mismo resultado
+        groups: Dict[str, List[str]] = {}
+        tasks: Dict[str, Dict[str, Any]] = {}
+        for row in pending:
+            task = self._task(row)
+            key = json.dumps(task, sort_keys=True, ensure_ascii=False, default=str)
+            groups.setdefault(key, []).append(row['empresa'])
+            tasks[key] = task
+
+        latencies, failed, finished = [], 0, 0
+        with sqlite3.connect(self.db_path) as conn, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._process, task): key for key, task in tasks.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    result, error = future.result(), None
+                    latencies.append(result['latency_ms'])
+                except Exception as e:
+                    result, error = None, str(e)
+                    logger.error(f"Error procesando empresas {groups[key]}: {e}")
+                for empresa in groups[key]:
+                    self._save(conn, run_id, empresa, tasks[key], result, error)
+                    failed += error is not None
+                    finished += 1
+                if progress:
+                    progress(finished, len(pending))
+
+        elapsed = time.perf_counter() - start
+        calls = self.gpt_client.ledger.get_calls(since=started_at)
+        metrics = {
+            'run_id': run_id,
+            'companies': len(companies),
+            'skipped': len(companies) - len(pending),
+            'processed': finished - failed,
+            'failed': failed,
+            'deduplicated': len(pending) - len(tasks),
+            'elapsed_s': round(elapsed, 3),
+            'companies_per_second': round(finished / elapsed, 3) if elapsed > 0 else 0.0,
+            'p50_latency_ms': float(np.percentile(latencies, 50)) if latencies else 0.0,
+            'p95_latency_ms': float(np.percentile(latencies, 95)) if latencies else 0.0,
+            'llm_calls': int(len(calls)),
+            'cache_hits': int((calls['cache_tier'] != 'none').sum()) if not calls.empty else 0
+        }
+        logger.info(f"Cartera {run_id}: {metrics['processed']} empresas en {metrics['elapsed_s']} s")
+        return metrics
+
+    def get_results(self, run_id: str) -> pd.DataFrame:
+        """Resultados guardados de una ejecución"""
+        with sqlite3.connect(self.db_path) as conn:
+            return pd.read_sql_query(
+                "SELECT * FROM portfolio_results WHERE run_id = ? ORDER BY empresa", conn, params=(run_id,)
+            )
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Genera escenarios para una cartera de empresas")
+    parser.add_argument('input', help="CSV con columnas empresa, ingresos, gastos, sector, region")
+    parser.add_argument('--run-id', help="Identificador de la ejecución (para reanudarla)")
+    parser.add_argument('--workers', type=int, default=Config.PORTFOLIO_MAX_WORKERS)
+    parser.add_argument('--backend', default=None, help="openai, fake o cassette")
+    parser.add_argument('--no-analysis', action='store_true', help="Solo escenarios, sin análisis detallado")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    companies = pd.read_csv(args.input)
+    runner = PortfolioRunner(GPTClient(create_backend(args.backend)), max_workers=args.workers,
+                             analysis=not args.no_analysis)
+    metrics = runner.run(companies, run_id=args.run_id,
+                         progress=lambda done, total: print(f"\r{done}/{total}", end='', flush=True))
+    print()
+    print(json.dumps(metrics, indent=2))
+    return metrics
+
+if __name__ == '__main__':
+    main()
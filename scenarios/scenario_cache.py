@@ -0,0 +1,129 @@
+import math
+import json
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from config.config import Config
+from .models import ScenarioSet
+
+logger = logging.getLogger(__name__)
+
+def bucket(value: float, tolerance: float) -> int:
+    """Cubo logarítmico de anchura relativa tolerance (con signo; 0 para importes nulos)"""
+    if not value:
+        return 0
+    index = int(math.floor(math.log(abs(value)) / math.log1p(tolerance))) + 1
+    return index if value > 0 else -index
+
+class ScenarioCache:
+    """Memoiza escenarios por sector/región e importes agrupados en cubos relativos.
+
+    Un acierto reescala las proyecciones guardadas a los importes pedidos, de modo que
+    pequeñas variaciones en los datos de entrada no provocan otra llamada al LLM.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, tolerance: Optional[float] = None,
+                 ttl: Optional[int] = None):
+        self.db_path = db_path or Config.DB_PATH
+        self.tolerance = tolerance or Config.SCENARIO_CACHE_TOLERANCE
+        self.ttl = ttl or Config.CACHE_TTL
+        self._initialize_db()
+
+    def _initialize_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scenario_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    ingresos REAL,
+                    gastos REAL,
+                    scenarios TEXT,
+                    hits INTEGER DEFAULT 0,
+                    created_at DATETIME,
+                    expires_at DATETIME
+                )
+            """)
+            # Contadores acumulados de consultas: el ratio no depende de las entradas guardadas
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scenario_cache_stats (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO scenario_cache_stats (name, value) VALUES ('hits', 0), ('misses', 0)")
+
+    def key(self, financial_data: Dict[str, float], context: Dict[str, Any]) -> str:
+        payload = {
+            'sector': str(context.get('sector', '')).strip().lower(),
+            'region': str(context.get('region', '')).strip().lower(),
+            'ingresos': bucket(float(financial_data['ingresos']), self.tolerance),
+            'gastos': bucket(float(financial_data['gastos']), self.tolerance)
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _rescale(scenarios: Dict[str, Any], ingresos_factor: float, gastos_factor: float) -> ScenarioSet:
+        rescaled = {}
+        for name, scenario in scenarios.items():
+            proyecciones = dict(scenario.get('proyecciones', {}))
+            if 'ingresos' in proyecciones:
+                proyecciones['ingresos'] = round(proyecciones['ingresos'] * ingresos_factor, 2)
+            if 'gastos' in proyecciones:
+                proyecciones['gastos'] = round(proyecciones['gastos'] * gastos_factor, 2)
+            if 'ingresos' in proyecciones and 'gastos' in proyecciones:
+                # beneficio y margen se vuelven a derivar de los importes reescalados
+                proyecciones.pop('beneficio', None)
+                proyecciones.pop('margen', None)
+            rescaled[name] = {**scenario, 'proyecciones': proyecciones}
+        return ScenarioSet.from_dict(rescaled)
+
+    def get(self, financial_data: Dict[str, float], context: Dict[str, Any]) -> Optional[ScenarioSet]:
+        """Escenarios reescalados a financial_data si hay una entrada vigente en el mismo cubo"""
+        cache_key = self.key(financial_data, context)
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("""
+                SELECT ingresos, gastos, scenarios FROM scenario_cache
+                WHERE cache_key = ? AND expires_at > ?
+            """, (cache_key, datetime.now())).fetchone()
+            conn.execute("UPDATE scenario_cache_stats SET value = value + 1 WHERE name = ?",
+                         ('misses' if row is None else 'hits',))
+            if row is None:
+                return None
+            conn.execute("UPDATE scenario_cache SET hits = hits + 1 WHERE cache_key = ?", (cache_key,))
+
+        ingresos, gastos, scenarios = row
+        ingresos_factor = float(financial_data['ingresos']) / ingresos if ingresos else 1.0
+        gastos_factor = float(financial_data['gastos']) / gastos if gastos else 1.0
+        logger.info(f"Escenarios recuperados de caché (factores {ingresos_factor:.4f}/{gastos_factor:.4f})")
+        return self._rescale(json.loads(scenarios), ingresos_factor, gastos_factor)
+
+    def set(self, financial_data: Dict[str, float], context: Dict[str, Any], scenarios: ScenarioSet):
+        now = datetime.now()
+        with sqlite3.connect(self.db_path) as conn:
+            # Una entrada reescrita conserva sus aciertos
+            conn.execute("""
+                INSERT INTO scenario_cache (cache_key, ingresos, gastos, scenarios, hits, created_at, expires_at)
+                VALUES (?, ?, ?, ?, 0, ?, ?)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    ingresos = excluded.ingresos,
+                    gastos = excluded.gastos,
+                    scenarios = excluded.scenarios,
+                    created_at = excluded.created_at,
+                    expires_at = excluded.expires_at
+            """, (
+                self.key(financial_data, context),
+                float(financial_data['ingresos']),
+                float(financial_data['gastos']),
+                json.dumps(scenarios.to_dict(), ensure_ascii=False),
+                now,
+                now + timedelta(seconds=self.ttl)
+            ))
+
+    def stats(self) -> Dict[str, float]:
+        """Aciertos, fallos (consultas sin entrada vigente) y ratio de aciertos acumulados"""
+        with sqlite3.connect(self.db_path) as conn:
+            counters = dict(conn.execute("SELECT name, value FROM scenario_cache_stats").fetchall())
+        hits, misses = counters['hits'], counters['misses']
+        total = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_ratio': hits / total if total else 0.0}
@@ -4,30 +4,98 @@ import json
 import logging
 import re
 from config.gpt_client import GPTClient
+from .monte_carlo import MonteCarloScenarioEngine
+from .models import ScenarioSet
+from .scenario_cache import ScenarioCache
+from config.config import Config
 
 logger = logging.getLogger(__name__)
 
+def _strip_code_fences(text: str) -> str:
+   """Quita el bloque ```json ... ``` con el que algunos modelos envuelven el JSON"""
+   match = re.match(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", text or "", re.DOTALL)
+   return match.group(1) if match else text
+
 class ScenarioGenerator:
-   def __init__(self, gpt_client: GPTClient):
+   def __init__(self, gpt_client: GPTClient, cache: Optional[ScenarioCache] = None):
        self.gpt_client = gpt_client
+       self._cache = cache
+
+   @property
+   def cache(self) -> Optional[ScenarioCache]:
+       """Caché de escenarios; la tabla por defecto solo se crea al usarla por primera vez"""
+       if self._cache is None and Config.SCENARIO_CACHE_ENABLED:
+           self._cache = ScenarioCache()
+       return self._cache
 
-   def generate_scenarios(self, financial_data: Dict[str, float], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+   def _cacheable(self, financial_data: Any) -> bool:
+       return (isinstance(financial_data, dict) and 'ingresos' in financial_data
+               and 'gastos' in financial_data and self.cache is not None)
+
+   def generate_scenarios(self, financial_data: Dict[str, float], context: Optional[Dict[str, Any]] = None) -> ScenarioSet:
     try:
-        prompt = self._format_financial_data(financial_data)
         context = context or {}
+        if self._cacheable(financial_data):
+            cached = self.cache.get(financial_data, context)
+            if cached is not None:
+                return cached
+
+        prompt = self._format_financial_data(financial_data)
         scenarios_str = self.gpt_client.generate_scenarios(prompt, context)
         
         try:
-            scenarios = json.loads(scenarios_str)
-            return self._validate_scenarios(scenarios)
+            scenarios = ScenarioSet.from_dict(self._validate_scenarios(json.loads(scenarios_str)))
         except json.JSONDecodeError:
-            return self._format_unstructured_response(scenarios_str)
+            scenarios = ScenarioSet.from_dict(self._format_unstructured_response(scenarios_str))
+
+        if self._cacheable(financial_data):
+            self.cache.set(financial_data, context, scenarios)
+        return scenarios
     except Exception as e:
         logger.error(f"Error generating scenarios: {e}")
         raise
 
-   def generate_detailed_analysis(self, scenarios: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> str:
-       return self.gpt_client.generate_financial_opinion(json.dumps(scenarios), context or {})
+   def generate_scenarios_from_history(self, operations: pd.DataFrame, context: Optional[Dict[str, Any]] = None,
+                                       narrative: bool = True, horizon: int = 12) -> ScenarioSet:
+       """Calcula los escenarios con Monte Carlo sobre el histórico; GPT solo redacta la narrativa"""
+       engine = MonteCarloScenarioEngine(horizon=horizon).fit(operations)
+       scenarios = engine.scenarios()
+       if not narrative:
+           return ScenarioSet.from_dict(scenarios)
+
+       try:
+           narrative_str = self.gpt_client.generate_scenarios(self._format_narrative_request(scenarios), context or {})
+           narratives = json.loads(_strip_code_fences(narrative_str))
+           for name, scenario in scenarios.items():
+               text = narratives.get(name, {})
+               if text.get('descripcion'):
+                   scenario['descripcion'] = text['descripcion']
+               if text.get('supuestos'):
+                   scenario['supuestos'] = scenario['supuestos'] + list(text['supuestos'])
+       except (json.JSONDecodeError, AttributeError) as e:
+           logger.warning(f"Narrativa de escenarios no estructurada, se mantienen las descripciones calculadas: {e}")
+       except Exception as e:
+           # Las proyecciones ya están calculadas: un fallo del LLM solo deja sin narrativa
+           logger.error(f"Error generando la narrativa de escenarios: {e}")
+       return ScenarioSet.from_dict(scenarios)
+
+   def _format_narrative_request(self, scenarios: Dict[str, Any]) -> str:
+    projections = {name: data['proyecciones'] for name, data in scenarios.items()}
+    return f"""Las proyecciones a 12 meses ya están calculadas mediante simulación sobre el histórico
+    de la empresa y no deben modificarse:
+    {json.dumps(projections, ensure_ascii=False)}
+
+    Redacta para cada escenario una descripción breve y los supuestos del sector que lo explican.
+    Responde en formato JSON con esta estructura:
+    {{
+        "base": {{"descripcion": "", "supuestos": []}},
+        "optimista": {{...}},
+        "pesimista": {{...}}
+    }}"""
+
+   def generate_detailed_analysis(self, scenarios: Union[ScenarioSet, Dict[str, Any]],
+                                  context: Optional[Dict[str, Any]] = None) -> str:
+       return self.gpt_client.generate_financial_opinion(ScenarioSet.coerce(scenarios).to_dict(), context or {})
 
    def _format_financial_data(self, data: Dict[str, float]) -> str:
     return f"""Por favor, analiza la siguiente situación financiera y genera tres escenarios (base, optimista y pesimista) con el siguiente formato estructurado:
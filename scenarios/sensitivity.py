@@ -0,0 +1,79 @@
+import logging
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .forecasting import monthly_series
+
+logger = logging.getLogger(__name__)
+
+class SensitivityAnalyzer:
+    """Barrido what-if de crecimiento de ingresos × inflación de costes sobre agregados mensuales.
+
+    El crecimiento y la inflación se aplican con capitalización mensual, y la parte variable
+    de los gastos escala además con el volumen de ingresos.
+    """
+
+    def __init__(self, monthly_ingresos: np.ndarray, monthly_gastos: np.ndarray,
+                 variable_cost_share: float = 0.0):
+        self.monthly_ingresos = np.asarray(monthly_ingresos, dtype=np.float64)
+        self.monthly_gastos = np.asarray(monthly_gastos, dtype=np.float64)
+        if self.monthly_ingresos.shape != self.monthly_gastos.shape:
+            raise ValueError("Ingresos y gastos mensuales deben tener la misma longitud")
+        if not 0.0 <= variable_cost_share <= 1.0:
+            raise ValueError("variable_cost_share debe estar entre 0 y 1")
+        self.variable_cost_share = variable_cost_share
+
+    @classmethod
+    def from_operations(cls, operations: pd.DataFrame, months: int = 12, **kwargs) -> 'SensitivityAnalyzer':
+        """Usa los últimos meses del histórico de operaciones como base"""
+        if operations.empty:
+            raise ValueError("No hay operaciones históricas para el análisis de sensibilidad")
+        monthly = monthly_series(operations).tail(months)
+        return cls(monthly['Total Ingresos'].to_numpy(), monthly['Total Gastos'].to_numpy(), **kwargs)
+
+    @classmethod
+    def from_financial_data(cls, financial_data: Dict[str, float], months: int = 12,
+                            **kwargs) -> 'SensitivityAnalyzer':
+        """Reparte los totales anuales de ingresos y gastos a partes iguales entre los meses"""
+        ingresos = float(financial_data.get('ingresos', 0)) / months
+        gastos = float(financial_data.get('gastos', 0)) / months
+        return cls(np.full(months, ingresos), np.full(months, gastos), **kwargs)
+
+    def grid(self, growth_range: Tuple[float, float] = (-0.2, 0.3),
+             inflation_range: Tuple[float, float] = (-0.05, 0.15),
+             steps: Tuple[int, int] = (200, 200)) -> Dict[str, Any]:
+        """Resultados anuales en una rejilla (inflación × crecimiento) calculada por broadcasting"""
+        growth = np.linspace(*growth_range, steps[0])
+        inflation = np.linspace(*inflation_range, steps[1])
+        exponent = np.arange(1, len(self.monthly_ingresos) + 1) / 12
+
+        # Factores acumulados por mes: (pasos, meses) @ (meses,) -> (pasos,)
+        ingresos = (1 + growth[:, None]) ** exponent @ self.monthly_ingresos
+        growth_factor = ingresos / self.monthly_ingresos.sum() if self.monthly_ingresos.sum() else np.ones_like(growth)
+        gastos_base = (1 + inflation[:, None]) ** exponent @ self.monthly_gastos
+
+        volume = 1 - self.variable_cost_share + self.variable_cost_share * growth_factor
+        gastos = gastos_base[:, None] * volume[None, :]                       # inflación × crecimiento
+        ingresos_grid = np.broadcast_to(ingresos[None, :], gastos.shape)
+        beneficio = ingresos_grid - gastos
+        with np.errstate(divide='ignore', invalid='ignore'):
+            margen = np.where(ingresos_grid > 0, beneficio / ingresos_grid * 100, 0.0)
+
+        logger.info(f"Rejilla de sensibilidad calculada: {gastos.shape[0]}×{gastos.shape[1]}")
+        return {
+            'growth': growth,
+            'inflation': inflation,
+            'ingresos': ingresos_grid,
+            'gastos': gastos,
+            'beneficio': beneficio,
+            'margen': margen
+        }
+
+    @staticmethod
+    def breakeven_inflation(grid: Dict[str, Any]) -> np.ndarray:
+        """Inflación de costes a partir de la cual el beneficio es negativo, por crecimiento"""
+        negative = grid['beneficio'] < 0
+        first = negative.argmax(axis=0)
+        result = grid['inflation'][first].astype(np.float64)
+        result[~negative.any(axis=0)] = np.nan
+        return result
@@ -0,0 +1,110 @@
+import pytest
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from config.config import Config
+from ml_analysis.anomaly_detection import P2Quantile, RobustStats, AnomalyDetector
+from utils.database import DatabaseManager
+
+@pytest.fixture
+def db(tmp_path):
+    return DatabaseManager(os.path.join(tmp_path, "anomalies.db"))
+
+def normal_operations(n: int = 60) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'fecha': pd.date_range('2024-01-01', periods=n, freq='3D'),
+        'concepto': 'Electricidad',
+        'entidad': 'Iberdrola',
+        'tipo': 'Gasto',
+        'importe': rng.normal(250, 20, n).round(2)
+    })
+
+def test_p2_quantile_tracks_median():
+    values = np.random.default_rng(1).lognormal(3, 1, 20000)
+    estimator = P2Quantile(0.5)
+    for value in values:
+        estimator.update(value)
+    assert estimator.value() == pytest.approx(np.median(values), rel=0.02)
+
+def test_robust_stats_scores_outliers():
+    stats = RobustStats()
+    for value in np.random.default_rng(2).normal(100, 5, 1000):
+        stats.update(value)
+    assert abs(stats.score(101)) < 1
+    assert stats.score(200) > 10
+
+def test_flags_outliers_and_duplicates(db):
+    operations = normal_operations()
+    db.add_operations_bulk(operations)
+    detector = AnomalyDetector(db)
+    assert detector.process_new() == 0
+
+    db.add_operation(datetime(2024, 6, 1), 'Electricidad', 'Iberdrola', 'Gasto', 2500.0)
+    db.add_operation(datetime(2024, 6, 3), 'Electricidad', 'Iberdrola', 'Gasto', 2500.0)
+    db.add_operation(datetime(2024, 6, 20), 'Electricidad', 'Iberdrola', 'Gasto', 255.0)
+    assert detector.process_new() >= 2
+
+    flags = db.get_operation_flags()
+    assert set(flags['flag']) == {'importe_atipico', 'duplicado'}
+    assert (flags.loc[flags['flag'] == 'importe_atipico', 'importe'] == 2500.0).all()
+    assert len(db.get_operation_flags('duplicado')) == 1
+    assert 255.0 not in flags['importe'].tolist()
+
+def test_process_new_is_incremental_and_idempotent(db):
+    db.add_operations_bulk(normal_operations())
+    detector = AnomalyDetector.for_database(db)
+    assert AnomalyDetector.for_database(db) is detector
+    detector.process_new()
+    last_id = detector.last_operation_id
+    assert detector.process_new() == 0
+    assert detector.last_operation_id == last_id
+
+    # Un detector nuevo reprocesa el libro sin duplicar las marcas guardadas
+    db.add_operation(datetime(2024, 6, 1), 'Electricidad', 'Iberdrola', 'Gasto', 5000.0)
+    detector.process_new()
+    before = len(db.get_operation_flags())
+    AnomalyDetector(db).process_new()
+    assert len(db.get_operation_flags()) == before
+
+def test_isolation_forest_refreshes_in_background(db, monkeypatch):
+    monkeypatch.setattr(Config, 'ANOMALY_FOREST_CONTAMINATION', 0.1)
+    db.add_operations_bulk(normal_operations(200))
+    detector = AnomalyDetector(db, isolation_forest=True)
+    detector.process_new()
+    detector.refresh_forest_async().join(timeout=30)
+    assert detector.forest is not None
+
+    db.add_operation(datetime(2024, 3, 15), 'Electricidad', 'Iberdrola', 'Ingreso', 90000.0)
+    detector.process_new()
+    assert 'isolation_forest' in set(db.get_operation_flags()['flag'])
+
+def test_flags_are_dropped_with_their_operations(db):
+    db.add_operations_bulk(normal_operations())
+    db.add_operation(datetime(2024, 6, 1), 'Electricidad', 'Iberdrola', 'Gasto', 5000.0)
+    detector = AnomalyDetector(db)
+    detector.process_new()
+    assert not db.get_operation_flags().empty
+
+    # Reinicio como el de los datos demo: los ids vuelven a empezar desde 1
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name='operations'")
+        assert conn.execute("SELECT COUNT(*) FROM operation_flags").fetchone()[0] == 0
+    db.add_operations_bulk(normal_operations(10))
+    assert detector.process_new() == 0
+    assert detector.last_operation_id == 10
+    assert sum(stats.count for stats in detector.stats.values()) == 10
+
+def test_process_new_async_catches_up(db):
+    db.add_operations_bulk(normal_operations())
+    detector = AnomalyDetector(db)
+    detector.process_new_async().join(timeout=30)
+    assert detector.last_operation_id == 60
+
+    db.add_operation(datetime(2024, 6, 1), 'Electricidad', 'Iberdrola', 'Gasto', 5000.0)
+    detector.process_new_async().join(timeout=30)
+    assert detector.last_operation_id == 61
+    assert len(db.get_operation_flags('importe_atipico')) == 1
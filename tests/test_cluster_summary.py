@@ -0,0 +1,50 @@
+import pytest
+import json
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+from config.config import Config
+from ml_analysis.clustering import FinancialClustering, summarize_clusters, expand_cluster_summary
+
+@pytest.fixture
+def clustered():
+    rng = np.random.default_rng(3)
+    data = pd.DataFrame(rng.normal(size=(1000, 4)) * [1, 10, 100, 1e6], columns=['a', 'b', 'c', 'd'])
+    data['Cluster'] = rng.integers(0, 3, size=len(data))
+    return data
+
+def test_summary_matches_pandas(clustered, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
+    features = ['a', 'b', 'c', 'd']
+    clustering = FinancialClustering(Mock())
+    clustering.features = features
+    centroids = np.zeros((3, 4))
+    summary = clustering._create_cluster_summary(clustered, centroids)
+
+    grouped = clustered.groupby('Cluster')[features]
+    for i in range(3):
+        info = summary[f'cluster_{i}']
+        assert info['size'] == int((clustered['Cluster'] == i).sum())
+        assert info['percentage'] == pytest.approx(info['size'] / len(clustered) * 100)
+        for key, expected in [('mean_values', grouped.mean()), ('min_values', grouped.min()),
+                              ('max_values', grouped.max()), ('std_values', grouped.std())]:
+            assert info[key] == pytest.approx(expected.loc[i].to_dict())
+        assert info['quantiles']['p50'] == pytest.approx(grouped.median().loc[i].to_dict())
+
+def test_std_is_stable_with_large_mean():
+    rng = np.random.default_rng(3)
+    values = 1e9 + rng.normal(0, 1e-3, size=(5000, 2))
+    labels = np.zeros(len(values), dtype=int)
+    compact = summarize_clusters(values, labels, np.zeros((1, 2)), ['a', 'b'])
+    assert compact['std'][0] == pytest.approx(values.std(axis=0, ddof=1), rel=1e-6)
+
+def test_compact_form_is_serializable_and_handles_empty_clusters(clustered):
+    values = clustered[['a', 'b']].to_numpy()
+    labels = np.where(clustered['Cluster'].to_numpy() == 1, 2, clustered['Cluster'].to_numpy())
+    compact = summarize_clusters(values, labels, np.zeros((3, 2)), ['a', 'b'])
+    assert json.loads(json.dumps(compact))['size'] == compact['size']
+
+    summary = expand_cluster_summary(compact)
+    assert summary['cluster_1']['size'] == 0
+    assert np.isnan(summary['cluster_1']['mean_values']['a'])
+    assert sum(info['size'] for info in summary.values()) == len(clustered)
@@ -2,6 +2,7 @@ import pytest
 import pandas as pd
 import numpy as np
 from ml_analysis.clustering import FinancialClustering
+from config.config import Config
 from config.gpt_client import GPTClient
 
 @pytest.fixture
@@ -29,8 +30,9 @@ def default_context():
     }
 
 @pytest.fixture
-def clustering_instance():
+def clustering_instance(tmp_path, monkeypatch):
     """Crear instancia de FinancialClustering"""
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
     gpt_client = GPTClient()
     return FinancialClustering(gpt_client)
 
@@ -0,0 +1,123 @@
+import pytest
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.database import DatabaseManager
+from config.config import Config
+from utils.columnar_snapshot import ColumnarSnapshot, SNAPSHOT_COLUMNS, load_operations
+from scenarios.forecasting import monthly_series
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "snapshot.db"))
+    db.add_operation(datetime(2024, 1, 10), 'Alquiler', 'Inmobiliaria Centro', 'Gasto', 800.0)
+    db.add_operation(datetime(2024, 1, 15), 'Ventas', 'Cliente A', 'Ingreso', 1500.0)
+    return db
+
+def test_snapshot_matches_database(db):
+    snapshot = ColumnarSnapshot(db)
+    assert snapshot.refresh() == 2
+    data = snapshot.read()
+    expected = db.get_historical_data().sort_values('id').reset_index(drop=True)
+    assert data['id'].tolist() == expected['id'].tolist()
+    assert data['concepto'].astype(str).tolist() == expected['concepto'].astype(str).tolist()
+    assert data['importe'].tolist() == expected['importe'].tolist()
+    assert (data['fecha'] == pd.to_datetime(expected['fecha'])).all()
+
+def test_incremental_append_keeps_codes(db):
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    codes = snapshot.columns(['concepto'])['concepto'].copy()
+    db.add_operation(datetime(2024, 2, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    db.add_operation(datetime(2024, 2, 10), 'Alquiler', 'Inmobiliaria Centro', 'Gasto', 800.0)
+    assert snapshot.refresh() == 2
+    assert snapshot.refresh() == 0
+    assert snapshot.n_rows == 4
+    new_codes = snapshot.columns(['concepto'])['concepto']
+    assert (new_codes[:2] == codes).all()
+    assert new_codes[3] == codes[0]
+    assert snapshot.dictionary('concepto') == ['Alquiler', 'Ventas', 'Agua']
+
+def test_rewrites_trigger_rebuild(db):
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE operations SET importe = 900 WHERE concepto = 'Alquiler'")
+    snapshot.refresh()
+    assert snapshot.n_rows == 2
+    assert sorted(snapshot.read(['importe'])['importe']) == [900.0, 1500.0]
+
+def test_interrupted_write_is_discarded(db):
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    with open(snapshot._file('importe'), 'ab') as f:
+        f.write(b'\x00' * 8)
+    db.add_operation(datetime(2024, 2, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    ColumnarSnapshot(db).refresh()
+    assert os.path.getsize(snapshot._file('importe')) == 3 * SNAPSHOT_COLUMNS['importe'].itemsize
+    assert ColumnarSnapshot(db).read(['importe'])['importe'].tolist() == [800.0, 1500.0, 80.0]
+
+def test_selected_columns_are_zero_copy(db):
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    arrays = snapshot.columns(['importe', 'fecha'])
+    data = snapshot._frame(dict(arrays), snapshot.meta['dictionaries'], decode=True)
+    assert list(data.columns) == ['importe', 'fecha']
+    assert np.shares_memory(data['importe'].to_numpy(), arrays['importe'])
+    assert np.shares_memory(data['fecha'].to_numpy(), arrays['fecha'])
+
+def test_sample(db):
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    sample = snapshot.sample(1, ['concepto', 'importe'])
+    assert len(sample) == 1
+    assert isinstance(sample['concepto'].dtype, pd.CategoricalDtype)
+    assert len(snapshot.sample(10)) == 2
+
+def test_iter_batches_matches_iter_operations(db):
+    for day in range(1, 8):
+        db.add_operation(datetime(2024, 3, day), 'Agua', 'Canal Isabel II', 'Gasto', 10.0 * day)
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    batches = list(snapshot.iter_batches(3, ['id', 'concepto', 'importe'], until_id=7))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    data = pd.concat(batches, ignore_index=True)
+    expected = pd.concat(db.iter_operations(3, until_id=7), ignore_index=True)
+    assert data['id'].tolist() == expected['id'].tolist()
+    assert data['concepto'].astype(str).tolist() == expected['concepto'].tolist()
+    assert data['importe'].tolist() == expected['importe'].tolist()
+
+def test_load_operations_matches_historical_data(db, monkeypatch):
+    db.add_operation(datetime(2024, 2, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    loaded = load_operations(db)
+    assert list(loaded['concepto'].cat.categories) == ['Agua', 'Alquiler', 'Ventas']
+    pd.testing.assert_frame_equal(monthly_series(loaded), monthly_series(db.get_historical_data()))
+
+    # Numéricas y fecha son vistas de solo lectura de los ficheros, no copias
+    assert not loaded['importe'].to_numpy().flags.writeable
+    # Y siguen siendo válidas tras una reconstrucción, que escribe una nueva generación de ficheros
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations WHERE concepto = 'Agua'")
+    ColumnarSnapshot.for_database(db).refresh()
+    assert loaded['importe'].sum() == 2380.0
+
+    monkeypatch.setattr(Config, 'COLUMNAR_SNAPSHOT_ENABLED', False)
+    assert load_operations(db)['importe'].sum() == 2300.0
+
+def test_rebuild_keeps_open_views_valid(db):
+    snapshot = ColumnarSnapshot(db)
+    snapshot.refresh()
+    before = snapshot.read(['concepto', 'importe'])
+    old_file = snapshot._file('importe')
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations WHERE concepto = 'Alquiler'")
+    snapshot.refresh()
+    assert snapshot._file('importe') != old_file
+    assert before['importe'].tolist() == [800.0, 1500.0]
+    assert before['concepto'].astype(str).tolist() == ['Alquiler', 'Ventas']
+    after = snapshot.read(['concepto', 'importe'])
+    assert after['concepto'].astype(str).tolist() == ['Ventas']
+    assert sorted(name for name in os.listdir(snapshot.path) if name.endswith('.bin')) == \
+        sorted(os.path.basename(snapshot._file(column)) for column in SNAPSHOT_COLUMNS)
@@ -0,0 +1,50 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+import utils.database as database
+from utils.database import DatabaseManager, compact_operations, concat_compact
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "compact.db"))
+    db.add_operations_bulk(pd.DataFrame({
+        'fecha': pd.date_range('2024-01-01', periods=40, freq='D'),
+        'concepto': ['Alquiler', 'Agua'] * 20,
+        'entidad': ['Inmobiliaria Centro', 'Canal Isabel II'] * 20,
+        'tipo': 'Gasto',
+        'importe': [800.10, 80.05] * 20
+    }))
+    return db
+
+def test_historical_data_dtypes(db):
+    data = db.get_historical_data()
+    assert len(data) == 40
+    for column in ('concepto', 'entidad', 'tipo'):
+        assert isinstance(data[column].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(data['fecha'])
+    assert data['importe'].dtype == np.float64
+
+def test_cents(db):
+    data = db.get_historical_data(cents=True)
+    assert data['importe'].dtype == np.int64
+    assert data['importe'].sum() == 20 * 80010 + 20 * 8005
+
+def test_high_cardinality_text_not_categorical():
+    data = compact_operations(pd.DataFrame({'concepto': ['a', 'b', 'c'], 'tipo': ['Gasto'] * 3}))
+    assert not isinstance(data['concepto'].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_string_dtype(data['concepto'])
+    assert isinstance(data['tipo'].dtype, pd.CategoricalDtype)
+
+def test_chunked_read_keeps_categoricals(db, monkeypatch):
+    monkeypatch.setattr(database, 'READ_CHUNK_ROWS', 7)
+    data = DatabaseManager(db.db_path).get_historical_data(concepto='A')
+    assert isinstance(data['concepto'].dtype, pd.CategoricalDtype)
+    assert sorted(data['concepto'].cat.categories) == ['Agua', 'Alquiler']
+    assert data['fecha'].is_monotonic_decreasing
+
+def test_concat_mixed_chunks():
+    low = compact_operations(pd.DataFrame({'entidad': ['x'] * 4}))
+    high = compact_operations(pd.DataFrame({'entidad': ['y', 'z']}))
+    data = concat_compact([low, high])
+    assert data['entidad'].tolist() == ['x'] * 4 + ['y', 'z']
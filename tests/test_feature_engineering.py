@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from unittest.mock import Mock
+from config.config import Config
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from ml_analysis.feature_engineering import OperationsFeatureBuilder, operations_fingerprint
+from ml_analysis.clustering import FinancialClustering
+
+@pytest.fixture
+def operations():
+    return SyntheticLedgerGenerator(seed=8).generate(years=3, end_date=datetime(2024, 12, 31))
+
+def test_monthly_features(operations):
+    features = OperationsFeatureBuilder().build(operations)
+    assert features.shape[0] == 36
+    assert features.index[0] == '2022-01'
+
+    ingresos = operations.loc[operations['tipo'] == 'Ingreso', 'importe'].sum()
+    assert features['ingresos'].sum() == pytest.approx(ingresos)
+    assert features['Ingreso:Servicios Profesionales'].sum() == pytest.approx(ingresos)
+    np.testing.assert_allclose(features['beneficio'], features['ingresos'] - features['gastos'])
+    assert (features['volatilidad_gastos'].iloc[1:] > 0).all()
+    assert not features.isna().any().any()
+
+def test_features_are_cached_by_fingerprint(operations):
+    builder = OperationsFeatureBuilder()
+    first = builder.build(operations)
+    assert builder.build(operations.copy()) is first
+
+    changed = operations.copy()
+    changed.loc[0, 'importe'] += 1
+    assert operations_fingerprint(changed) != operations_fingerprint(operations)
+    assert builder.build(changed) is not first
+
+def test_feature_cache_is_bounded(operations, monkeypatch):
+    monkeypatch.setattr(Config, 'ANALYSIS_CACHE_MAX_ENTRIES', 2)
+    OperationsFeatureBuilder._cache.clear()
+    for window in (2, 3, 4):
+        OperationsFeatureBuilder(volatility_window=window).build(operations)
+    assert [key[2] for key in OperationsFeatureBuilder._cache] == [3, 4]
+
+def test_top_conceptos_limits_pivot(operations):
+    builder = OperationsFeatureBuilder(top_conceptos=3)
+    builder.build(operations)
+    assert len([name for name in builder.feature_names if ':' in name]) == 3
+
+def test_clustering_finds_regimes_over_periods(operations, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
+    gpt_client = Mock()
+    gpt_client.generate_financial_opinion.return_value = "Interpretación"
+    clustering = FinancialClustering(gpt_client)
+
+    data, results = clustering.fit_operations(operations, n_clusters=3)
+    assert len(data) == 36
+    assert 'Gasto:Nóminas' in clustering.features
+    # Los agostos (vacaciones) forman parte del mismo régimen, el de menor gasto estacional
+    months = pd.PeriodIndex(data.index, freq='M').month
+    august = set(data.loc[months == 8, 'Cluster'])
+    assert len(august) == 1
+    assert data.groupby('Cluster')['gastos'].mean().idxmin() == august.pop()
+    assert sum(info['size'] for info in results['summary'].values()) == 36
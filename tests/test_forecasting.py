@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from config.config import Config
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from scenarios.forecasting import CashFlowForecaster, monthly_series
+from visualization.scenario_visualizer import ScenarioVisualizer
+
+@pytest.fixture
+def operations():
+    return SyntheticLedgerGenerator(seed=3).generate(years=4, end_date=datetime(2024, 12, 31))
+
+def test_monthly_series_totals(operations):
+    monthly = monthly_series(operations)
+    assert len(monthly) == 48
+    ingresos = operations.loc[operations['tipo'] == 'Ingreso', 'importe'].sum()
+    assert monthly['Total Ingresos'].sum() == pytest.approx(ingresos)
+    assert 'Nóminas' in monthly.columns
+
+def test_holt_winters_captures_seasonality(operations):
+    forecast = CashFlowForecaster(horizon=12).forecast(operations)
+    assert forecast['model'] == 'holt_winters'
+    assert str(forecast['forecast'].index[0]) == '2025-01'
+
+    ingresos = forecast['forecast']['Total Ingresos']
+    # Agosto es el mes de menor actividad en los datos sintéticos
+    assert ingresos.idxmin().month == 8
+    assert (forecast['lower'] <= forecast['forecast']).all().all()
+    assert (forecast['forecast'] <= forecast['upper']).all().all()
+    width = forecast['upper'] - forecast['lower']
+    assert (width.iloc[-1] >= width.iloc[0]).all()
+
+def test_short_history_falls_back_and_fits_are_cached(operations):
+    recent = operations[operations['fecha'] >= '2024-01-01']
+    forecaster = CashFlowForecaster(horizon=6)
+    first = forecaster.forecast(recent)
+    assert first['model'] == 'seasonal_naive'
+    assert forecaster.forecast(recent) is first
+
+    with pytest.raises(ValueError):
+        CashFlowForecaster(model='arima')
+
+def test_forecast_charts(operations):
+    forecast = CashFlowForecaster().forecast(operations)
+    scenarios = {name: {'proyecciones': {'ingresos': value}}
+                 for name, value in [('base', 1200.0), ('optimista', 1500.0), ('pesimista', 900.0)]}
+    visualizer = ScenarioVisualizer()
+
+    timeline = visualizer.create_timeline_chart(scenarios, 'ingresos', forecast=forecast)
+    assert len(timeline.data) == 3
+    assert sum(timeline.data[0].y) == pytest.approx(1200.0)
+    assert len(visualizer.create_forecast_chart(forecast).data) == 3
+
+def test_forecast_cache_is_bounded(operations, monkeypatch):
+    monkeypatch.setattr(Config, 'ANALYSIS_CACHE_MAX_ENTRIES', 2)
+    CashFlowForecaster._cache.clear()
+    monthly = monthly_series(operations)
+    for horizon in (3, 6, 9):
+        CashFlowForecaster(horizon=horizon).fit_forecast(monthly)
+    assert len(CashFlowForecaster._cache) == 2
+    assert [key[2] for key in CashFlowForecaster._cache] == [6, 9]
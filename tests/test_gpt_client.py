@@ -13,9 +13,11 @@ def mock_openai():
         yield mock_create
 
 @pytest.fixture
-def gpt_client():
+def gpt_client(tmp_path, monkeypatch):
     # Configurar una API key de prueba
     Config.OPENAI_API_KEY = 'test_key'
+    # Caché y registro de uso en una base temporal, no en data/finance.db
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
     with patch('openai.chat.completions.create'):  # Mock todas las llamadas a OpenAI
         return GPTClient()
 
@@ -1,5 +1,6 @@
 import pytest
 from unittest.mock import patch, Mock
+from config.config import Config
 from config.gpt_client import GPTClient
 
 @pytest.fixture(autouse=True)
@@ -18,7 +19,9 @@ def mock_openai():
         yield mock_response
 
 @pytest.fixture
-def gpt_client(mock_openai):
+def gpt_client(mock_openai, tmp_path, monkeypatch):
+    # Caché y registro de uso en una base temporal, no en data/finance.db
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
     return GPTClient()
 
 def test_cached_response(gpt_client):
@@ -0,0 +1,57 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+from ml_analysis.clustering import FinancialClustering, summarize_clusters
+from ml_analysis.interpretation_cache import InterpretationCache, cluster_fingerprint
+from utils.database import DatabaseManager
+
+@pytest.fixture
+def cache(tmp_path):
+    return InterpretationCache(os.path.join(tmp_path, "interpretations.db"))
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(4)
+    centers = np.array([[1000.0, 50.0], [5000.0, 10.0], [9000.0, 80.0]])
+    return pd.DataFrame(np.repeat(centers, 40, axis=0) + rng.normal(size=(120, 2)) * [50, 2],
+                        columns=['ingresos', 'margen'])
+
+def make_clustering(cache):
+    gpt_client = Mock()
+    gpt_client.generate_financial_opinion.return_value = "Interpretación"
+    return FinancialClustering(gpt_client, interpretation_cache=cache)
+
+def test_fingerprint_ignores_noise_and_label_order():
+    centroids = np.array([[1000.0, 50.0], [5000.0, 10.0]])
+    values = np.array([[1000.0, 50.0], [5000.0, 10.0]])
+    base = summarize_clusters(values, np.array([0, 1]), centroids, ['ingresos', 'margen'])
+    noisy = summarize_clusters(values, np.array([1, 0]), centroids[::-1] + 1e-9, ['ingresos', 'margen'])
+    context = {'sector': 'Tecnología', 'region': 'Madrid'}
+    assert cluster_fingerprint(base, context) == cluster_fingerprint(noisy, {'sector': ' tecnología', 'region': 'MADRID'})
+    assert cluster_fingerprint(base, context) != cluster_fingerprint(base, {'sector': 'Retail', 'region': 'Madrid'})
+
+    moved = summarize_clusters(values, np.array([0, 1]), centroids * 1.1, ['ingresos', 'margen'])
+    assert cluster_fingerprint(base, context) != cluster_fingerprint(moved, context)
+
+def test_rerun_on_similar_data_skips_llm(cache, data):
+    context = {'sector': 'Tecnología', 'region': 'Madrid'}
+    first = make_clustering(cache)
+    clustered, results = first.fit_predict(first.prepare_data(data, ['ingresos', 'margen']), context=context)
+    assert first.gpt_client.generate_financial_opinion.call_count == 1
+
+    # Datos reordenados con ruido despreciable: mismos clusters, mismas etiquetas, sin LLM
+    shuffled = data.sample(frac=1, random_state=1).reset_index(drop=True) * (1 + 1e-9)
+    second = make_clustering(cache)
+    reclustered, again = second.fit_predict(second.prepare_data(shuffled, ['ingresos', 'margen']), context=context)
+    assert second.gpt_client.generate_financial_opinion.call_count == 0
+    assert again['interpretation'] == "Interpretación"
+    assert again['summary']['cluster_0']['centroid'] == pytest.approx(results['summary']['cluster_0']['centroid'])
+
+def test_gpt_cache_hash_is_stable(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "cache.db"))
+    db.cache_gpt_response("prompt", "respuesta")
+    assert db.get_cached_response("prompt") == "respuesta"
+    assert DatabaseManager._prompt_hash("prompt") == DatabaseManager._prompt_hash("prompt")
+    assert len(DatabaseManager._prompt_hash("prompt")) == 64
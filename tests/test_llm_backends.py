@@ -0,0 +1,87 @@
+import pytest
+import os
+import json
+from config.config import Config
+from config.gpt_client import GPTClient
+from config.llm_backends import (CassetteBackend, CassetteMissError, FakeLLMBackend, LLMBackend,
+                                 RateLimitExceeded, default_fake_responder)
+
+MESSAGES = [{"role": "user", "content": "¿Qué es el ROI?"}]
+
+@pytest.fixture
+def fake_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', os.path.join(tmp_path, "test_backend.db"))
+    client = GPTClient(backend=FakeLLMBackend(seed=1))
+    client.rate_limit_delay = 0
+    return client
+
+def test_fake_backend_is_deterministic():
+    first = FakeLLMBackend().complete(MESSAGES, 'gpt-4', 0.7, 100)
+    second = FakeLLMBackend().complete(MESSAGES, 'gpt-4', 0.7, 100)
+    assert first.content == second.content
+    assert first.prompt_tokens > 0
+
+def test_fake_backend_rate_limits():
+    backend = FakeLLMBackend(rate_limit_probability=1.0)
+    with pytest.raises(RateLimitExceeded):
+        backend.complete(MESSAGES, 'gpt-4', 0.7, 100)
+    assert backend.rate_limited == 1
+
+def test_fake_responder_extracts_ledger_lines():
+    messages = [
+        {"role": "user", "content": 'Devuelve un JSON {"entries": []}'},
+        {"role": "user", "content": "2024-01-31 | Alquiler | Inmobiliaria Centro | Gasto | 800.00"}
+    ]
+    entries = json.loads(default_fake_responder(messages))['entries']
+    assert entries[0]['concepto'] == 'Alquiler'
+    assert entries[0]['importe'] == 800.0
+
+def test_client_retries_after_rate_limit(fake_client):
+    fake_client.backend.rate_limit_probability = 0.5
+    result = fake_client._make_request(MESSAGES, feature='opinion')
+
+    assert isinstance(result, str)
+    assert fake_client.ledger.get_totals()['calls'] == 1
+
+def test_scenarios_offline(fake_client):
+    result = fake_client.generate_scenarios("Ingresos: 1,000,000.00€ Gastos: 800,000.00€ "
+                                            '"optimista" "pesimista"', {"sector": "Test", "region": "Test"})
+    scenarios = json.loads(result)
+    assert scenarios['optimista']['proyecciones']['ingresos'] > scenarios['pesimista']['proyecciones']['ingresos']
+
+def test_cassette_record_and_replay(tmp_path):
+    path = os.path.join(tmp_path, "cassette.json")
+    recorder = CassetteBackend(path, mode="record", backend=FakeLLMBackend())
+    recorded = recorder.complete(MESSAGES, 'gpt-4', 0.7, 100)
+
+    player = CassetteBackend(path, mode="replay")
+    assert player.complete(MESSAGES, 'gpt-4', 0.7, 100).content == recorded.content
+    with pytest.raises(CassetteMissError):
+        player.complete([{"role": "user", "content": "otra"}], 'gpt-4', 0.7, 100)
+
+def test_fallback_does_not_change_client_model(fake_client, monkeypatch):
+    models = []
+    original = fake_client.backend.complete
+
+    def complete(messages, model, temperature, max_tokens):
+        models.append(model)
+        if model == Config.MODEL_PRIMARY and len(models) == 1:
+            raise RuntimeError("error transitorio")
+        return original(messages, model, temperature, max_tokens)
+
+    monkeypatch.setattr(fake_client.backend, 'complete', complete)
+    fake_client._make_request(MESSAGES, feature='opinion')
+    fake_client._make_request([{"role": "user", "content": "Otra pregunta"}], feature='opinion')
+    assert models == [Config.MODEL_PRIMARY, Config.MODEL_FALLBACK, Config.MODEL_PRIMARY]
+    assert fake_client.model == Config.MODEL_PRIMARY
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LLMBackend()
+
+def test_repeated_opinion_hits_cache_with_retrieval(fake_client, monkeypatch):
+    monkeypatch.setattr(Config, 'RETRIEVAL_ENABLED', True)
+    data = {'ingresos': 1000.0, 'gastos': 800.0}
+    responses = {fake_client.generate_financial_opinion(data) for _ in range(4)}
+    assert len(responses) == 1
+    assert fake_client.backend.calls == 1
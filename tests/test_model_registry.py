@@ -0,0 +1,73 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from unittest.mock import Mock
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from ml_analysis.clustering import FinancialClustering
+from ml_analysis.model_registry import ModelRegistry, ClusterModel
+from ml_analysis.interpretation_cache import InterpretationCache
+
+@pytest.fixture
+def registry(tmp_path):
+    return ModelRegistry(os.path.join(tmp_path, "models.db"))
+
+@pytest.fixture
+def operations():
+    return SyntheticLedgerGenerator(seed=8).generate(years=3, end_date=datetime(2024, 12, 31))
+
+@pytest.fixture
+def clustering(registry):
+    gpt_client = Mock()
+    gpt_client.generate_financial_opinion.return_value = "Interpretación"
+    return FinancialClustering(gpt_client, registry=registry,
+                               interpretation_cache=InterpretationCache(registry.db_path))
+
+def test_numpy_predict_matches_sklearn():
+    data = np.random.default_rng(0).normal(size=(500, 4)) * [1, 10, 100, 1000]
+    scaler = StandardScaler()
+    kmeans = KMeans(n_clusters=3, random_state=42).fit(scaler.fit_transform(data))
+    model = ClusterModel.from_fitted('test', ['a', 'b', 'c', 'd'], scaler, kmeans, 'abc', len(data))
+    np.testing.assert_array_equal(model.predict(data), kmeans.predict(scaler.transform(data)))
+    assert model.drift(data) == pytest.approx(0.0, abs=1e-9)
+
+def test_registry_versions_round_trip(registry, tmp_path):
+    data = np.random.default_rng(1).normal(size=(200, 2))
+    scaler = StandardScaler()
+    kmeans = KMeans(n_clusters=2, random_state=42).fit(scaler.fit_transform(data))
+    for fingerprint in ['v1', 'v2']:
+        registry.save(ClusterModel.from_fitted('test', ['x', 'y'], scaler, kmeans, fingerprint, len(data)))
+
+    loaded = ModelRegistry(registry.db_path)
+    ModelRegistry._loaded.clear()
+    latest = loaded.load('test')
+    assert latest.version == 2 and latest.fingerprint == 'v2'
+    assert loaded.load('test', version=1).fingerprint == 'v1'
+    np.testing.assert_allclose(latest.centroids, kmeans.cluster_centers_)
+    assert list(loaded.versions('test')['version']) == [1, 2]
+    assert loaded.load('desconocido') is None
+
+def test_fit_or_predict_reuses_model(clustering, operations):
+    _, first = clustering.fit_or_predict(operations, n_clusters=3)
+    assert first['model'] == {'version': 1, 'refit': True, 'drift': 0.0, 'reason': 'sin modelo registrado'}
+
+    clustered, second = clustering.fit_or_predict(operations, n_clusters=3)
+    assert second['model']['refit'] is False
+    assert second['interpretation'] == "Interpretación"
+    assert clustering.gpt_client.generate_financial_opinion.call_count == 1
+    assert set(second['summary']) == set(first['summary'])
+    np.testing.assert_array_equal(clustering.predict(clustered.drop(columns='Cluster')), clustered['Cluster'])
+
+def test_fit_or_predict_refits_on_drift_and_k(clustering, operations):
+    clustering.fit_or_predict(operations, n_clusters=3)
+
+    _, results = clustering.fit_or_predict(operations, n_clusters=4)
+    assert results['model']['refit'] and results['model']['version'] == 2
+
+    shifted = operations.copy()
+    shifted['importe'] *= 5
+    _, results = clustering.fit_or_predict(shifted, n_clusters=4)
+    assert results['model']['refit'] and results['model']['reason'].startswith('deriva')
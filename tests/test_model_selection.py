@@ -0,0 +1,48 @@
+import pytest
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+from sklearn.datasets import make_blobs
+from config.config import Config
+from ml_analysis import model_selection
+from ml_analysis.model_selection import select_n_clusters, elbow_k
+from ml_analysis.clustering import FinancialClustering
+
+@pytest.fixture
+def blobs():
+    data, _ = make_blobs(n_samples=600, centers=4, n_features=3, cluster_std=0.5, random_state=0)
+    return data
+
+def test_elbow_k():
+    assert elbow_k([2, 3, 4, 5, 6], [100, 40, 10, 8, 7]) == 4
+
+def test_selects_true_number_of_clusters(blobs):
+    selection = select_n_clusters(blobs, k_range=range(2, 8), parallel_min_rows=10**9)
+    assert selection['best_k'] == 4
+    assert list(selection['scores'].index) == [2, 3, 4, 5, 6, 7]
+    assert {'inertia', 'silhouette', 'davies_bouldin', 'rank'} <= set(selection['scores'].columns)
+
+def test_parallel_matches_serial_and_is_cached(blobs):
+    model_selection._selection_cache.clear()
+    serial = select_n_clusters(blobs, k_range=range(2, 6), parallel_min_rows=10**9)
+    model_selection._selection_cache.clear()
+    parallel = select_n_clusters(blobs, k_range=range(2, 6), parallel_min_rows=0, max_workers=2)
+    pd.testing.assert_frame_equal(serial['scores'], parallel['scores'])
+    assert select_n_clusters(blobs, k_range=range(2, 6)) is parallel
+
+def test_selection_cache_is_bounded(blobs, monkeypatch):
+    monkeypatch.setattr(Config, 'ANALYSIS_CACHE_MAX_ENTRIES', 1)
+    model_selection._selection_cache.clear()
+    select_n_clusters(blobs, k_range=range(2, 4), parallel_min_rows=10**9)
+    latest = select_n_clusters(blobs, k_range=range(2, 5), parallel_min_rows=10**9)
+    assert list(model_selection._selection_cache.values()) == [latest]
+
+def test_fit_predict_auto(blobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
+    gpt_client = Mock()
+    gpt_client.generate_financial_opinion.return_value = "Interpretación"
+    clustering = FinancialClustering(gpt_client)
+    data = clustering.prepare_data(pd.DataFrame(blobs, columns=['a', 'b', 'c']), ['a', 'b', 'c'])
+    clustered, results = clustering.fit_predict(data, n_clusters='auto')
+    assert results['k_selection']['best_k'] == 4
+    assert clustered['Cluster'].nunique() == 4
@@ -0,0 +1,90 @@
+import pytest
+import json
+import numpy as np
+from datetime import datetime
+from unittest.mock import Mock
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from scenarios import monte_carlo
+from scenarios.monte_carlo import MonteCarloScenarioEngine
+from scenarios.scenario_generator import ScenarioGenerator
+
+@pytest.fixture
+def operations():
+    return SyntheticLedgerGenerator(seed=11).generate(years=4, end_date=datetime(2024, 12, 31))
+
+@pytest.fixture
+def engine(operations):
+    return MonteCarloScenarioEngine(n_paths=20000, seed=5).fit(operations)
+
+def test_simulation_is_vectorized_and_reproducible(engine, operations, monkeypatch):
+    # Dos sorteos por lote de trayectorias, nunca uno por trayectoria o por mes
+    draws = []
+    default_rng = np.random.default_rng
+
+    class CountingGenerator:
+        def __init__(self, seed):
+            self.rng = default_rng(seed)
+
+        def standard_normal(self, size):
+            draws.append(size)
+            return self.rng.standard_normal(size)
+
+    monkeypatch.setattr(monte_carlo.np.random, 'default_rng', CountingGenerator)
+    paths = engine.simulate()
+    monkeypatch.undo()
+    assert len(draws) == 2 * -(-engine.n_paths // engine.batch_size)
+    assert sum(size[0] for size in draws) == 2 * engine.n_paths
+
+    again = MonteCarloScenarioEngine(n_paths=20000, seed=5).fit(operations).simulate()
+    np.testing.assert_array_equal(paths['beneficio'], again['beneficio'])
+    assert paths['monthly_ingresos'].shape == (20000, 12)
+
+def test_scenarios_are_ordered_and_consistent(engine):
+    scenarios = engine.scenarios()
+
+    beneficios = [scenarios[name]['proyecciones']['beneficio'] for name in ['pesimista', 'base', 'optimista']]
+    assert beneficios == sorted(beneficios)
+    for scenario in scenarios.values():
+        proyecciones = scenario['proyecciones']
+        assert proyecciones['beneficio'] == pytest.approx(proyecciones['ingresos'] - proyecciones['gastos'], abs=0.02)
+
+def test_monthly_bands(engine):
+    bands = engine.monthly_bands(engine.simulate(), 'gastos')
+    assert list(bands.columns) == ['p10', 'p50', 'p90']
+    assert (bands['p10'] <= bands['p90']).all()
+    assert str(bands.index[0]) == '2025-01'
+
+def test_generate_scenarios_from_history_uses_gpt_only_for_narrative(operations):
+    gpt_client = Mock()
+    gpt_client.generate_scenarios.return_value = json.dumps({
+        'base': {'descripcion': 'Narrativa base', 'supuestos': ['Demanda estable']}
+    })
+    generator = ScenarioGenerator(gpt_client)
+
+    scenarios = generator.generate_scenarios_from_history(operations, {'sector': 'Tecnología'})
+    assert scenarios['base']['descripcion'] == 'Narrativa base'
+    assert 'Demanda estable' in scenarios['base']['supuestos']
+    assert scenarios['optimista']['proyecciones']['ingresos'] > 0
+    assert gpt_client.generate_scenarios.call_count == 1
+
+def test_narrative_in_code_fences(operations):
+    gpt_client = Mock()
+    gpt_client.generate_scenarios.return_value = '```json\n' + json.dumps({
+        'base': {'descripcion': 'Narrativa base', 'supuestos': []}
+    }) + '\n```'
+    scenarios = ScenarioGenerator(gpt_client).generate_scenarios_from_history(operations)
+    assert scenarios['base']['descripcion'] == 'Narrativa base'
+
+def test_llm_error_keeps_numeric_scenarios(operations):
+    gpt_client = Mock()
+    gpt_client.generate_scenarios.side_effect = RuntimeError("API no disponible")
+    scenarios = ScenarioGenerator(gpt_client).generate_scenarios_from_history(operations)
+    assert scenarios['pesimista']['proyecciones']['beneficio'] < scenarios['optimista']['proyecciones']['beneficio']
+
+def test_scenario_cache_created_lazily(monkeypatch):
+    created = []
+    monkeypatch.setattr('scenarios.scenario_generator.ScenarioCache', lambda: created.append(1) or Mock())
+    generator = ScenarioGenerator(Mock())
+    assert created == []
+    assert generator.cache is not None
+    assert created == [1]
@@ -0,0 +1,63 @@
+import threading
+import pytest
+import pandas as pd
+from datetime import datetime
+from unittest.mock import Mock
+from scenarios.models import ScenarioSet
+from scenarios.orchestrator import ScenarioOrchestrator
+from scenarios.forecasting import CashFlowForecaster
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from visualization.scenario_visualizer import ScenarioVisualizer
+
+SCENARIOS = ScenarioSet.from_dict({
+    name: {'descripcion': name, 'proyecciones': {'ingresos': value, 'gastos': 800.0}, 'supuestos': []}
+    for name, value in [('base', 1000.0), ('optimista', 1200.0), ('pesimista', 900.0)]
+})
+
+@pytest.fixture
+def generator():
+    generator = Mock()
+    generator.generate_detailed_analysis.return_value = "Análisis"
+    return generator
+
+def test_stages_run_concurrently_and_stream(generator):
+    operations = SyntheticLedgerGenerator(seed=4).generate(years=2, end_date=datetime(2024, 12, 31))
+    # Escenarios y previsión solo pasan la barrera si se ejecutan a la vez; en serie la barrera
+    # expira y la etapa termina con error
+    barrier = threading.Barrier(2, timeout=5)
+    def scenarios():
+        barrier.wait()
+        return SCENARIOS
+    def forecast():
+        barrier.wait()
+        return CashFlowForecaster().forecast(operations)
+
+    orchestrator = ScenarioOrchestrator(generator, ScenarioVisualizer())
+    stages = list(orchestrator.run(scenarios, {'sector': 'Tecnología'}, forecast))
+
+    names = [stage.name for stage in stages]
+    assert set(names) == {'scenarios', 'forecast', 'analysis', 'comparison', 'dashboard', 'timeline', 'forecast_chart'}
+    assert names.index('scenarios') < names.index('analysis')
+    assert all(stage.error is None for stage in stages)
+
+    timeline = next(stage.value for stage in stages if stage.name == 'timeline')
+    assert len(timeline.data[0].x) == 12
+    assert len(next(stage.value for stage in stages if stage.name == 'forecast_chart')) == 2
+
+def test_scenario_failure_stops_pipeline(generator):
+    def failing():
+        raise ValueError("sin respuesta")
+
+    stages = list(ScenarioOrchestrator(generator, ScenarioVisualizer()).run(failing))
+    assert [stage.name for stage in stages] == ['scenarios']
+    assert isinstance(stages[0].error, ValueError)
+    generator.generate_detailed_analysis.assert_not_called()
+
+def test_forecast_failure_keeps_timeline(generator):
+    def failing_forecast():
+        raise ValueError("sin histórico")
+
+    stages = {stage.name: stage for stage in
+              ScenarioOrchestrator(generator, ScenarioVisualizer()).run(lambda: SCENARIOS, forecast=failing_forecast)}
+    assert stages['forecast'].error is not None
+    assert len(stages['timeline'].value.data[0].x) == 4
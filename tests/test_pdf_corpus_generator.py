@@ -0,0 +1,36 @@
+import pytest
+import os
+import json
+from datetime import datetime
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from utils.pdf_corpus_generator import PDFCorpusGenerator, evaluate_extraction
+
+@pytest.fixture
+def ledger():
+    return SyntheticLedgerGenerator(seed=3).generate(years=1, end_date=datetime(2024, 6, 30))
+
+def test_generate_corpus(ledger, tmp_path):
+    manifest = PDFCorpusGenerator(str(tmp_path), seed=3).generate(ledger, n_documents=3, max_pages=20)
+
+    assert len(manifest['documents']) == 3
+    assert manifest['total_entries'] == sum(len(d['entries']) for d in manifest['documents'])
+    for document in manifest['documents']:
+        assert os.path.getsize(document['path']) > 0
+        assert document['pages'] >= 2
+    with open(os.path.join(tmp_path, 'manifest.json'), encoding='utf-8') as f:
+        assert json.load(f)['total_entries'] == manifest['total_entries']
+
+def test_evaluate_extraction():
+    expected = [
+        {'fecha': '2024-01-31', 'concepto': 'Alquiler', 'entidad': 'Inmobiliaria Centro', 'tipo': 'Gasto', 'importe': 800.0},
+        {'fecha': '2024-01-31', 'concepto': 'Agua', 'entidad': 'Canal Isabel II', 'tipo': 'Gasto', 'importe': 80.0}
+    ]
+    extracted = [
+        {'fecha': '2024-01-31', 'concepto': 'alquiler', 'entidad': 'Inmobiliaria Centro', 'tipo': 'Gasto', 'importe': '800.00'},
+        {'fecha': '2024-02-01', 'concepto': 'Luz', 'entidad': 'Iberdrola', 'tipo': 'Gasto', 'importe': 10.0}
+    ]
+
+    metrics = evaluate_extraction(extracted, expected)
+    assert metrics['precision'] == pytest.approx(0.5)
+    assert metrics['recall'] == pytest.approx(0.5)
+    assert evaluate_extraction(expected, expected)['f1'] == pytest.approx(1.0)
@@ -0,0 +1,69 @@
+import pytest
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.database import DatabaseManager
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "analytics.db"))
+    # Alquiler todos los meses de 2023 y 2024 salvo marzo de 2024
+    months = [m for m in pd.date_range('2023-01-01', '2024-12-01', freq='MS') if m != pd.Timestamp('2024-03-01')]
+    db.add_operations_bulk(pd.DataFrame({
+        'fecha': months,
+        'concepto': 'Alquiler',
+        'entidad': 'Inmobiliaria Centro',
+        'tipo': 'Gasto',
+        'importe': [100.0 + i for i in range(len(months))]
+    }))
+    db.add_operation(datetime(2024, 1, 15), 'Servicios Profesionales', 'Cliente A', 'Ingreso', 1000.0)
+    db.add_operation(datetime(2024, 1, 20), 'Servicios Profesionales', 'Cliente B', 'Ingreso', 500.0)
+    return db
+
+def test_window_metrics(db):
+    analytics = db.get_period_analytics('concepto')
+    alquiler = analytics[analytics['concepto'] == 'Alquiler'].set_index('mes')
+    assert len(alquiler) == 23
+
+    # Enero 2024 es el mes 12 de la serie (importe 112)
+    assert alquiler.loc['2024-01', 'mes_anterior'] == 111.0
+    assert alquiler.loc['2024-01', 'anio_anterior'] == 100.0
+    assert alquiler.loc['2024-01', 'yoy_pct'] == pytest.approx(12.0)
+    assert alquiler.loc['2024-01', 'acumulado_3m'] == 110.0 + 111.0 + 112.0
+    assert alquiler.loc['2024-01', 'acumulado_12m'] == sum(101.0 + i for i in range(12))
+
+    # Abril de 2024 no tiene mes anterior: marzo falta y no se desplaza la ventana
+    assert np.isnan(alquiler.loc['2024-04', 'mes_anterior'])
+    assert alquiler.loc['2024-04', 'acumulado_3m'] == 113.0 + 114.0
+
+    ingresos = analytics[analytics['concepto'] == 'Servicios Profesionales']
+    assert ingresos['importe'].tolist() == [1500.0]
+    assert ingresos['n_operaciones'].tolist() == [2]
+
+def test_by_entidad_and_tipo(db):
+    analytics = db.get_period_analytics('entidad', tipo='Ingreso')
+    assert set(analytics['entidad']) == {'Cliente A', 'Cliente B'}
+    with pytest.raises(ValueError):
+        db.get_period_analytics('importe')
+
+def test_cached_until_new_operations(db):
+    first = db.get_period_analytics('concepto')
+    assert db.get_period_analytics('concepto') is first
+
+    db.add_operation(datetime(2024, 12, 20), 'Alquiler', 'Inmobiliaria Centro', 'Gasto', 50.0)
+    updated = db.get_period_analytics('concepto')
+    assert updated is not first
+    december = updated[(updated['concepto'] == 'Alquiler') & (updated['mes'] == '2024-12')]
+    assert december['importe'].iat[0] == 122.0 + 50.0
+    assert december['n_operaciones'].iat[0] == 2
+
+def test_rebuilt_after_delete(db):
+    db.get_period_analytics('concepto')
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations WHERE entidad = 'Cliente B'")
+    analytics = db.get_period_analytics('concepto')
+    ingresos = analytics[analytics['concepto'] == 'Servicios Profesionales']
+    assert ingresos['importe'].tolist() == [1000.0]
+    assert ingresos['n_operaciones'].tolist() == [1]
@@ -0,0 +1,72 @@
+import pytest
+import os
+import json
+import pandas as pd
+from config.config import Config
+from config.gpt_client import GPTClient
+from config.llm_backends import FakeLLMBackend
+from scenarios.portfolio import PortfolioRunner, main
+
+@pytest.fixture
+def companies():
+    return pd.DataFrame({
+        'empresa': ['A', 'B', 'C', 'D'],
+        'ingresos': [1000000, 500000, 1000000, 750000],
+        'gastos': [800000, 450000, 800000, 700000],
+        'sector': ['Tecnología', 'Industria', 'Tecnología', 'Servicios'],
+        'region': ['Madrid', 'Aragón', 'Madrid', 'Cantabria']
+    })
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', os.path.join(tmp_path, "portfolio.db"))
+    client = GPTClient(backend=FakeLLMBackend(latency_ms=50, seed=1))
+    return PortfolioRunner(client, max_workers=4)
+
+def test_run_saves_results_and_reuses_identical_companies(runner, companies):
+    progress = []
+    metrics = runner.run(companies, run_id='r1', progress=lambda done, total: progress.append((done, total)))
+
+    assert metrics['processed'] == 4
+    assert metrics['deduplicated'] == 1
+    assert metrics['failed'] == 0
+    assert metrics['companies_per_second'] > 0
+    assert progress[-1] == (4, 4)
+
+    results = runner.get_results('r1')
+    assert list(results['empresa']) == ['A', 'B', 'C', 'D']
+    scenarios = json.loads(results.loc[0, 'scenarios'])
+    assert scenarios['optimista']['proyecciones']['ingresos'] > scenarios['pesimista']['proyecciones']['ingresos']
+    assert results['analysis'].notna().all()
+
+def test_run_resumes_from_checkpoint(runner, companies):
+    runner.run(companies.head(2), run_id='r2')
+    calls = runner.gpt_client.backend.calls
+
+    metrics = runner.run(companies, run_id='r2')
+    assert metrics['skipped'] == 2
+    assert metrics['processed'] == 2
+    assert runner.gpt_client.backend.calls > calls
+    assert len(runner.get_results('r2')) == 4
+
+def test_missing_columns(runner):
+    with pytest.raises(ValueError):
+        runner.run(pd.DataFrame({'empresa': ['A']}))
+
+def test_cli(tmp_path, monkeypatch, companies, capsys):
+    monkeypatch.setattr(Config, 'DB_PATH', os.path.join(tmp_path, "cli.db"))
+    monkeypatch.setattr(Config, 'FAKE_LLM_SETTINGS', {'latency_ms': 0, 'seed': 1})
+    path = os.path.join(tmp_path, "companies.csv")
+    companies.to_csv(path, index=False)
+
+    metrics = main([path, '--backend', 'fake', '--run-id', 'cli', '--no-analysis'])
+    assert metrics['processed'] == 4
+    assert '"run_id": "cli"' in capsys.readouterr().out
+
+def test_scenario_cache_uses_runner_db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', os.path.join(tmp_path, "finance.db"))
+    db_path = os.path.join(tmp_path, "cartera.db")
+    client = GPTClient(backend=FakeLLMBackend(latency_ms=0, seed=1))
+    runner = PortfolioRunner(client, db_path=db_path)
+    assert runner.generator.cache.db_path == db_path
+    assert runner.db_path != Config.DB_PATH
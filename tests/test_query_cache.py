@@ -0,0 +1,122 @@
+import pytest
+import os
+import sqlite3
+import pandas as pd
+from collections import OrderedDict
+from datetime import datetime
+from config.config import Config
+from utils.database import DatabaseManager, BULK_REINDEX_THRESHOLD
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "cache.db"))
+    db.add_operation(datetime(2024, 1, 10), 'Alquiler', 'Inmobiliaria Centro', 'Gasto', 800.0)
+    db.add_operation(datetime(2024, 2, 10), 'Alquiler', 'Inmobiliaria Centro', 'Gasto', 800.0)
+    return db
+
+def test_triggers_bump_version(db):
+    version = db.get_data_version()
+    db.add_operation(datetime(2024, 3, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    assert db.get_data_version() == version + 1
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE operations SET importe = 90 WHERE concepto = 'Agua'")
+        conn.execute("DELETE FROM operations WHERE concepto = 'Agua'")
+    assert db.get_data_version() == version + 3
+    assert db.get_data_version('operations_rewrites') == 2
+
+def test_bulk_insert_bumps_version_once(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "bulk.db"))
+    n = BULK_REINDEX_THRESHOLD
+    db.add_operations_bulk(pd.DataFrame({
+        'fecha': pd.Timestamp('2024-01-01'), 'concepto': 'Agua', 'entidad': 'Canal Isabel II',
+        'tipo': 'Gasto', 'importe': [1.0] * n
+    }))
+    assert db.get_data_version() == 1
+    db.add_operation(datetime(2024, 3, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    assert db.get_data_version() == 2
+
+def test_unchanged_reads_served_from_memory(db):
+    first = db.get_historical_data(tipo='Gasto')
+    assert db.get_historical_data(tipo='Gasto') is first
+    assert DatabaseManager(db.db_path).get_historical_data(tipo='Gasto') is first
+    assert db.get_historical_data(tipo='Ingreso') is not first
+
+def test_writes_invalidate(db):
+    first = db.get_historical_data()
+    db.add_operation(datetime(2024, 3, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    second = db.get_historical_data()
+    assert len(second) == len(first) + 1
+
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations WHERE concepto = 'Agua'")
+    assert len(db.get_historical_data()) == len(first)
+
+def test_analytics_rebuilt_after_delete(db):
+    assert db.get_period_analytics()['importe'].sum() == 1600.0
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations WHERE fecha LIKE '2024-02%'")
+    analytics = db.get_period_analytics()
+    assert analytics['importe'].sum() == 800.0
+    assert analytics['mes'].tolist() == ['2024-01']
+
+def test_cache_can_be_disabled(db, monkeypatch):
+    monkeypatch.setattr(Config, 'QUERY_CACHE_ENABLED', False)
+    assert db.get_historical_data() is not db.get_historical_data()
+
+def test_recreated_database_does_not_hit_stale_entries(tmp_path):
+    path = os.path.join(tmp_path, "recreated.db")
+    db = DatabaseManager(path)
+    db.add_operation(datetime(2024, 1, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    assert db.get_historical_data()['importe'].tolist() == [80.0]
+
+    os.remove(path)
+    db = DatabaseManager(path)
+    db.add_operation(datetime(2024, 1, 10), 'Agua', 'Canal Isabel II', 'Gasto', 95.0)
+    assert db.get_historical_data()['importe'].tolist() == [95.0]
+
+def cached_keys(db):
+    return [key for key in DatabaseManager._query_cache if key[0] == db.db_path]
+
+def test_stale_entries_dropped_on_lookup(db):
+    db.get_historical_data(tipo='Gasto')
+    db.get_historical_data(tipo='Ingreso')
+    assert len(cached_keys(db)) == 2
+    db.add_operation(datetime(2024, 3, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    db.get_historical_data(tipo='Gasto')
+    assert len(cached_keys(db)) == 1
+
+def test_cache_bounded_by_memory(db, monkeypatch):
+    monkeypatch.setattr(DatabaseManager, '_query_cache', OrderedDict())
+    monkeypatch.setattr(DatabaseManager, '_query_cache_bytes', 0)
+    first = db.get_historical_data(tipo='Gasto')
+    nbytes = int(first.memory_usage(deep=True).sum())
+    monkeypatch.setattr(Config, 'QUERY_CACHE_MAX_BYTES', nbytes * 3 // 2)
+    db.get_historical_data(concepto='Alquiler')
+    # Se expulsa la entrada menos usada para no pasar del límite
+    assert db.get_historical_data(tipo='Gasto') is not first
+    assert DatabaseManager._query_cache_bytes <= Config.QUERY_CACHE_MAX_BYTES
+    assert DatabaseManager._query_cache_bytes == sum(entry[2] for entry in DatabaseManager._query_cache.values())
+
+def test_failed_bulk_load_keeps_trigger_and_indexes(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "failed.db"))
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("""
+            CREATE TRIGGER reject_invalid BEFORE INSERT ON operations WHEN NEW.concepto = 'Inválido'
+            BEGIN SELECT RAISE(ABORT, 'concepto no válido'); END
+        """)
+    operations = pd.DataFrame({
+        'fecha': pd.Timestamp('2024-01-01'), 'concepto': 'Agua', 'entidad': 'Canal Isabel II',
+        'tipo': 'Gasto', 'importe': [1.0] * BULK_REINDEX_THRESHOLD
+    })
+    operations.loc[len(operations) - 1, 'concepto'] = 'Inválido'
+    with pytest.raises(Exception):
+        db.add_operations_bulk(operations)
+
+    with sqlite3.connect(db.db_path) as conn:
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert conn.execute("SELECT COUNT(*) FROM operations").fetchone()[0] == 0
+    assert 'trg_operations_insert' in names
+    assert {'idx_fecha', 'idx_tipo', 'idx_concepto', 'idx_entidad'} <= names
+    version = db.get_data_version()
+    db.add_operation(datetime(2024, 3, 10), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    assert db.get_data_version() == version + 1
@@ -0,0 +1,70 @@
+import pytest
+import os
+from utils.database import DatabaseManager
+from utils.retrieval import BM25Index, ContextRetriever, chunk_text, tokenize
+
+@pytest.fixture
+def documents():
+    return [
+        "La facturación del sector tecnológico crece por la demanda de consultoría.",
+        "Los costes energéticos y laborales presionan los márgenes de las pymes.",
+        "Las ayudas europeas financian la digitalización de empresas industriales.",
+    ]
+
+def test_tokenize_removes_accents_and_stopwords():
+    assert tokenize("Los márgenes de la energía") == ['margenes', 'energia']
+
+def test_chunk_text_limits_size():
+    text = " ".join(f"palabra{i}" for i in range(300))
+    chunks = chunk_text(text, max_words=100, overlap=10)
+    assert all(len(chunk.split()) <= 100 for chunk in chunks)
+    assert chunks[-1].endswith("palabra299")
+
+def test_bm25_ranking(documents):
+    index = BM25Index()
+    index.add(documents)
+
+    results = index.search("márgenes y costes de energía", k=2)
+    assert results[0][0] == 1
+    assert index.search("término inexistente") == []
+
+def test_bm25_incremental_add(documents):
+    index = BM25Index()
+    index.add(documents[:2])
+    index.search("digitalización")
+    index.add(documents[2:])
+
+    assert index.search("digitalización", k=1)[0][0] == 2
+
+def test_incremental_add_matches_single_build(documents):
+    corpus = [f"documento {i} sobre ingresos gastos concepto{i % 50} entidad{i % 7}" for i in range(300)] + documents
+    whole = BM25Index()
+    whole.add(corpus)
+    incremental = BM25Index()
+    for start in range(0, len(corpus), 17):
+        incremental.add(corpus[start:start + 17])
+        incremental.search("gastos concepto4")
+
+    for query in ["gastos concepto42 entidad3", "márgenes y costes de energía", "digitalización"]:
+        expected = dict(whole.search(query, k=len(corpus)))
+        result = dict(incremental.search(query, k=len(corpus)))
+        assert result.keys() == expected.keys()
+        assert [result[i] for i in expected] == pytest.approx(list(expected.values()))
+    # Los bloques se fusionan geométricamente: pocas matrices y ninguna reconstrucción al buscar
+    assert len(incremental._blocks) <= 6
+
+def test_context_retriever(tmp_path):
+    db_path = os.path.join(tmp_path, "test_retrieval.db")
+    context_file = os.path.join(tmp_path, "context.txt")
+    with open(context_file, "w", encoding="utf-8") as f:
+        f.write("Tendencias: crece la demanda de servicios digitales.\n\n"
+                "Riesgos: la morosidad de los clientes retrasa los cobros.")
+
+    db = DatabaseManager(db_path)
+    retriever = ContextRetriever(db_path, context_file)
+    assert retriever.retrieve("morosidad en los cobros", k=1)[0].startswith("Riesgos")
+
+    # Las respuestas cacheadas del modelo no forman parte del corpus
+    db.cache_gpt_response("prompt", "Análisis previo: la estacionalidad de agosto reduce los ingresos.")
+    assert all("estacionalidad" not in passage for passage in retriever.retrieve("estacionalidad de los ingresos"))
+    assert retriever.get_index() is retriever.get_index()
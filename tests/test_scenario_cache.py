@@ -0,0 +1,67 @@
+import pytest
+import os
+import sqlite3
+import json
+from unittest.mock import Mock
+from scenarios.scenario_cache import ScenarioCache, bucket
+from scenarios.scenario_generator import ScenarioGenerator
+from scenarios.models import ScenarioSet
+
+SCENARIOS = {
+    name: {
+        'descripcion': f"Escenario {name}",
+        'proyecciones': {'ingresos': 1000000 * factor, 'gastos': 800000, 'crecimiento_ingresos': '5%'},
+        'supuestos': []
+    }
+    for name, factor in [('base', 1.0), ('optimista', 1.2), ('pesimista', 0.8)]
+}
+
+@pytest.fixture
+def cache(tmp_path):
+    return ScenarioCache(os.path.join(tmp_path, "scenario_cache.db"), tolerance=0.01)
+
+@pytest.fixture
+def generator(cache):
+    gpt_client = Mock()
+    gpt_client.generate_scenarios.return_value = json.dumps(SCENARIOS)
+    return ScenarioGenerator(gpt_client, cache=cache)
+
+def test_bucket_is_relative():
+    assert bucket(1000000, 0.01) == bucket(1000500, 0.01)
+    assert bucket(1000000, 0.01) != bucket(1100000, 0.01)
+    assert bucket(100, 0.01) != bucket(1000000, 0.01)
+    assert bucket(-500, 0.01) == -bucket(500, 0.01)
+    assert bucket(0, 0.01) == 0
+
+def test_small_edit_hits_cache_and_rescales(generator, cache):
+    context = {'sector': 'Tecnología', 'region': 'Madrid'}
+    first = generator.generate_scenarios({'ingresos': 1000000, 'gastos': 800000}, context)
+    second = generator.generate_scenarios({'ingresos': 1000500, 'gastos': 800000}, context)
+
+    assert generator.gpt_client.generate_scenarios.call_count == 1
+    assert second['base'].proyecciones.ingresos == pytest.approx(1000500)
+    assert second['optimista'].proyecciones.ingresos == pytest.approx(1200600)
+    assert second['base'].proyecciones.beneficio == pytest.approx(200500)
+    assert second['base']['proyecciones']['crecimiento_ingresos'] == first['base']['proyecciones']['crecimiento_ingresos']
+
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+def test_context_and_large_changes_miss(generator):
+    generator.generate_scenarios({'ingresos': 1000000, 'gastos': 800000}, {'sector': 'Tecnología'})
+    generator.generate_scenarios({'ingresos': 1000000, 'gastos': 800000}, {'sector': 'Industria'})
+    generator.generate_scenarios({'ingresos': 1300000, 'gastos': 800000}, {'sector': 'Tecnología'})
+    assert generator.gpt_client.generate_scenarios.call_count == 3
+
+def test_rewrite_keeps_hits_and_misses_count_lookups(cache):
+    data, context = {'ingresos': 1000000, 'gastos': 800000}, {'sector': 'Tecnología'}
+    scenarios = ScenarioSet.from_dict(SCENARIOS)
+    assert cache.get(data, context) is None
+    assert cache.get(data, context) is None
+    cache.set(data, context, scenarios)
+    assert cache.get(data, context) is not None
+    cache.set(data, context, scenarios)
+    assert cache.get(data, context) is not None
+
+    with sqlite3.connect(cache.db_path) as conn:
+        assert conn.execute("SELECT hits FROM scenario_cache").fetchone() == (2,)
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'hit_ratio': 0.5}
@@ -0,0 +1,73 @@
+import pytest
+import os
+import json
+import numpy as np
+import pandas as pd
+from unittest.mock import Mock
+from config.config import Config
+from scenarios.models import ScenarioSet, parse_number
+from scenarios.scenario_generator import ScenarioGenerator
+from visualization.scenario_visualizer import ScenarioVisualizer
+
+RAW_SCENARIOS = {
+    'base': {
+        'descripcion': 'Base',
+        'proyecciones': {'ingresos': '1,000,000€', 'gastos': 800000, 'crecimiento_ingresos': '10%'},
+        'supuestos': ['Mercado estable']
+    },
+    'optimista': {
+        'descripcion': 'Optimista',
+        'proyecciones': {'ingresos': 1200000, 'gastos': 850000, 'beneficio': 350000, 'margen': '29.17%'},
+        'supuestos': []
+    },
+    'pesimista': {
+        'descripcion': 'Pesimista',
+        'proyecciones': {'ingresos': 800000},
+        'supuestos': []
+    }
+}
+
+def test_parse_number():
+    assert parse_number('15%') == 15.0
+    assert parse_number('1,200.50€') == 1200.5
+    assert np.isnan(parse_number('n/d'))
+    assert np.isnan(parse_number(None))
+
+def test_scenario_set_parses_once_and_derives_metrics():
+    scenarios = ScenarioSet.from_dict(RAW_SCENARIOS)
+    assert scenarios.values.shape == (3, 5)
+    assert scenarios['base'].proyecciones.beneficio == 200000
+    assert scenarios['base']['proyecciones']['margen'] == pytest.approx(20.0)
+    assert scenarios['optimista'].proyecciones.margen == pytest.approx(29.17)
+    # Las métricas que faltan no aparecen en el formato dict y valen default en las consultas
+    assert 'gastos' not in scenarios['pesimista']['proyecciones']
+    assert scenarios.value('pesimista', 'gastos') == 0.0
+    np.testing.assert_array_equal(scenarios.column('ingresos'), [1000000, 1200000, 800000])
+
+    with pytest.raises(AttributeError):
+        scenarios['base'].otro = 1
+
+def test_round_trip_and_legacy_access():
+    scenarios = ScenarioSet.from_dict(RAW_SCENARIOS)
+    restored = ScenarioSet.from_dict(json.loads(json.dumps(scenarios.to_dict())))
+    np.testing.assert_array_equal(restored.values, scenarios.values)
+    assert ScenarioSet.coerce(scenarios) is scenarios
+    assert pd.DataFrame([scenarios['base'].proyecciones.to_dict()])['beneficio'].iat[0] == 200000
+    assert scenarios['base']['supuestos'] == ['Mercado estable']
+
+def test_generator_returns_model_and_dashboard_uses_derived_metrics(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', os.path.join(tmp_path, "models.db"))
+    gpt_client = Mock()
+    gpt_client.generate_scenarios.return_value = json.dumps(RAW_SCENARIOS)
+    gpt_client.generate_financial_opinion.return_value = "Análisis"
+    generator = ScenarioGenerator(gpt_client)
+
+    scenarios = generator.generate_scenarios({'ingresos': 1000000, 'gastos': 800000})
+    assert isinstance(scenarios, ScenarioSet)
+    generator.generate_detailed_analysis(scenarios)
+    payload = gpt_client.generate_financial_opinion.call_args[0][0]
+    assert payload['base']['proyecciones']['beneficio'] == 200000
+
+    fig = ScenarioVisualizer().create_metrics_dashboard(scenarios, ['ingresos', 'beneficio', 'margen'])
+    beneficio_base = [trace.y[0] for trace in fig.data if trace.xaxis == 'x2' and trace.name == 'Base']
+    assert beneficio_base == [200000]
@@ -0,0 +1,47 @@
+import pytest
+import numpy as np
+from datetime import datetime
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from scenarios.sensitivity import SensitivityAnalyzer
+from visualization.scenario_visualizer import ScenarioVisualizer
+
+@pytest.fixture
+def analyzer():
+    return SensitivityAnalyzer.from_financial_data({'ingresos': 1200000, 'gastos': 900000})
+
+def test_grid_matches_scalar_computation(analyzer):
+    grid = analyzer.grid(growth_range=(0.0, 0.2), inflation_range=(0.0, 0.1), steps=(5, 3))
+    assert grid['margen'].shape == (3, 5)
+
+    # Sin crecimiento ni inflación se recuperan los totales de partida
+    assert grid['ingresos'][0, 0] == pytest.approx(1200000)
+    assert grid['gastos'][0, 0] == pytest.approx(900000)
+
+    growth, inflation = grid['growth'][4], grid['inflation'][2]
+    factors = np.arange(1, 13) / 12
+    ingresos = (100000 * (1 + growth) ** factors).sum()
+    gastos = (75000 * (1 + inflation) ** factors).sum()
+    assert grid['beneficio'][2, 4] == pytest.approx(ingresos - gastos)
+    assert grid['margen'][2, 4] == pytest.approx((ingresos - gastos) / ingresos * 100)
+
+def test_variable_costs_follow_revenue():
+    analyzer = SensitivityAnalyzer.from_financial_data({'ingresos': 1000, 'gastos': 800}, variable_cost_share=1.0)
+    grid = analyzer.grid(inflation_range=(0.0, 0.0), steps=(50, 2))
+    # Con gastos totalmente variables y sin inflación el margen no depende del crecimiento
+    np.testing.assert_allclose(grid['margen'], 20.0)
+
+def test_breakeven_and_history():
+    operations = SyntheticLedgerGenerator(seed=2).generate(years=2, end_date=datetime(2024, 12, 31))
+    grid = SensitivityAnalyzer.from_operations(operations).grid(inflation_range=(0.0, 2.0))
+    breakeven = SensitivityAnalyzer.breakeven_inflation(grid)
+    assert np.all(np.diff(breakeven) >= 0)
+
+def test_full_grid_renders_as_single_heatmap(analyzer):
+    grid = analyzer.grid(steps=(200, 200))
+    fig = ScenarioVisualizer().create_sensitivity_heatmap(grid)
+    fig.to_json()
+    # La rejilla completa es una matriz: un mapa de calor y un contorno, no una traza por celda
+    assert [trace.type for trace in fig.data] == ['heatmap', 'contour']
+    assert fig.data[0].z.shape == (200, 200)
+    assert all(isinstance(grid[key], np.ndarray) and grid[key].shape == (200, 200)
+               for key in ('ingresos', 'gastos', 'beneficio', 'margen'))
@@ -0,0 +1,105 @@
+import pytest
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from config.config import Config
+import utils.storage_backends as storage_backends
+from utils.database import DatabaseManager
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from utils.storage_backends import StorageBackend, SQLiteBackend, create_storage_backend
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "backends.db"))
+    db.add_operations_bulk(SyntheticLedgerGenerator(0).generate(
+        2, 2, 10, (5, 8), end_date=datetime(2024, 12, 31)))
+    return db
+
+def test_sqlite_rollup_matches_pandas(db):
+    rollup = SQLiteBackend(db).monthly_rollup('concepto', tipo='Gasto')
+    operations = db.get_historical_data(tipo='Gasto')
+    expected = operations.groupby([operations['fecha'].dt.strftime('%Y-%m'), 'concepto'],
+                                  observed=True)['importe'].sum()
+    assert np.allclose(rollup['importe'].sort_values(), expected.sort_values())
+    assert set(rollup['tipo']) == {'Gasto'}
+
+def test_sqlite_feature_pivot(db):
+    pivot = SQLiteBackend(db).feature_pivot()
+    assert pivot.index.is_monotonic_increasing
+    assert np.isclose(pivot.to_numpy().sum(), db.get_historical_data()['importe'].sum())
+
+def test_backend_interface_is_abstract(db):
+    with pytest.raises(TypeError):
+        StorageBackend(db)
+
+def test_sync_async_refreshes_monthly_aggregates(db):
+    backend = SQLiteBackend(db)
+    backend.sync_async().join(timeout=30)
+    with sqlite3.connect(db.db_path) as conn:
+        total = conn.execute("SELECT SUM(importe) FROM monthly_aggregates").fetchone()[0]
+    assert np.isclose(total, db.get_historical_data()['importe'].sum())
+
+def test_unknown_backend(db):
+    with pytest.raises(ValueError):
+        create_storage_backend(db, 'oracle')
+
+def test_duckdb_falls_back_without_package(db, monkeypatch):
+    monkeypatch.setattr(storage_backends, 'duckdb', None)
+    assert isinstance(create_storage_backend(db, 'duckdb'), SQLiteBackend)
+
+def test_config_selects_backend(db, monkeypatch):
+    monkeypatch.setattr(Config, 'STORAGE_BACKEND', 'sqlite')
+    assert create_storage_backend(db) is create_storage_backend(db, 'sqlite')
+
+def test_duckdb_matches_sqlite(db):
+    pytest.importorskip('duckdb')
+    sqlite, duck = SQLiteBackend(db), storage_backends.DuckDBBackend(db)
+    for by in ('concepto', 'entidad'):
+        expected = sqlite.period_analytics(by).sort_values([by, 'tipo', 'mes']).reset_index(drop=True)
+        result = duck.period_analytics(by).sort_values([by, 'tipo', 'mes']).reset_index(drop=True)
+        columns = ['importe', 'mom', 'yoy', 'acumulado_3m', 'acumulado_12m']
+        assert np.allclose(expected[columns].fillna(0), result[columns].fillna(0))
+    assert np.allclose(sqlite.feature_pivot().to_numpy(), duck.feature_pivot().to_numpy())
+
+def test_duckdb_follows_ingestion(db):
+    pytest.importorskip('duckdb')
+    duck = storage_backends.DuckDBBackend(db)
+    assert duck.sync() > 0
+    assert duck.sync() == 0
+    db.add_operation(datetime(2024, 12, 20), 'Agua', 'Canal Isabel II', 'Gasto', 80.0)
+    assert duck.sync() == 1
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("DELETE FROM operations WHERE concepto = 'Agua'")
+    duck.sync()
+    assert 'Agua' not in set(duck.monthly_rollup('concepto')['concepto'])
+
+def test_duckdb_interrupted_sync_resumes(db, monkeypatch):
+    pytest.importorskip('duckdb')
+    duck = storage_backends.DuckDBBackend(db)
+    iter_operations = db.iter_operations
+    def failing(*args, **kwargs):
+        batches = iter_operations(*args, **kwargs)
+        yield next(batches)
+        raise RuntimeError("conexión perdida")
+    monkeypatch.setattr(db, 'iter_operations', failing)
+    with pytest.raises(RuntimeError):
+        duck.sync(batch_size=50)
+    assert not duck.is_current()
+    # Lo confirmado es el primer lote junto con su last_id
+    assert duck.query("SELECT COUNT(*) AS n FROM operations")['n'].iat[0] == 50
+    assert duck._state()['last_id'] == 50
+
+    monkeypatch.setattr(db, 'iter_operations', iter_operations)
+    assert duck.sync(batch_size=50) == len(db.get_historical_data()) - 50
+    assert duck.is_current()
+    ids = duck.query("SELECT id FROM operations")['id']
+    assert ids.is_unique and len(ids) == len(db.get_historical_data())
+
+def test_duckdb_sync_async(db):
+    pytest.importorskip('duckdb')
+    duck = storage_backends.DuckDBBackend(db)
+    assert not duck.is_current()
+    duck.sync_async().join(timeout=60)
+    assert duck.is_current()
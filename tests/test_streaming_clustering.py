@@ -0,0 +1,87 @@
+import pytest
+import os
+import numpy as np
+from datetime import datetime
+from unittest.mock import Mock
+from config.config import Config
+from utils.database import DatabaseManager
+from utils.synthetic_ledger import SyntheticLedgerGenerator
+from ml_analysis.clustering import FinancialClustering
+from ml_analysis.feature_engineering import operation_matrix
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(os.path.join(tmp_path, "streaming.db"))
+    db.add_operations_bulk(SyntheticLedgerGenerator(seed=5).generate(
+        n_companies=5, years=2, end_date=datetime(2024, 6, 30)))
+    return db
+
+def test_iter_operations_batches(db):
+    batches = list(db.iter_operations(batch_size=500))
+    assert all(len(batch) <= 500 for batch in batches)
+    ids = np.concatenate([batch['id'].to_numpy() for batch in batches])
+    assert np.all(np.diff(ids) > 0)
+    assert len(ids) == len(db.get_historical_data())
+    assert 'Nóminas' in db.get_distinct_values('concepto')
+
+    until = int(ids[len(ids) // 2])
+    bounded = np.concatenate([batch['id'].to_numpy() for batch in db.iter_operations(500, until_id=until)])
+    assert bounded.max() == until and len(bounded) == len(ids) // 2 + 1
+
+def test_operation_matrix():
+    operations = SyntheticLedgerGenerator(seed=1).generate(years=1, end_date=datetime(2024, 12, 31))
+    conceptos = ['Alquiler', 'Nóminas']
+    matrix = operation_matrix(operations, conceptos)
+    assert matrix.shape == (len(operations), 7)
+    assert matrix[:, 5].sum() == (operations['concepto'] == 'Alquiler').sum()
+    np.testing.assert_array_equal(matrix[:, 1], (operations['tipo'] == 'Ingreso').to_numpy())
+
+def test_fit_streaming_and_incremental_update(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
+    clustering = FinancialClustering(Mock())
+    stats = clustering.fit_streaming(db, n_clusters=4, batch_size=300, minibatch_size=128)
+    assert stats['rows'] == len(db.get_historical_data())
+    assert clustering.kmeans.cluster_centers_.shape == (4, len(clustering.features))
+
+    centers = clustering.kmeans.cluster_centers_.copy()
+    assert clustering.update_streaming(db) == 0
+
+    new_operations = SyntheticLedgerGenerator(seed=6).generate(years=1, end_date=datetime(2024, 12, 31))
+    db.add_operations_bulk(new_operations)
+    assert clustering.update_streaming(db, batch_size=300) == len(new_operations)
+    assert not np.allclose(centers, clustering.kmeans.cluster_centers_)
+
+    labels = clustering.predict_operations(new_operations)
+    assert labels.shape == (len(new_operations),)
+    assert set(labels) <= set(range(4))
+    assert clustering.streaming_inertia(db) > 0
+
+def test_fit_streaming_epochs_ignore_rows_added_after_scaling(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
+    monkeypatch.setattr(Config, 'COLUMNAR_SNAPSHOT_ENABLED', False)
+    iter_operations = db.iter_operations
+    seen = []
+    def iter_and_insert(*args, **kwargs):
+        ids = []
+        for batch in iter_operations(*args, **kwargs):
+            ids.extend(batch['id'])
+            yield batch
+        seen.append(max(ids))
+        if len(seen) == 1:
+            # Llegan operaciones nuevas entre la pasada del escalado y las épocas
+            db.add_operations_bulk(SyntheticLedgerGenerator(seed=8).generate(years=1, end_date=datetime(2024, 12, 31)))
+    monkeypatch.setattr(db, 'iter_operations', iter_and_insert)
+
+    clustering = FinancialClustering(Mock())
+    clustering.fit_streaming(db, n_clusters=4, batch_size=300, minibatch_size=128, epochs=2)
+    assert seen == [clustering.last_operation_id] * 3
+
+def test_fit_streaming_from_snapshot_matches_sqlite(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_PATH', str(tmp_path / "finance.db"))
+    centers = {}
+    for enabled in (False, True):
+        monkeypatch.setattr(Config, 'COLUMNAR_SNAPSHOT_ENABLED', enabled)
+        clustering = FinancialClustering(Mock())
+        clustering.fit_streaming(db, n_clusters=4, batch_size=300, minibatch_size=128, epochs=2)
+        centers[enabled] = clustering.kmeans.cluster_centers_
+    np.testing.assert_allclose(centers[True], centers[False])
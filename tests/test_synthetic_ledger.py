@@ -0,0 +1,42 @@
+import pytest
+import os
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from utils.database import DatabaseManager
+from utils.synthetic_ledger import SyntheticLedgerGenerator, GASTOS_FIJOS
+
+END_DATE = datetime(2024, 2, 15)
+
+@pytest.fixture
+def ledger():
+    return SyntheticLedgerGenerator(seed=7).generate(n_companies=3, years=2, end_date=END_DATE)
+
+def test_reproducible_with_seed(ledger):
+    again = SyntheticLedgerGenerator(seed=7).generate(n_companies=3, years=2, end_date=END_DATE)
+    pd.testing.assert_frame_equal(ledger, again)
+
+def test_calendar_correct_months(ledger):
+    months = ledger['fecha'].dt.to_period('M')
+    assert months.nunique() == 24
+    assert ledger['fecha'].max() <= pd.Timestamp(END_DATE)
+    assert ledger['fecha'].min() >= pd.Timestamp(2022, 3, 1)
+
+def test_structure(ledger):
+    assert ledger['empresa'].nunique() == 3
+    assert set(ledger['tipo'].unique()) == {'Ingreso', 'Gasto'}
+    assert (ledger['importe'] >= 0).all()
+    expenses = ledger[ledger['tipo'] == 'Gasto']
+    assert len(expenses) == 3 * 24 * len(GASTOS_FIJOS)
+
+def test_large_volume():
+    df = SyntheticLedgerGenerator(seed=1).generate(n_companies=200, years=5, invoices_per_month=(20, 40))
+    assert len(df) > 400_000
+
+def test_bulk_insert(ledger, tmp_path):
+    db_path = os.path.join(tmp_path, "test_bulk.db")
+    inserted = SyntheticLedgerGenerator.to_sqlite(ledger, db_path)
+
+    data = DatabaseManager(db_path).get_historical_data()
+    assert inserted == len(ledger) == len(data)
+    assert data['importe'].sum() == pytest.approx(ledger['importe'].sum())
@@ -0,0 +1,46 @@
+import pytest
+import json
+from utils.token_budget import TokenBudgeter
+
+@pytest.fixture
+def budgeter():
+    return TokenBudgeter(budget=60, float_decimals=2)
+
+@pytest.fixture
+def sample_context():
+    return """1. Situación actual del sector
+El sector tecnológico en Madrid mantiene un crecimiento sostenido de la facturación.
+
+2. Tendencias principales
+La digitalización impulsa la demanda de servicios profesionales y consultoría.
+
+3. Factores de riesgo
+La subida de costes laborales y de la energía presiona los márgenes y los gastos.
+
+4. Oportunidades de crecimiento
+Los fondos europeos financian proyectos de transformación digital en pymes."""
+
+def test_compact_json_rounds_and_removes_indent(budgeter):
+    data = {'ingresos': 1234567.891234, 'ratio': 0.123456, 'total': 1000.0}
+    compact = budgeter.compact_json(data)
+
+    assert '\n' not in compact
+    assert json.loads(compact) == {'ingresos': 1234567.89, 'ratio': 0.12, 'total': 1000}
+    assert budgeter.count_tokens(compact) < budgeter.count_tokens(json.dumps(data, indent=2))
+
+def test_compact_json_keeps_strings(budgeter):
+    assert budgeter.compact_json("texto libre") == "texto libre"
+
+def test_select_context_respects_budget(budgeter, sample_context):
+    selected = budgeter.select_context(sample_context, "márgenes gastos costes energía")
+
+    assert budgeter.count_tokens(selected) <= budgeter.budget
+    assert "Factores de riesgo" in selected
+
+def test_select_context_keeps_short_context(budgeter):
+    assert budgeter.select_context("Contexto breve", "consulta") == "Contexto breve"
+
+def test_report(budgeter):
+    report = budgeter.report(1000, 400)
+    assert report['tokens_saved'] == 600
+    assert report['reduction_pct'] == pytest.approx(60.0)
@@ -0,0 +1,45 @@
+import pytest
+import os
+from utils.usage_ledger import UsageLedger
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UsageLedger(os.path.join(tmp_path, "test_ledger.db"))
+
+def test_record_and_summary(ledger):
+    for latency in [100, 200, 300, 400]:
+        ledger.record('scenarios', 'gpt-4', 'none', 1000, 500, latency)
+    ledger.record('scenarios', 'gpt-4', 'db', 1000, 500, 5)
+    ledger.record('opinion', 'gpt-3.5-turbo', 'none', 200, 100, 50)
+
+    summary = ledger.get_usage_summary().set_index('feature')
+    assert set(summary.index) == {'scenarios', 'opinion'}
+    assert summary.loc['scenarios', 'calls'] == 5
+    assert summary.loc['scenarios', 'cache_hit_ratio'] == pytest.approx(0.2)
+    assert summary.loc['scenarios', 'p50_latency_ms'] == pytest.approx(200)
+    assert summary.loc['scenarios', 'p95_latency_ms'] > summary.loc['scenarios', 'p50_latency_ms']
+    assert summary.loc['scenarios', 'prompt_tokens'] == 5000
+
+def test_cached_calls_have_no_cost(ledger):
+    ledger.record('opinion', 'gpt-4', 'db', 1000, 1000, 1)
+    ledger.record('opinion', 'gpt-4', 'none', 1000, 1000, 1)
+
+    totals = ledger.get_totals()
+    assert totals['calls'] == 2
+    assert totals['cost'] == pytest.approx(UsageLedger.estimate_cost('gpt-4', 1000, 1000))
+
+def test_empty_summary(ledger):
+    summary = ledger.get_usage_summary()
+    assert summary.empty
+    assert 'p95_latency_ms' in summary.columns
+
+def test_failed_calls_reported_separately(ledger):
+    ledger.record('scenarios', 'gpt-4', 'none', 1000, 500, 100)
+    ledger.record('scenarios', 'gpt-4', 'none', 1000, 500, 30000, success=False)
+
+    summary = ledger.get_usage_summary().set_index('feature')
+    assert summary.loc['scenarios', 'failed'] == 1
+    assert summary.loc['scenarios', 'p95_latency_ms'] == pytest.approx(100)
+    totals = ledger.get_totals()
+    assert totals['failed'] == 1
+    assert totals['cost'] == pytest.approx(UsageLedger.estimate_cost('gpt-4', 1000, 500))
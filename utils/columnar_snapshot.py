@@ -0,0 +1,225 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from config.config import Config
+from utils.database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Tipo en disco de cada columna; el texto se guarda como códigos de un diccionario
+SNAPSHOT_COLUMNS = {
+    'id': np.dtype('int64'),
+    'fecha': np.dtype('datetime64[s]'),
+    'concepto': np.dtype('int32'),
+    'entidad': np.dtype('int32'),
+    'tipo': np.dtype('int32'),
+    'importe': np.dtype('float64')
+}
+DICTIONARY_COLUMNS = ('concepto', 'entidad', 'tipo')
+# Columnas que usan la previsión, Monte Carlo, la sensibilidad y las características del clustering
+ANALYSIS_COLUMNS = ('fecha', 'concepto', 'entidad', 'tipo', 'importe')
+
+class ColumnarSnapshot:
+    """Copia columnar de operations: un fichero binario por columna, leído con np.memmap.
+
+    Se actualiza por anexado con las operaciones nuevas (por id) y se reconstruye solo si
+    en SQLite ha habido modificaciones o borrados. Los diccionarios de texto solo crecen,
+    así que los códigos ya escritos no cambian. El número de filas válidas se guarda en
+    meta.json después de escribir los datos: una escritura interrumpida se descarta.
+
+    Las filas ya confirmadas nunca se truncan: la reconstrucción escribe una nueva generación
+    de ficheros, de modo que las vistas memmap abiertas por otros hilos siguen siendo válidas.
+    """
+
+    # Una instantánea por base de datos (comparten el bloqueo de actualización)
+    _snapshots: Dict[str, 'ColumnarSnapshot'] = {}
+
+    def __init__(self, db: DatabaseManager, path: Optional[str] = None):
+        self.db = db
+        self.path = path or os.path.splitext(db.db_path)[0] + '_snapshot'
+        # Reentrante: read_current e iter_batches actualizan y leen sin soltarlo
+        self._lock = threading.RLock()
+        os.makedirs(self.path, exist_ok=True)
+        self.meta = self._load_meta()
+
+    @classmethod
+    def for_database(cls, db: DatabaseManager) -> 'ColumnarSnapshot':
+        if db.db_path not in cls._snapshots:
+            cls._snapshots[db.db_path] = cls(db)
+        return cls._snapshots[db.db_path]
+
+    def _file(self, column: str, generation: Optional[int] = None) -> str:
+        generation = self.meta.get('generation', 0) if generation is None else generation
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.path, f"{column}{suffix}.bin")
+
+    @staticmethod
+    def _empty_meta(generation: int = 0) -> Dict:
+        return {'rows': 0, 'last_id': 0, 'instance': None, 'rewrites': None, 'generation': generation,
+                'dictionaries': {column: [] for column in DICTIONARY_COLUMNS}}
+
+    def _remove_stale_files(self):
+        """Borra los ficheros de generaciones anteriores; si siguen proyectados en memoria
+        (en Windows no se pueden borrar) se intentará de nuevo en la próxima reconstrucción"""
+        current = {os.path.basename(self._file(column)) for column in SNAPSHOT_COLUMNS}
+        for name in os.listdir(self.path):
+            if name.endswith('.bin') and name not in current:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def _load_meta(self) -> Dict:
+        try:
+            with open(os.path.join(self.path, 'meta.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self._empty_meta()
+
+    def _save_meta(self):
+        path = os.path.join(self.path, 'meta.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def n_rows(self) -> int:
+        return self.meta['rows']
+
+    def _encode(self, column: str, values: pd.Series) -> np.ndarray:
+        dictionary = self.meta['dictionaries'][column]
+        codes = pd.Index(dictionary).get_indexer(values)
+        if (codes < 0).any():
+            dictionary.extend(pd.unique(values[codes < 0]).tolist())
+            codes = pd.Index(dictionary).get_indexer(values)
+        return codes.astype(SNAPSHOT_COLUMNS[column])
+
+    def refresh(self, batch_size: Optional[int] = None) -> int:
+        """Añade las operaciones nuevas (o reconstruye si hubo reescrituras); devuelve las filas añadidas"""
+        batch_size = batch_size or Config.SNAPSHOT_BATCH_ROWS
+        with self._lock:
+            instance = self.db.get_data_version('instance')
+            rewrites = self.db.get_data_version('operations_rewrites')
+            if (self.meta['instance'], self.meta['rewrites']) != (instance, rewrites):
+                generation = self.meta.get('generation', 0)
+                if self.meta['rows']:
+                    logger.info("Operaciones modificadas en SQLite: se reconstruye la instantánea columnar")
+                    generation += 1
+                self.meta = self._empty_meta(generation)
+                self.meta.update(instance=instance, rewrites=rewrites)
+                self._save_meta()
+                self._remove_stale_files()
+
+            files = {}
+            try:
+                for column, dtype in SNAPSHOT_COLUMNS.items():
+                    # Descarta lo escrito más allá de las filas confirmadas en meta.json (nunca
+                    # proyectado: los lectores solo abren las filas confirmadas)
+                    files[column] = open(self._file(column), 'a+b')
+                    files[column].truncate(self.meta['rows'] * dtype.itemsize)
+                added = 0
+                for batch in self.db.iter_operations(batch_size, since_id=self.meta['last_id']):
+                    arrays = {
+                        'id': batch['id'].to_numpy(dtype=np.int64),
+                        'fecha': pd.to_datetime(batch['fecha']).to_numpy().astype('datetime64[s]'),
+                        'importe': batch['importe'].to_numpy(dtype=np.float64)
+                    }
+                    for column in DICTIONARY_COLUMNS:
+                        arrays[column] = self._encode(column, batch[column])
+                    for column, f in files.items():
+                        arrays[column].tofile(f)
+                        f.flush()
+                    self.meta['rows'] += len(batch)
+                    self.meta['last_id'] = int(arrays['id'][-1])
+                    self._save_meta()
+                    added += len(batch)
+            finally:
+                for f in files.values():
+                    f.close()
+            self._save_meta()
+        if added:
+            logger.info(f"Instantánea columnar: {added:,} operaciones añadidas ({self.n_rows:,} en total)")
+        return added
+
+    def columns(self, names: Optional[Sequence[str]] = None) -> Dict[str, np.ndarray]:
+        """Arrays de solo lectura proyectados en memoria; solo se abren las columnas pedidas.
+
+        Se abren bajo el bloqueo para que filas y generación sean coherentes; después las
+        vistas siguen siendo válidas aunque otro hilo actualice o reconstruya la instantánea.
+        """
+        names = list(names or SNAPSHOT_COLUMNS)
+        with self._lock:
+            rows = self.n_rows
+            arrays = {}
+            for column in names:
+                dtype = SNAPSHOT_COLUMNS[column]
+                arrays[column] = (np.memmap(self._file(column), dtype=dtype, mode='r', shape=(rows,))
+                                  if rows else np.empty(0, dtype=dtype))
+        return arrays
+
+    def dictionary(self, column: str) -> List[str]:
+        return list(self.meta['dictionaries'][column])
+
+    def _open(self, names: Optional[Sequence[str]]) -> Tuple[Dict[str, np.ndarray], Dict[str, List[str]]]:
+        """Columnas junto con los diccionarios de su misma generación (una reconstrucción los sustituye)"""
+        with self._lock:
+            return self.columns(names), self.meta['dictionaries']
+
+    @staticmethod
+    def _frame(arrays: Dict[str, np.ndarray], dictionaries: Dict[str, List[str]], decode: bool) -> pd.DataFrame:
+        if decode:
+            for column in DICTIONARY_COLUMNS:
+                if column in arrays:
+                    arrays[column] = pd.Categorical.from_codes(np.asarray(arrays[column]),
+                                                               categories=pd.Index(dictionaries[column]))
+        return pd.DataFrame(arrays, copy=False)
+
+    def read(self, columns: Optional[Sequence[str]] = None, decode: bool = True) -> pd.DataFrame:
+        """DataFrame con las columnas pedidas. Las numéricas y la fecha son vistas sin copia
+        del fichero; el texto se devuelve como categórica (o como códigos con decode=False)"""
+        arrays, dictionaries = self._open(columns)
+        return self._frame(arrays, dictionaries, decode)
+
+    def read_current(self, columns: Optional[Sequence[str]] = None, decode: bool = True) -> pd.DataFrame:
+        """Actualiza la instantánea y devuelve las columnas pedidas como vistas sin copia"""
+        with self._lock:
+            self.refresh()
+            return self.read(columns, decode)
+
+    def iter_batches(self, batch_size: int, columns: Optional[Sequence[str]] = None,
+                     until_id: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """Recorre la instantánea en lotes ordenados por id, como DatabaseManager.iter_operations"""
+        columns = list(columns or SNAPSHOT_COLUMNS)
+        arrays, dictionaries = self._open(set(columns) | {'id'})
+        stop = len(arrays['id']) if until_id is None else int(np.searchsorted(arrays['id'], until_id, side='right'))
+        for start in range(0, stop, batch_size):
+            end = min(start + batch_size, stop)
+            yield self._frame({column: np.array(arrays[column][start:end]) for column in columns}, dictionaries, True)
+
+    def sample(self, n: int, columns: Optional[Sequence[str]] = None, random_state: int = 42,
+               decode: bool = True) -> pd.DataFrame:
+        """Muestra aleatoria de n filas leyendo del disco solo las páginas que la contienen"""
+        arrays, dictionaries = self._open(columns)
+        n_rows = len(next(iter(arrays.values())))
+        if n < n_rows:
+            rows = np.sort(np.random.default_rng(random_state).choice(n_rows, n, replace=False))
+            arrays = {column: array[rows] for column, array in arrays.items()}
+        return self._frame(arrays, dictionaries, decode)
+
+def load_operations(db: DatabaseManager, columns: Sequence[str] = ANALYSIS_COLUMNS) -> pd.DataFrame:
+    """Operaciones para los análisis: de la instantánea columnar si está activada (solo las
+    columnas pedidas, sin leer ni convertir el texto de SQLite) o de get_historical_data"""
+    if not Config.COLUMNAR_SNAPSHOT_ENABLED:
+        return db.get_historical_data()[list(columns)]
+    operations = ColumnarSnapshot.for_database(db).read_current(columns)
+    # Categorías en orden alfabético, como las de get_historical_data (el diccionario va por aparición);
+    # solo se recodifican las columnas de texto, las numéricas y la fecha siguen siendo vistas
+    for column in DICTIONARY_COLUMNS:
+        if column in operations:
+            operations[column] = operations[column].cat.reorder_categories(
+                sorted(operations[column].cat.categories))
+    return operations
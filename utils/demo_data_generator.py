@@ -1,11 +1,13 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
 from fpdf import FPDF
 import json
 import sqlite3
+from typing import Optional
 from .database import DatabaseManager
+from .synthetic_ledger import SyntheticLedgerGenerator
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,87 +44,13 @@ class DemoDataGenerator:
             logger.error(f"Error durante la limpieza de datos: {str(e)}")
             raise
 
-    def generate_historical_data(self, years: int = 5) -> pd.DataFrame:
+    def generate_historical_data(self, years: int = 5, seed: Optional[int] = None) -> pd.DataFrame:
         """Genera datos históricos con conceptos y entidades realistas"""
-        # Gastos fijos mensuales más realistas para una empresa pequeña
-        gastos_fijos = {
-            'Electricidad': {'entidad': 'Iberdrola', 'base': 250, 'variacion': 50},
-            'Agua': {'entidad': 'Canal Isabel II', 'base': 80, 'variacion': 20},
-            'Internet y Telefonía': {'entidad': 'Movistar', 'base': 120, 'variacion': 15},
-            'Alquiler': {'entidad': 'Inmobiliaria Centro', 'base': 800, 'variacion': 0},
-            'Material Oficina': {'entidad': 'Office Depot', 'base': 150, 'variacion': 50},
-            'Seguros': {'entidad': 'Mapfre', 'base': 200, 'variacion': 0},
-            'Mantenimiento': {'entidad': 'ServiTech', 'base': 150, 'variacion': 50},
-            'Nóminas': {'entidad': 'Personal', 'base': 3500, 'variacion': 500},
-            'Seguridad Social': {'entidad': 'TGSS', 'base': 1200, 'variacion': 150},
-            'Gestoría': {'entidad': 'AsesoresPlus', 'base': 150, 'variacion': 0},
-            'Software y Licencias': {'entidad': 'Varios', 'base': 200, 'variacion': 100}
-        }
-        
-        clientes = [
-            'TechSolutions SA', 'Innovatech', 'Desarrollo Digital SL', 
-            'Consultoría Avanzada', 'Sistemas Integrados'
-        ]
-        
-        # Definir estacionalidad (1.0 = normal, >1.0 = más actividad, <1.0 = menos actividad)
-        estacionalidad = {
-            1: 0.8,   # Enero (después de navidades, menos actividad)
-            2: 0.9,
-            3: 1.0,
-            4: 1.1,
-            5: 1.2,
-            6: 1.1,
-            7: 0.7,   # Julio (verano)
-            8: 0.5,   # Agosto (vacaciones)
-            9: 1.1,   # Septiembre (vuelta al trabajo)
-            10: 1.2,
-            11: 1.1,
-            12: 0.9    # Diciembre (navidades)
-        }
-        
-        data = []
-        end_date = datetime.now()
-        
-        for i in range(years * 12):
-            date = end_date - timedelta(days=30*i)
-            mes = date.month
-            factor_estacional = estacionalidad[mes]
-            
-            # Gastos fijos mensuales
-            for concepto, info in gastos_fijos.items():
-                # Algunos gastos como alquiler o seguros no tienen estacionalidad
-                es_gasto_estacional = concepto not in ['Alquiler', 'Seguros', 'Gestoría']
-                factor = factor_estacional if es_gasto_estacional else 1.0
-                
-                base_adjusted = info['base'] * factor
-                importe = base_adjusted + np.random.normal(0, info['variacion'])
-                data.append({
-                    'fecha': date.strftime('%Y-%m-%d'),
-                    'concepto': concepto,
-                    'entidad': info['entidad'],
-                    'tipo': 'Gasto',
-                    'importe': round(max(importe, 0), 2)
-                })
-            
-            # Ingresos variables más realistas
-            num_facturas = np.random.randint(1, 4)  # 1-3 facturas por mes
-            for _ in range(num_facturas):
-                cliente = np.random.choice(clientes)
-                # Base entre 3000-7000€ por factura con estacionalidad
-                base_factura = np.random.normal(5000, 1000) * factor_estacional
-                # Añadir variación del 20%
-                importe = base_factura * np.random.normal(1, 0.2)
-                data.append({
-                    'fecha': date.strftime('%Y-%m-%d'),
-                    'concepto': 'Servicios Profesionales',
-                    'entidad': cliente,
-                    'tipo': 'Ingreso',
-                    'importe': round(max(importe, 0), 2)
-                })
-        
-        df = pd.DataFrame(data)
-        df['fecha'] = pd.to_datetime(df['fecha'])
-        return df.sort_values('fecha')
+        df = SyntheticLedgerGenerator(seed).generate(n_companies=1, years=years)
+        df = df.drop(columns=['empresa'])
+        for column in ['concepto', 'entidad', 'tipo']:
+            df[column] = df[column].astype(str)
+        return df
 
     def generate_sample_pdf(self) -> str:
         """Genera un PDF con un informe financiero de ejemplo"""
@@ -135,7 +63,11 @@ class DemoDataGenerator:
         page_width = pdf.w - 2 * pdf.l_margin
         
         df = self.generate_historical_data(years=1)
-        totals = df.groupby('tipo')['importe'].sum()
+        # Una sola pasada de groupby; los desgloses se derivan de este resultado reducido
+        breakdown = df.groupby(['tipo', 'concepto', 'entidad'])['importe'].sum()
+        totals = breakdown.groupby(level='tipo').sum()
+        gastos_por_concepto = breakdown.loc['Gasto'].groupby(level='concepto').sum()
+        ingresos_por_cliente = breakdown.loc['Ingreso'].groupby(level='entidad').sum()
         
         sections = [
             ("Resumen Financiero Anual", [
@@ -146,13 +78,13 @@ class DemoDataGenerator:
             ]),
             ("Análisis de Gastos", [
                 "Desglose por concepto:",
-                *[f"- {concepto}: {df[df['concepto']==concepto]['importe'].sum():,.2f} EUR"
-                  for concepto in df[df['tipo']=='Gasto']['concepto'].unique()]
+                *[f"- {concepto}: {importe:,.2f} EUR"
+                  for concepto, importe in gastos_por_concepto.items()]
             ]),
             ("Análisis de Ingresos", [
                 "Desglose por cliente:",
-                *[f"- {cliente}: {df[df['entidad']==cliente]['importe'].sum():,.2f} EUR"
-                  for cliente in df[df['tipo']=='Ingreso']['entidad'].unique()]
+                *[f"- {cliente}: {importe:,.2f} EUR"
+                  for cliente, importe in ingresos_por_cliente.items()]
             ])
         ]
         
@@ -184,14 +116,7 @@ class DemoDataGenerator:
             
             # Guardar en base de datos
             db = DatabaseManager()
-            for _, row in df.iterrows():
-                db.add_operation(
-                    fecha=pd.to_datetime(row['fecha']),  # Convertir a datetime
-                    concepto=row['concepto'],
-                    entidad=row['entidad'],
-                    tipo=row['tipo'],
-                    importe=row['importe']
-                )
+            db.add_operations_bulk(df)
             
             # Generar PDF
             pdf_path = self.generate_sample_pdf()
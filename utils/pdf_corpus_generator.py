@@ -0,0 +1,143 @@
+import os
+import json
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from fpdf import FPDF
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_KINDS = ('statement', 'invoice', 'table')
+
+def entry_key(entry: Dict[str, Any]) -> tuple:
+    """Clave de comparación de una operación extraída con la verdad de referencia"""
+    return (
+        str(entry['fecha'])[:10],
+        str(entry['concepto']).strip().lower(),
+        str(entry['entidad']).strip().lower(),
+        str(entry['tipo']).strip().lower(),
+        round(float(entry['importe']), 2)
+    )
+
+def evaluate_extraction(extracted: List[Dict[str, Any]], expected: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Precisión, exhaustividad y F1 de una extracción frente a las operaciones reales"""
+    extracted_keys = Counter(entry_key(entry) for entry in extracted)
+    expected_keys = Counter(entry_key(entry) for entry in expected)
+    true_positives = sum((extracted_keys & expected_keys).values())
+    precision = true_positives / sum(extracted_keys.values()) if extracted_keys else 0.0
+    recall = true_positives / sum(expected_keys.values()) if expected_keys else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'true_positives': true_positives}
+
+class PDFCorpusGenerator:
+    """Genera un corpus de PDFs multipágina a partir de un libro de operaciones conocido"""
+
+    def __init__(self, output_dir: str, seed: Optional[int] = 42):
+        self.output_dir = output_dir
+        self.rng = np.random.default_rng(seed)
+        os.makedirs(output_dir, exist_ok=True)
+
+    @staticmethod
+    def _text(value: Any) -> str:
+        # Las fuentes básicas de FPDF solo admiten latin-1
+        return str(value).encode('latin-1', 'replace').decode('latin-1')
+
+    @staticmethod
+    def _line(row) -> str:
+        return f"{row.fecha:%Y-%m-%d} | {row.concepto} | {row.entidad} | {row.tipo} | {row.importe:.2f}"
+
+    def _new_pdf(self, title: str) -> FPDF:
+        pdf = FPDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        pdf.set_font('Helvetica', 'B', 14)
+        pdf.cell(0, 10, self._text(title), ln=1, align='C')
+        return pdf
+
+    def _summary_page(self, pdf: FPDF, operations: pd.DataFrame):
+        """Resumen por tipo y concepto calculado en una única pasada de groupby"""
+        totals = operations.groupby(['tipo', 'concepto'], observed=True)['importe'].sum()
+        pdf.add_page()
+        pdf.set_font('Helvetica', 'B', 12)
+        pdf.cell(0, 8, 'Resumen por concepto', ln=1)
+        pdf.set_font('Helvetica', '', 10)
+        for (tipo, concepto), importe in totals.items():
+            pdf.cell(0, 6, self._text(f"Total {tipo} - {concepto}: {importe:,.2f} EUR"), ln=1)
+
+    def _statement(self, pdf: FPDF, operations: pd.DataFrame, rows_per_page: int):
+        line_height = max(270 / rows_per_page, 3)
+        pdf.set_font('Helvetica', '', max(min(line_height * 2.2, 10), 5))
+        for row in operations.itertuples(index=False):
+            pdf.cell(0, line_height, self._text(self._line(row)), ln=1)
+
+    def _invoices(self, pdf: FPDF, operations: pd.DataFrame, rows_per_page: int):
+        for number, row in enumerate(operations.itertuples(index=False), start=1):
+            if number > 1:
+                pdf.add_page()
+            pdf.set_font('Helvetica', 'B', 12)
+            pdf.cell(0, 8, f"Factura {number:06d}", ln=1)
+            pdf.set_font('Helvetica', '', 10)
+            pdf.cell(0, 6, self._text(f"Emisor/Receptor: {row.entidad}"), ln=1)
+            pdf.cell(0, 6, self._text(f"Concepto: {row.concepto}"), ln=1)
+            pdf.cell(0, 6, self._text(self._line(row)), ln=1)
+            pdf.cell(0, 6, f"Total factura: {row.importe:,.2f} EUR", ln=1)
+
+    def _table(self, pdf: FPDF, operations: pd.DataFrame, rows_per_page: int):
+        widths = [25, 50, 50, 20, 35]
+        line_height = max(270 / rows_per_page, 3)
+        pdf.set_font('Helvetica', '', max(min(line_height * 2.2, 9), 5))
+        for header, width in zip(['Fecha', 'Concepto', 'Entidad', 'Tipo', 'Importe'], widths):
+            pdf.cell(width, line_height, header, border=1)
+        pdf.ln()
+        for row in operations.itertuples(index=False):
+            cells = [f"{row.fecha:%Y-%m-%d}", row.concepto, row.entidad, row.tipo, f"{row.importe:.2f}"]
+            for value, width in zip(cells, widths):
+                pdf.cell(width, line_height, self._text(value), border=1)
+            pdf.ln()
+
+    def generate(self, ledger: pd.DataFrame, n_documents: int = 10,
+                 kinds: Sequence[str] = DOCUMENT_KINDS, max_pages: int = 50,
+                 density_range: Sequence[int] = (20, 80)) -> Dict[str, Any]:
+        """Reparte el libro entre n_documents PDFs de tipos y densidades variadas.
+
+        Devuelve el manifiesto con la verdad de referencia de cada documento, que
+        también se guarda como manifest.json en el directorio de salida.
+        """
+        ledger = ledger.sort_values('fecha').reset_index(drop=True)
+        ledger['fecha'] = pd.to_datetime(ledger['fecha'])
+        writers = {'statement': self._statement, 'invoice': self._invoices, 'table': self._table}
+        bounds = np.linspace(0, len(ledger), n_documents + 1).astype(int)
+        documents = []
+
+        for i in range(n_documents):
+            kind = kinds[int(self.rng.integers(0, len(kinds)))]
+            rows_per_page = 1 if kind == 'invoice' else int(self.rng.integers(*density_range))
+            operations = ledger.iloc[bounds[i]:bounds[i + 1]].head(rows_per_page * max_pages)
+            if operations.empty:
+                continue
+
+            pdf = self._new_pdf(f"Documento {i:04d} ({kind})")
+            writers[kind](pdf, operations, rows_per_page)
+            self._summary_page(pdf, operations)
+
+            path = os.path.join(self.output_dir, f"doc_{i:04d}_{kind}.pdf")
+            pdf.output(path)
+            documents.append({
+                'path': path,
+                'kind': kind,
+                'rows_per_page': rows_per_page,
+                'pages': pdf.page_no(),
+                'entries': [
+                    {'fecha': f"{row.fecha:%Y-%m-%d}", 'concepto': str(row.concepto),
+                     'entidad': str(row.entidad), 'tipo': str(row.tipo), 'importe': float(row.importe)}
+                    for row in operations.itertuples(index=False)
+                ]
+            })
+
+        manifest = {'documents': documents, 'total_entries': sum(len(d['entries']) for d in documents)}
+        with open(os.path.join(self.output_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        logger.info(f"Corpus generado: {len(documents)} PDFs, {manifest['total_entries']} operaciones")
+        return manifest
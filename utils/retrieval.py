@@ -0,0 +1,154 @@
+import os
+import re
+import logging
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = {
+    'para', 'como', 'este', 'esta', 'estos', 'estas', 'sobre', 'entre', 'desde', 'hasta',
+    'pero', 'mas', 'los', 'las', 'del', 'que', 'con', 'por', 'una', 'uno', 'sus',
+    'son', 'ser', 'han', 'hay', 'muy', 'tambien', 'cada', 'donde', 'cuando'
+}
+
+def tokenize(text: str) -> List[str]:
+    """Normaliza (minúsculas, sin tildes) y divide el texto en términos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [word for word in _WORD_RE.findall(text) if len(word) > 2 and word not in STOPWORDS]
+
+def chunk_text(text: str, max_words: int = 120, overlap: int = 20) -> List[str]:
+    """Divide el texto en fragmentos de párrafos de como máximo max_words palabras"""
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        step = max(max_words - overlap, 1)
+        for start in range(0, len(words), step):
+            chunks.append(' '.join(words[start:start + max_words]))
+            if start + max_words >= len(words):
+                break
+    return chunks
+
+class BM25Index:
+    """Índice BM25 local sobre matrices dispersas de SciPy.
+
+    Los documentos se guardan como bloques de frecuencias (uno por llamada a add, que se
+    fusionan al crecer) junto a la frecuencia de documento y la longitud de cada uno; el peso
+    BM25 se calcula al consultar solo sobre las entradas de los términos buscados. Así add
+    no obliga a recalcular los pesos del índice completo. add y search comparten un
+    bloqueo: una búsqueda nunca ve el índice a medio ampliar.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self.documents: List[str] = []
+        self.vocabulary = {}
+        self._df = np.zeros(0, dtype=np.int64)
+        self._total_len = 0
+        # Bloques (frecuencias CSC, longitudes) con las filas en orden de documento
+        self._blocks: List[Tuple[sparse.csc_matrix, np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, documents: List[str]):
+        """Añade documentos: solo se tokenizan y se actualizan las estadísticas con los nuevos"""
+        if not documents:
+            return
+        with self._lock:
+            rows, cols, counts = [], [], []
+            for doc_id, document in enumerate(documents):
+                terms, term_counts = np.unique(tokenize(document), return_counts=True)
+                for term, count in zip(terms, term_counts):
+                    rows.append(doc_id)
+                    cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                    counts.append(int(count))
+            n_terms = len(self.vocabulary)
+            tf = sparse.csc_matrix((np.asarray(counts, dtype=np.float64), (rows, cols)),
+                                   shape=(len(documents), n_terms))
+            doc_len = np.asarray(tf.sum(axis=1)).ravel()
+            self.documents.extend(documents)
+            self._df = np.pad(self._df, (0, n_terms - len(self._df)))
+            self._df += np.bincount(np.asarray(cols, dtype=np.int64), minlength=n_terms)
+            self._total_len += int(doc_len.sum())
+            self._blocks.append((tf, doc_len))
+            # Fusión geométrica: O(log n) bloques y cada documento se copia O(log n) veces
+            while len(self._blocks) > 1 and self._blocks[-2][0].shape[0] <= self._blocks[-1][0].shape[0]:
+                (a, a_len), (b, b_len) = self._blocks[-2:]
+                a.resize((a.shape[0], n_terms))
+                b.resize((b.shape[0], n_terms))
+                self._blocks[-2:] = [(sparse.vstack([a, b], format='csc'), np.concatenate([a_len, b_len]))]
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Devuelve los k documentos más relevantes como (índice, puntuación)"""
+        with self._lock:
+            if not self.documents:
+                return []
+            term_ids = np.array(sorted({self.vocabulary[term] for term in tokenize(query)
+                                        if term in self.vocabulary}), dtype=np.int64)
+            if not len(term_ids):
+                return []
+            n_docs = len(self.documents)
+            idf = np.log(1 + (n_docs - self._df[term_ids] + 0.5) / (self._df[term_ids] + 0.5))
+            avg_len = self._total_len / n_docs or 1.0
+            scores = []
+            for tf, doc_len in self._blocks:
+                present = term_ids < tf.shape[1]
+                postings = tf[:, term_ids[present]].tocoo()
+                norm = self.k1 * (1 - self.b + self.b * doc_len[postings.row] / avg_len)
+                weights = postings.data * (self.k1 + 1) / (postings.data + norm) * idf[present][postings.col]
+                scores.append(np.bincount(postings.row, weights=weights, minlength=tf.shape[0]))
+        scores = np.concatenate(scores)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+class ContextRetriever:
+    """Recupera los pasajes más relevantes del contexto guardado de la empresa.
+
+    Las respuestas cacheadas del modelo no se indexan: cambiarían el prompt de cada petición
+    repetida (y con él su clave de caché) y devolverían al modelo sus propias respuestas.
+    """
+
+    _indexes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, db_path: Optional[str] = None, context_file: str = "company_context.txt"):
+        self.db_path = db_path or Config.DB_PATH
+        self.context_file = context_file
+
+    def _context_passages(self) -> List[str]:
+        if not os.path.exists(self.context_file):
+            return []
+        with open(self.context_file, 'r', encoding='utf-8') as f:
+            return chunk_text(f.read())
+
+    def get_index(self) -> BM25Index:
+        """Devuelve el índice vigente; se reconstruye si cambia el fichero de contexto"""
+        with self._lock:
+            key = (self.db_path, self.context_file)
+            context_mtime = os.path.getmtime(self.context_file) if os.path.exists(self.context_file) else None
+            state = self._indexes.get(key)
+            if state is None or state['context_mtime'] != context_mtime:
+                index = BM25Index()
+                index.add(self._context_passages())
+                logger.info(f"Índice de contexto reconstruido con {len(index)} pasajes")
+                state = self._indexes[key] = {'context_mtime': context_mtime, 'index': index}
+            return state['index']
+
+    def retrieve(self, query: str, k: Optional[int] = None) -> List[str]:
+        """Pasajes más relevantes para la consulta"""
+        index = self.get_index()
+        results = index.search(query, k or Config.RETRIEVAL_TOP_K)
+        return [index.documents[i] for i, _ in results]
@@ -0,0 +1,246 @@
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional
+import pandas as pd
+from config.config import Config
+from utils.database import DatabaseManager, PERIOD_ANALYTICS_QUERY
+
+try:
+    import duckdb
+except ImportError:  # Dependencia opcional: sin ella solo está disponible el backend SQLite
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# Consultas analíticas comunes: ambos backends exponen operations y monthly_aggregates
+ROLLUP_QUERY = """
+    SELECT mes, {by}, tipo, SUM(importe) AS importe, SUM(n_operaciones) AS n_operaciones
+    FROM monthly_aggregates {where}
+    GROUP BY mes, {by}, tipo
+    ORDER BY mes, {by}, tipo
+"""
+PIVOT_QUERY = """
+    SELECT mes, tipo, concepto, SUM(importe) AS importe
+    FROM monthly_aggregates
+    GROUP BY mes, tipo, concepto
+"""
+
+# En DuckDB los agregados mensuales son una vista: el motor columnar los calcula al vuelo
+DUCKDB_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS operations (
+        id BIGINT PRIMARY KEY,
+        fecha DATE,
+        concepto VARCHAR,
+        entidad VARCHAR,
+        tipo VARCHAR,
+        importe DOUBLE
+    )
+    """,
+    "CREATE TABLE IF NOT EXISTS sync_state (name VARCHAR PRIMARY KEY, value BIGINT)",
+    """
+    CREATE OR REPLACE VIEW monthly_aggregates AS
+    SELECT strftime(fecha, '%Y-%m') AS mes, year(fecha) * 12 + month(fecha) - 1 AS mes_idx,
+           concepto, entidad, tipo, SUM(importe) AS importe, COUNT(*) AS n_operaciones
+    FROM operations
+    GROUP BY ALL
+    """
+]
+
+def _check_by(by: str):
+    if by not in ('concepto', 'entidad'):
+        raise ValueError(f"Agrupación no válida: {by}")
+
+class StorageBackend(ABC):
+    """Interfaz común de los motores para consultas analíticas sobre las operaciones.
+
+    SQLite sigue siendo la fuente de verdad: toda la ingesta pasa por DatabaseManager y
+    cada backend se pone al día (sync) antes de consultar. Tras cada ingesta conviene
+    llamar a sync_async para que la puesta al día no recaiga en la primera consulta.
+    """
+
+    name = "base"
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self._sync_guard = threading.Lock()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_pending = False
+
+    @abstractmethod
+    def sync(self) -> int:
+        """Incorpora las operaciones nuevas de SQLite; devuelve las filas añadidas"""
+
+    @abstractmethod
+    def query(self, sql: str, params: Optional[List[Any]] = None) -> pd.DataFrame:
+        """Ejecuta una consulta de lectura en el motor"""
+
+    def is_current(self) -> bool:
+        """Si el backend ya refleja la versión actual de SQLite (consultar no tendría que esperar)"""
+        return True
+
+    def sync_async(self) -> threading.Thread:
+        """Pone el backend al día en segundo plano; si ya hay una sincronización en curso
+        se anota otra pasada para las operaciones llegadas mientras tanto"""
+        with self._sync_guard:
+            self._sync_pending = True
+            if self._sync_thread is None:
+                self._sync_thread = threading.Thread(target=self._sync_pending_changes, daemon=True)
+                self._sync_thread.start()
+            return self._sync_thread
+
+    def _sync_pending_changes(self):
+        while True:
+            with self._sync_guard:
+                if not self._sync_pending:
+                    self._sync_thread = None
+                    return
+                self._sync_pending = False
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Error sincronizando el backend {self.name}: {e}")
+
+    def monthly_rollup(self, by: str = 'concepto', tipo: Optional[str] = None) -> pd.DataFrame:
+        """Importe y número de operaciones por mes, tipo y concepto o entidad"""
+        _check_by(by)
+        self.sync()
+        where = "WHERE tipo = ?" if tipo else ""
+        return self.query(ROLLUP_QUERY.format(by=by, where=where), [tipo] if tipo else [])
+
+    def period_analytics(self, by: str = 'concepto', tipo: Optional[str] = None) -> pd.DataFrame:
+        """Mismo resultado que DatabaseManager.get_period_analytics"""
+        _check_by(by)
+        self.sync()
+        where = "WHERE tipo = ?" if tipo else ""
+        data = self.query(PERIOD_ANALYTICS_QUERY.format(by=by, where=where), [tipo] if tipo else [])
+        return DatabaseManager.period_deltas(data)
+
+    def feature_pivot(self) -> pd.DataFrame:
+        """Importe mensual por (tipo, concepto) en columnas, una fila por mes"""
+        self.sync()
+        data = self.query(PIVOT_QUERY)
+        return data.pivot_table(index='mes', columns=['tipo', 'concepto'], values='importe',
+                                aggfunc='sum', fill_value=0.0).sort_index()
+
+class SQLiteBackend(StorageBackend):
+    """Backend por defecto: consulta la propia base SQLite y sus agregados mensuales incrementales"""
+
+    name = "sqlite"
+
+    def sync(self) -> int:
+        self.db.refresh_monthly_aggregates()
+        return 0
+
+    def query(self, sql: str, params: Optional[List[Any]] = None) -> pd.DataFrame:
+        return self.db.cached_query(sql, params)
+
+    def period_analytics(self, by: str = 'concepto', tipo: Optional[str] = None) -> pd.DataFrame:
+        return self.db.get_period_analytics(by, tipo)
+
+class DuckDBBackend(StorageBackend):
+    """Réplica columnar de operations en DuckDB, actualizada por anexado desde SQLite.
+
+    Las operaciones nuevas se copian por id; si en SQLite ha habido modificaciones o
+    borrados la réplica se reconstruye, igual que la instantánea columnar. Cada lote se
+    confirma en la misma transacción que su last_id, así que una sincronización
+    interrumpida continúa donde se quedó sin duplicar filas.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, db: DatabaseManager, path: Optional[str] = None):
+        if duckdb is None:
+            raise ImportError("El backend DuckDB necesita el paquete duckdb (pip install duckdb)")
+        super().__init__(db)
+        self.path = path or os.path.splitext(db.db_path)[0] + '.duckdb'
+        self._lock = threading.Lock()
+        self.conn = duckdb.connect(self.path)
+        for statement in DUCKDB_SCHEMA:
+            self.conn.execute(statement)
+
+    def _state(self) -> dict:
+        return dict(self.conn.execute("SELECT name, value FROM sync_state").fetchall())
+
+    def _set_state(self, **values):
+        self.conn.executemany("INSERT OR REPLACE INTO sync_state VALUES (?, ?)",
+                              [[name, value] for name, value in values.items()])
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.begin()
+        try:
+            yield
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def is_current(self) -> bool:
+        with self._lock:
+            state = self._state()
+        return (state.get('version'), state.get('instance')) == (
+            self.db.get_data_version(), self.db.get_data_version('instance'))
+
+    def sync(self, batch_size: Optional[int] = None) -> int:
+        batch_size = batch_size or Config.SNAPSHOT_BATCH_ROWS
+        with self._lock:
+            state = self._state()
+            version = self.db.get_data_version()
+            instance = self.db.get_data_version('instance')
+            if (state.get('version'), state.get('instance')) == (version, instance):
+                return 0
+
+            rewrites = self.db.get_data_version('operations_rewrites')
+            last_id = state.get('last_id', 0)
+            if (state.get('instance'), state.get('rewrites')) != (instance, rewrites):
+                if last_id:
+                    logger.info("Operaciones modificadas en SQLite: se reconstruye la réplica DuckDB")
+                with self._transaction():
+                    self.conn.execute("DELETE FROM operations")
+                    self._set_state(last_id=0, version=None, instance=instance, rewrites=rewrites)
+                last_id = 0
+
+            added = 0
+            for batch in self.db.iter_operations(batch_size, since_id=last_id):
+                batch['fecha'] = pd.to_datetime(batch['fecha'])
+                with self._transaction():
+                    self.conn.register('batch', batch)
+                    self.conn.execute("INSERT INTO operations SELECT id, CAST(fecha AS DATE), concepto, "
+                                      "entidad, tipo, importe FROM batch")
+                    self.conn.unregister('batch')
+                    self._set_state(last_id=int(batch['id'].iat[-1]))
+                added += len(batch)
+            self._set_state(version=version)
+        if added:
+            logger.info(f"Réplica DuckDB: {added:,} operaciones añadidas")
+        return added
+
+    def query(self, sql: str, params: Optional[List[Any]] = None) -> pd.DataFrame:
+        with self._lock:
+            return self.conn.execute(sql, params or []).df()
+
+    def close(self):
+        self.conn.close()
+
+_backends = {}
+
+def create_storage_backend(db: DatabaseManager, name: Optional[str] = None) -> StorageBackend:
+    """Backend analítico configurado en Config.STORAGE_BACKEND (uno por base de datos)"""
+    name = name or Config.STORAGE_BACKEND
+    if name == "duckdb" and duckdb is None:
+        logger.warning("duckdb no está instalado: se usa el backend SQLite")
+        name = "sqlite"
+    key = (db.db_path, name)
+    if key not in _backends:
+        if name == "sqlite":
+            _backends[key] = SQLiteBackend(db)
+        elif name == "duckdb":
+            _backends[key] = DuckDBBackend(db)
+        else:
+            raise ValueError(f"Backend de almacenamiento desconocido: {name}")
+    return _backends[key]
@@ -0,0 +1,143 @@
+import os
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from .database import DatabaseManager
+
+logger = logging.getLogger(__name__)
+
+# Gastos fijos mensuales realistas para una empresa pequeña
+GASTOS_FIJOS = {
+    'Electricidad': {'entidad': 'Iberdrola', 'base': 250, 'variacion': 50},
+    'Agua': {'entidad': 'Canal Isabel II', 'base': 80, 'variacion': 20},
+    'Internet y Telefonía': {'entidad': 'Movistar', 'base': 120, 'variacion': 15},
+    'Alquiler': {'entidad': 'Inmobiliaria Centro', 'base': 800, 'variacion': 0},
+    'Material Oficina': {'entidad': 'Office Depot', 'base': 150, 'variacion': 50},
+    'Seguros': {'entidad': 'Mapfre', 'base': 200, 'variacion': 0},
+    'Mantenimiento': {'entidad': 'ServiTech', 'base': 150, 'variacion': 50},
+    'Nóminas': {'entidad': 'Personal', 'base': 3500, 'variacion': 500},
+    'Seguridad Social': {'entidad': 'TGSS', 'base': 1200, 'variacion': 150},
+    'Gestoría': {'entidad': 'AsesoresPlus', 'base': 150, 'variacion': 0},
+    'Software y Licencias': {'entidad': 'Varios', 'base': 200, 'variacion': 100}
+}
+
+# Gastos sin estacionalidad
+GASTOS_NO_ESTACIONALES = {'Alquiler', 'Seguros', 'Gestoría'}
+
+CLIENTES = [
+    'TechSolutions SA', 'Innovatech', 'Desarrollo Digital SL',
+    'Consultoría Avanzada', 'Sistemas Integrados'
+]
+
+# Estacionalidad (1.0 = normal, >1.0 = más actividad, <1.0 = menos actividad)
+ESTACIONALIDAD = np.array([
+    0.8,   # Enero (después de navidades, menos actividad)
+    0.9, 1.0, 1.1, 1.2, 1.1,
+    0.7,   # Julio (verano)
+    0.5,   # Agosto (vacaciones)
+    1.1,   # Septiembre (vuelta al trabajo)
+    1.2, 1.1,
+    0.9    # Diciembre (navidades)
+])
+
+COLUMNS = ['empresa', 'fecha', 'concepto', 'entidad', 'tipo', 'importe']
+
+class SyntheticLedgerGenerator:
+    """Generador vectorizado y reproducible de libros de operaciones sintéticos"""
+
+    def __init__(self, seed: Optional[int] = 42):
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def _months(self, years: int, end_date: datetime) -> pd.PeriodIndex:
+        end = pd.Period(end_date, freq='M')
+        return pd.period_range(end=end, periods=years * 12, freq='M')
+
+    def _random_dates(self, month_idx: np.ndarray, months: pd.PeriodIndex, end_date: datetime) -> np.ndarray:
+        """Día aleatorio dentro de cada mes respetando su número real de días"""
+        starts = months.to_timestamp().values.astype('datetime64[D]')
+        days = months.days_in_month.to_numpy().copy()
+        # El último mes no puede superar la fecha final
+        days[-1] = min(days[-1], end_date.day)
+        offsets = (self.rng.random(len(month_idx)) * days[month_idx]).astype(np.int64)
+        return starts[month_idx] + offsets
+
+    def generate(self, n_companies: int = 1, years: int = 5, n_clients: Optional[int] = None,
+                 invoices_per_month: Tuple[int, int] = (1, 4), end_date: Optional[datetime] = None,
+                 scale_sigma: float = 0.5) -> pd.DataFrame:
+        """Genera operaciones para n_companies empresas durante years años.
+
+        invoices_per_month es el rango [min, max) de facturas emitidas por empresa y mes;
+        cada empresa tiene un tamaño log-normal que escala gastos e ingresos.
+        """
+        end_date = end_date or datetime.now()
+        months = self._months(years, end_date)
+        n_months = len(months)
+        seasonal = ESTACIONALIDAD[months.month.to_numpy() - 1]
+
+        clientes = list(CLIENTES)
+        if n_clients and n_clients > len(clientes):
+            clientes += [f"Cliente {i:05d}" for i in range(len(clientes), n_clients)]
+        empresas = np.array([f"Empresa {i:05d}" for i in range(n_companies)])
+        scale = self.rng.lognormal(0.0, scale_sigma, n_companies) if n_companies > 1 else np.ones(1)
+
+        # Gastos fijos: una fila por empresa × mes × concepto
+        conceptos = list(GASTOS_FIJOS)
+        base = np.array([GASTOS_FIJOS[c]['base'] for c in conceptos], dtype=np.float64)
+        variacion = np.array([GASTOS_FIJOS[c]['variacion'] for c in conceptos], dtype=np.float64)
+        estacional = np.array([c not in GASTOS_NO_ESTACIONALES for c in conceptos])
+
+        factor = np.where(estacional[None, :], seasonal[:, None], 1.0)              # meses × conceptos
+        expected = scale[:, None, None] * factor[None, :, :] * base[None, None, :]  # empresas × meses × conceptos
+        noise = self.rng.normal(0.0, 1.0, expected.shape) * variacion * scale[:, None, None]
+        gastos_importe = np.maximum(expected + noise, 0).ravel()
+
+        company_g, month_g, concept_g = np.indices(expected.shape).reshape(3, -1)
+
+        # Ingresos: número variable de facturas por empresa y mes
+        counts = self.rng.integers(invoices_per_month[0], invoices_per_month[1], (n_companies, n_months))
+        company_i = np.repeat(np.arange(n_companies), counts.sum(axis=1))
+        month_i = np.repeat(np.tile(np.arange(n_months), n_companies), counts.ravel())
+        n_invoices = len(month_i)
+        base_factura = self.rng.normal(5000, 1000, n_invoices) * seasonal[month_i] * scale[company_i]
+        ingresos_importe = np.maximum(base_factura * self.rng.normal(1, 0.2, n_invoices), 0)
+        cliente_i = self.rng.integers(0, len(clientes), n_invoices)
+
+        entidades = [GASTOS_FIJOS[c]['entidad'] for c in conceptos] + clientes
+        entidad_codes = np.concatenate([concept_g, len(conceptos) + cliente_i])
+        concepto_codes = np.concatenate([concept_g, np.full(n_invoices, len(conceptos))])
+
+        company = np.concatenate([company_g, company_i])
+        month = np.concatenate([month_g, month_i])
+        df = pd.DataFrame({
+            'empresa': pd.Categorical.from_codes(company, categories=empresas),
+            'fecha': self._random_dates(month, months, end_date).astype('datetime64[ns]'),
+            'concepto': pd.Categorical.from_codes(concepto_codes, categories=conceptos + ['Servicios Profesionales']),
+            'entidad': pd.Categorical.from_codes(entidad_codes, categories=entidades),
+            'tipo': pd.Categorical.from_codes(
+                np.concatenate([np.zeros(len(company_g), dtype=np.int8), np.ones(n_invoices, dtype=np.int8)]),
+                categories=['Gasto', 'Ingreso']
+            ),
+            'importe': np.round(np.concatenate([gastos_importe, ingresos_importe]), 2)
+        })
+        order = np.argsort(df['fecha'].to_numpy(), kind='stable')
+        return df.iloc[order].reset_index(drop=True)
+
+    @staticmethod
+    def to_sqlite(df: pd.DataFrame, db_path: str, batch_size: int = 100_000) -> int:
+        """Inserta las operaciones en bloque en la tabla operations (sin sincronizar a disco)"""
+        return DatabaseManager(db_path).add_operations_bulk(df, batch_size=batch_size, durable=False)
+
+    @staticmethod
+    def to_parquet(df: pd.DataFrame, path: str) -> str:
+        """Guarda el libro en formato columnar Parquet (requiere pyarrow)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            df.to_parquet(path, index=False)
+        except ImportError as e:
+            raise ImportError("Se necesita pyarrow para exportar a Parquet") from e
+        return path
@@ -0,0 +1,104 @@
+import re
+import json
+import math
+import logging
+from typing import Any, List, Optional
+from config.config import Config
+
+try:
+    import tiktoken
+except ImportError:  # Dependencia opcional: sin ella se usa una estimación por caracteres
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_SECTION_RE = re.compile(r"\n\s*\n|\n(?=\s*(?:#+\s|\d+[\.\)]\s))")
+
+class TokenBudgeter:
+    """Mide el tamaño de los prompts y los recorta para ajustarlos a un presupuesto de tokens"""
+
+    def __init__(self, budget: Optional[int] = None, float_decimals: Optional[int] = None):
+        self.budget = budget if budget is not None else Config.CONTEXT_TOKEN_BUDGET
+        self.float_decimals = float_decimals if float_decimals is not None else Config.PROMPT_FLOAT_DECIMALS
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"No se pudo cargar el tokenizador, se usará una estimación: {e}")
+
+    def count_tokens(self, text: str) -> int:
+        """Cuenta tokens con tiktoken si está disponible, o estima ~4 caracteres por token"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return max(1, math.ceil(len(text) / 4))
+
+    def count_messages(self, messages: List[dict]) -> int:
+        """Tokens totales de una lista de mensajes de chat"""
+        return sum(self.count_tokens(message.get('content', '')) for message in messages)
+
+    def _round_floats(self, obj: Any) -> Any:
+        if isinstance(obj, float):
+            if not math.isfinite(obj):
+                return None
+            value = round(obj, self.float_decimals)
+            return int(value) if value.is_integer() else value
+        if isinstance(obj, dict):
+            return {key: self._round_floats(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [self._round_floats(value) for value in obj]
+        return obj
+
+    def compact_json(self, obj: Any) -> str:
+        """Serializa sin indentación y con los decimales redondeados"""
+        if isinstance(obj, str):
+            return obj
+        return json.dumps(self._round_floats(obj), ensure_ascii=False, separators=(',', ':'), default=str)
+
+    @staticmethod
+    def _terms(text: str) -> set:
+        return {word for word in _WORD_RE.findall(text.lower()) if len(word) > 3}
+
+    def split_sections(self, text: str) -> List[str]:
+        """Divide el contexto en secciones por líneas en blanco o encabezados numerados"""
+        return [section.strip() for section in _SECTION_RE.split(text) if section and section.strip()]
+
+    def select_context(self, context: str, query: str, budget: Optional[int] = None) -> str:
+        """Conserva las secciones más relevantes para la consulta dentro del presupuesto,
+        manteniendo su orden original"""
+        budget = self.budget if budget is None else budget
+        if not context or self.count_tokens(context) <= budget:
+            return context
+
+        sections = self.split_sections(context)
+        query_terms = self._terms(query)
+        scored = []
+        for position, section in enumerate(sections):
+            section_terms = self._terms(section)
+            overlap = len(query_terms & section_terms)
+            score = overlap / math.sqrt(len(section_terms) + 1)
+            scored.append((score, -position, position, section))
+
+        selected = []
+        used = 0
+        for _, _, position, section in sorted(scored, reverse=True):
+            tokens = self.count_tokens(section)
+            if used + tokens > budget:
+                continue
+            selected.append((position, section))
+            used += tokens
+
+        return "\n\n".join(section for _, section in sorted(selected))
+
+    def report(self, original_tokens: int, final_tokens: int) -> dict:
+        """Resumen del ahorro obtenido al recortar un prompt"""
+        saved = max(original_tokens - final_tokens, 0)
+        return {
+            'original_tokens': original_tokens,
+            'final_tokens': final_tokens,
+            'tokens_saved': saved,
+            'reduction_pct': saved / original_tokens * 100 if original_tokens else 0.0
+        }
@@ -0,0 +1,140 @@
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any
+import numpy as np
+import pandas as pd
+from config.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Funcionalidades que realizan llamadas al LLM
+FEATURES = ['context', 'scenarios', 'opinion', 'clustering', 'pdf_extraction', 'pdf_summary']
+
+class UsageLedger:
+    """Registro en SQLite de tokens, latencia y coste de cada llamada al LLM"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or Config.DB_PATH
+        self._initialize_ledger()
+
+    def _initialize_ledger(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_calls (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME,
+                    feature TEXT,
+                    model TEXT,
+                    cache_tier TEXT,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    latency_ms REAL,
+                    cost REAL,
+                    success INTEGER,
+                    tokens_saved INTEGER DEFAULT 0
+                )
+            """)
+            # Migración de registros creados antes de medir el recorte de prompts
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_calls)")}
+            if 'tokens_saved' not in columns:
+                conn.execute("ALTER TABLE llm_calls ADD COLUMN tokens_saved INTEGER DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_feature ON llm_calls(feature)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_timestamp ON llm_calls(timestamp)")
+
+    @staticmethod
+    def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Calcula el coste en USD según la tarifa por 1K tokens del modelo"""
+        prompt_price, completion_price = Config.MODEL_PRICING.get(model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(self, feature: str, model: str, cache_tier: str, prompt_tokens: int,
+               completion_tokens: int, latency_ms: float, success: bool = True,
+               tokens_saved: int = 0):
+        """Registra una llamada; las respuestas servidas desde caché y las fallidas no tienen coste"""
+        cost = 0.0 if cache_tier != 'none' or not success else self.estimate_cost(model, prompt_tokens, completion_tokens)
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    INSERT INTO llm_calls
+                    (timestamp, feature, model, cache_tier, prompt_tokens,
+                     completion_tokens, latency_ms, cost, success, tokens_saved)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (datetime.now(), feature, model, cache_tier, int(prompt_tokens),
+                      int(completion_tokens), float(latency_ms), cost, int(success),
+                      int(tokens_saved)))
+        except Exception as e:
+            # El registro nunca debe interrumpir la llamada al LLM
+            logger.warning(f"No se pudo registrar la llamada al LLM: {e}")
+
+    def get_calls(self, since: Optional[datetime] = None, feature: Optional[str] = None) -> pd.DataFrame:
+        """Devuelve las llamadas registradas, opcionalmente filtradas"""
+        query = "SELECT * FROM llm_calls WHERE 1=1"
+        params = []
+        if since:
+            query += " AND timestamp >= ?"
+            params.append(since)
+        if feature:
+            query += " AND feature = ?"
+            params.append(feature)
+
+        with sqlite3.connect(self.db_path) as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def get_usage_summary(self, since: Optional[datetime] = None) -> pd.DataFrame:
+        """Agrega por funcionalidad: llamadas, fallos, ratio de caché, latencias p50/p95 (solo
+        de las llamadas correctas), tokens y coste"""
+        calls = self.get_calls(since)
+        columns = ['feature', 'calls', 'failed', 'cache_hit_ratio', 'p50_latency_ms', 'p95_latency_ms',
+                   'prompt_tokens', 'completion_tokens', 'avg_prompt_tokens', 'tokens_saved', 'cost']
+        if calls.empty:
+            return pd.DataFrame(columns=columns)
+
+        calls['cache_hit'] = (calls['cache_tier'] != 'none').astype(int)
+        calls['failed'] = (calls['success'] == 0).astype(int)
+        grouped = calls.groupby('feature')
+        summary = grouped.agg(
+            calls=('id', 'size'),
+            failed=('failed', 'sum'),
+            cache_hit_ratio=('cache_hit', 'mean'),
+            prompt_tokens=('prompt_tokens', 'sum'),
+            completion_tokens=('completion_tokens', 'sum'),
+            avg_prompt_tokens=('prompt_tokens', 'mean'),
+            tokens_saved=('tokens_saved', 'sum'),
+            cost=('cost', 'sum')
+        )
+        # Los fallos (timeouts, errores rápidos) distorsionarían los percentiles
+        succeeded = calls[calls['success'] == 1]
+        latency = succeeded.groupby('feature')['latency_ms'].quantile([0.5, 0.95]).unstack()
+        summary['p50_latency_ms'] = latency.get(0.5)
+        summary['p95_latency_ms'] = latency.get(0.95)
+        return summary.reset_index()[columns]
+
+    def get_totals(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """Totales globales del registro"""
+        calls = self.get_calls(since)
+        if calls.empty:
+            return {'calls': 0, 'failed': 0, 'tokens': 0, 'cost': 0.0, 'cache_hit_ratio': 0.0}
+        return {
+            'calls': len(calls),
+            'failed': int((calls['success'] == 0).sum()),
+            'tokens': int(calls['prompt_tokens'].sum() + calls['completion_tokens'].sum()),
+            'cost': float(calls['cost'].sum()),
+            'cache_hit_ratio': float((calls['cache_tier'] != 'none').mean())
+        }
+
+    def estimate_latency_savings(self, since: Optional[datetime] = None) -> Dict[str, float]:
+        """Estima la latencia ahorrada por el recorte de prompts con un ajuste lineal
+        de la latencia frente a los tokens de prompt en llamadas no cacheadas"""
+        calls = self.get_calls(since)
+        tokens_saved = int(calls['tokens_saved'].sum()) if not calls.empty else 0
+        live = calls[(calls['cache_tier'] == 'none') & (calls['success'] == 1)] if not calls.empty else calls
+        ms_per_token = 0.0
+        if len(live) >= 2 and live['prompt_tokens'].nunique() >= 2:
+            slope, _ = np.polyfit(live['prompt_tokens'].astype(float), live['latency_ms'].astype(float), 1)
+            ms_per_token = max(float(slope), 0.0)
+        return {
+            'tokens_saved': tokens_saved,
+            'ms_per_prompt_token': ms_per_token,
+            'latency_saved_ms': tokens_saved * ms_per_token
+        }
@@ -1,11 +1,15 @@
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import logging
+from scenarios.models import ScenarioSet
 
 logger = logging.getLogger(__name__)
 
 class ScenarioVisualizer:
+    # Serie de la previsión mensual asociada a cada métrica de los escenarios
+    FORECAST_SERIES = {'ingresos': 'Total Ingresos', 'gastos': 'Total Gastos'}
+
     def __init__(self):
         self.color_scheme = {
             'base': '#2C3E50',      # Azul oscuro
@@ -39,16 +43,6 @@ class ScenarioVisualizer:
             }
         }
 
-    def _convert_to_float(self, value) -> float:
-        """Convierte un valor a float, manejando porcentajes y strings"""
-        if isinstance(value, (int, float)):
-            return float(value)
-        if isinstance(value, str):
-            if '%' in value:
-                return float(value.strip('%'))
-            return float(value.replace(',', ''))
-        return 0.0
-
     def _format_metric_name(self, metric: str) -> str:
         """Formatea el nombre de la métrica para mostrar"""
         return metric.replace('_', ' ').title()
@@ -56,6 +50,7 @@ class ScenarioVisualizer:
     def create_metrics_dashboard(self, scenarios: Dict[str, Any], metrics: List[str]) -> go.Figure:
         """Crea un dashboard con múltiples métricas"""
         try:
+            scenarios = ScenarioSet.coerce(scenarios)
             n_metrics = len(metrics)
             cols = min(2, n_metrics)
             rows = (n_metrics + 1) // 2
@@ -71,9 +66,7 @@ class ScenarioVisualizer:
                 col = (i - 1) % cols + 1
 
                 for scenario_name in ['base', 'optimista', 'pesimista']:
-                    value = self._convert_to_float(
-                        scenarios[scenario_name]['proyecciones'].get(metric, 0)
-                    )
+                    value = scenarios.value(scenario_name, metric)
 
                     fig.add_trace(
                         go.Bar(
@@ -103,10 +96,7 @@ class ScenarioVisualizer:
     def create_comparison_chart(self, scenarios: Dict[str, Any], metric: str) -> go.Figure:
         """Crea un gráfico comparativo de una métrica específica"""
         try:
-            values = [
-                self._convert_to_float(scenarios[scenario]['proyecciones'].get(metric, 0))
-                for scenario in ['base', 'optimista', 'pesimista']
-            ]
+            values = ScenarioSet.coerce(scenarios).column(metric).tolist()
 
             fig = go.Figure(data=[
                 go.Bar(
@@ -136,18 +126,24 @@ class ScenarioVisualizer:
             logger.error(f"Error creando gráfico comparativo: {str(e)}")
             raise
 
-    def create_timeline_chart(self, scenarios: Dict[str, Any], metric: str, periods: int = 4) -> go.Figure:
-        """Crea un gráfico de línea temporal para una métrica"""
+    def create_timeline_chart(self, scenarios: Dict[str, Any], metric: str, periods: int = 4,
+                              forecast: Optional[Dict[str, Any]] = None) -> go.Figure:
+        """Crea un gráfico de línea temporal para una métrica.
+
+        Si se pasa una previsión de CashFlowForecaster, el total anual de cada escenario
+        se reparte mes a mes según el perfil estacional previsto.
+        """
         try:
+            scenarios = ScenarioSet.coerce(scenarios)
+            series = self.FORECAST_SERIES.get(metric)
+            if forecast is not None and series in forecast['forecast']:
+                return self._create_seasonal_timeline(scenarios, metric, forecast['forecast'][series])
+
             fig = go.Figure()
 
             for scenario_name in ['base', 'optimista', 'pesimista']:
-                base_value = self._convert_to_float(
-                    scenarios[scenario_name]['proyecciones'].get(metric, 0)
-                )
-                growth_rate = self._convert_to_float(
-                    scenarios[scenario_name]['proyecciones'].get(f'crecimiento_{metric}', '0%')
-                ) / 100
+                base_value = scenarios.value(scenario_name, metric)
+                growth_rate = scenarios.value(scenario_name, f'crecimiento_{metric}') / 100
 
                 values = [base_value]
                 for i in range(1, periods):
@@ -177,6 +173,111 @@ class ScenarioVisualizer:
             logger.error(f"Error creando gráfico temporal: {str(e)}")
             raise
 
+    def _create_seasonal_timeline(self, scenarios: ScenarioSet, metric: str, monthly) -> go.Figure:
+        total = float(monthly.sum())
+        profile = monthly.to_numpy() / total if total > 0 else [1 / len(monthly)] * len(monthly)
+        months = [str(period) for period in monthly.index]
+        fig = go.Figure()
+
+        for scenario_name in ['base', 'optimista', 'pesimista']:
+            annual = scenarios.value(scenario_name, metric)
+            fig.add_trace(
+                go.Scatter(
+                    x=months,
+                    y=[annual * weight for weight in profile],
+                    name=scenario_name.capitalize(),
+                    line=dict(color=self.color_scheme[scenario_name])
+                )
+            )
+
+        layout = self.common_layout.copy()
+        layout.update({
+            'title': f'Proyección Mensual de {self._format_metric_name(metric)} por Escenario',
+            'height': 400,
+            'xaxis_title': 'Mes',
+            'yaxis_title': self._format_metric_name(metric)
+        })
+        fig.update_layout(**layout)
+        return fig
+
+    def create_forecast_chart(self, forecast: Dict[str, Any], series: str = 'Total Ingresos') -> go.Figure:
+        """Crea un gráfico con el histórico mensual, la previsión y su intervalo de predicción"""
+        try:
+            history = forecast['history'][series]
+            months = [str(period) for period in forecast['forecast'].index]
+            fig = go.Figure()
+
+            fig.add_trace(go.Scatter(
+                x=[str(period) for period in history.index],
+                y=history.to_numpy(),
+                name='Histórico',
+                line=dict(color=self.color_scheme['base'])
+            ))
+            fig.add_trace(go.Scatter(
+                x=months + months[::-1],
+                y=list(forecast['upper'][series]) + list(forecast['lower'][series])[::-1],
+                fill='toself',
+                fillcolor='rgba(39, 174, 96, 0.2)',
+                line=dict(color='rgba(0, 0, 0, 0)'),
+                name=f"Intervalo {forecast['level']:.0%}"
+            ))
+            fig.add_trace(go.Scatter(
+                x=months,
+                y=forecast['forecast'][series].to_numpy(),
+                name='Previsión',
+                line=dict(color=self.color_scheme['optimista'], dash='dash')
+            ))
+
+            layout = self.common_layout.copy()
+            layout.update({
+                'title': f"Previsión de {series} ({forecast['model']})",
+                'height': 400,
+                'xaxis_title': 'Mes',
+                'yaxis_title': 'Importe'
+            })
+            fig.update_layout(**layout)
+            return fig
+
+        except Exception as e:
+            logger.error(f"Error creando gráfico de previsión: {str(e)}")
+            raise
+
+    def create_sensitivity_heatmap(self, grid: Dict[str, Any], metric: str = 'margen') -> go.Figure:
+        """Crea un mapa de calor de una métrica sobre la rejilla crecimiento × inflación"""
+        try:
+            fig = go.Figure(data=go.Heatmap(
+                x=grid['growth'] * 100,
+                y=grid['inflation'] * 100,
+                z=grid[metric],
+                colorscale='RdYlGn',
+                zmid=0,
+                colorbar=dict(title=self._format_metric_name(metric)),
+                hovertemplate='Crecimiento: %{x:.1f}%<br>Inflación: %{y:.1f}%<br>%{z:,.2f}<extra></extra>'
+            ))
+            fig.add_trace(go.Contour(
+                x=grid['growth'] * 100,
+                y=grid['inflation'] * 100,
+                z=grid['beneficio'],
+                contours=dict(start=0, end=0, coloring='none', showlabels=False),
+                line=dict(color=self.color_scheme['base'], width=2, dash='dash'),
+                showscale=False,
+                name='Punto de equilibrio'
+            ))
+
+            layout = self.common_layout.copy()
+            layout.update({
+                'title': f'Sensibilidad de {self._format_metric_name(metric)}',
+                'height': 500,
+                'xaxis_title': 'Crecimiento de ingresos (%)',
+                'yaxis_title': 'Inflación de costes (%)'
+            })
+            fig.update_layout(**layout)
+            return fig
+
+        except Exception as e:
+            logger.error(f"Error creando mapa de sensibilidad: {str(e)}")
+            raise
+
     def export_to_html(self, fig: go.Figure, filename: str):
         """Exporta un gráfico a HTML"""
         try: